@@ -14,3 +14,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backTecho.settings')
 
 application = get_asgi_application()
+
+# Las vistas de solicitudes/vistas_async.py, en especial el feed de cambios
+# (solicitudes/async/cambios/ y su versión SSE), solo atienden a muchos clientes en espera
+# sin un hilo por conexión cuando se sirven por esta aplicación ASGI.
@@ -0,0 +1,264 @@
+# backTecho/metricas.py
+import atexit
+import contextvars
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+
+# Métricas por ruta (latencia, consultas SQL, tamaño de respuesta y códigos de estado) en
+# formato de texto de Prometheus.
+#
+# Cada proceso acumula sus valores en memoria y los vuelca cada METRICAS_INTERVALO_VOLCADO
+# segundos a METRICAS_DIRECTORIO/<pid>-<id>.json; /metrics suma los archivos de todos los procesos.
+# Los contadores son acumulativos: el directorio debe vaciarse al (re)iniciar el servicio.
+
+BUCKETS_DURACION = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_TAMANO = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+BUCKETS_CONSULTAS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# nombre -> (tipo, ayuda, buckets)
+METRICAS = {
+    'backtecho_http_requests_total': (
+        'counter', "Peticiones HTTP atendidas, por ruta, método y código de estado.", None),
+    'backtecho_http_request_duration_seconds': (
+        'histogram', "Duración de las peticiones HTTP, por ruta y método.", BUCKETS_DURACION),
+    'backtecho_http_response_size_bytes': (
+        'histogram', "Tamaño del cuerpo de las respuestas no streaming, por ruta.", BUCKETS_TAMANO),
+    'backtecho_db_queries_per_request': (
+        'histogram', "Consultas SQL ejecutadas por petición, por ruta.", BUCKETS_CONSULTAS),
+    'backtecho_db_query_duration_seconds_total': (
+        'counter', "Tiempo total en consultas SQL, por ruta.", None),
+}
+
+
+class Registro:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._valores = {}
+        self._ultimo_volcado = 0.0
+        self._archivo = None
+        self._pid = None
+
+    def incrementar(self, nombre, etiquetas, valor=1):
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + valor
+
+    def observar(self, nombre, etiquetas, valor):
+        # Histograma: [conteo por bucket (no acumulado) + fuera de rango, suma, cantidad].
+        buckets = METRICAS[nombre][2]
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self._lock:
+            histograma = self._valores.get(clave)
+            if histograma is None:
+                histograma = self._valores[clave] = [[0] * (len(buckets) + 1), 0, 0]
+            indice = next((i for i, limite in enumerate(buckets) if valor <= limite), len(buckets))
+            histograma[0][indice] += 1
+            histograma[1] += valor
+            histograma[2] += 1
+
+    def exportar(self):
+        with self._lock:
+            return [[nombre, list(etiquetas), valor] for (nombre, etiquetas), valor in self._valores.items()]
+
+    def limpiar(self):
+        with self._lock:
+            self._valores.clear()
+
+    def volcar(self, forzar=False):
+        ahora = time.monotonic()
+        if not forzar and ahora - self._ultimo_volcado < settings.METRICAS_INTERVALO_VOLCADO:
+            return
+        self._ultimo_volcado = ahora
+        directorio = str(settings.METRICAS_DIRECTORIO)
+        os.makedirs(directorio, exist_ok=True)
+        descriptor, temporal = tempfile.mkstemp(dir=directorio, suffix='.tmp')
+        with os.fdopen(descriptor, 'w') as archivo:
+            json.dump(self.exportar(), archivo)
+        os.replace(temporal, os.path.join(directorio, self._nombre_archivo()))
+
+    def _nombre_archivo(self):
+        # pid + id aleatorio: un worker nuevo que reutiliza el pid de uno muerto no pisa sus
+        # contadores. Se recalcula tras un fork (gunicorn --preload importa antes de forkear).
+        pid = os.getpid()
+        if self._pid != pid:
+            self._pid = pid
+            self._archivo = f'{pid}-{uuid.uuid4().hex[:12]}.json'
+        return self._archivo
+
+
+registro = Registro()
+
+
+@atexit.register
+def _volcar_al_salir():
+    if registro.exportar():
+        registro.volcar(forzar=True)
+
+
+def combinar(directorio):
+    # Suma los volcados de todos los procesos: {(nombre, etiquetas): valor}.
+    total = {}
+    for ruta in glob.glob(os.path.join(str(directorio), '*.json')):
+        try:
+            with open(ruta) as archivo:
+                filas = json.load(archivo)
+        except (OSError, ValueError):
+            continue
+        for nombre, etiquetas, valor in filas:
+            if nombre not in METRICAS:
+                continue
+            clave = (nombre, tuple(tuple(par) for par in etiquetas))
+            if isinstance(valor, list):
+                actual = total.setdefault(clave, [[0] * len(valor[0]), 0, 0])
+                actual[0] = [a + b for a, b in zip(actual[0], valor[0])]
+                actual[1] += valor[1]
+                actual[2] += valor[2]
+            else:
+                total[clave] = total.get(clave, 0) + valor
+    return total
+
+
+def _etiquetas(pares, extra=()):
+    pares = list(pares) + list(extra)
+    if not pares:
+        return ''
+    texto = ','.join(
+        '{}="{}"'.format(clave, str(valor).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+        for clave, valor in pares
+    )
+    return '{' + texto + '}'
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def texto_prometheus(valores):
+    lineas = []
+    for nombre, (tipo, ayuda, buckets) in METRICAS.items():
+        series = sorted((etiquetas, valor) for (n, etiquetas), valor in valores.items() if n == nombre)
+        lineas.append(f'# HELP {nombre} {ayuda}')
+        lineas.append(f'# TYPE {nombre} {tipo}')
+        for etiquetas, valor in series:
+            if tipo == 'histogram':
+                conteos, suma, cantidad = valor
+                acumulado = 0
+                for limite, conteo in zip(list(buckets) + ['+Inf'], conteos):
+                    acumulado += conteo
+                    lineas.append(f'{nombre}_bucket{_etiquetas(etiquetas, [("le", limite)])} {acumulado}')
+                lineas.append(f'{nombre}_sum{_etiquetas(etiquetas)} {_numero(suma)}')
+                lineas.append(f'{nombre}_count{_etiquetas(etiquetas)} {cantidad}')
+            else:
+                lineas.append(f'{nombre}{_etiquetas(etiquetas)} {_numero(valor)}')
+    return '\n'.join(lineas) + '\n'
+
+
+# Consultas de la petición en curso: [cantidad, segundos]. Una ContextVar (y no el hilo) para
+# que también cuente las consultas que las vistas async ejecutan vía sync_to_async.
+_consultas = contextvars.ContextVar('metricas_consultas', default=None)
+
+
+def _medir_consulta(execute, sql, params, many, context):
+    acumulado = _consultas.get()
+    if acumulado is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        acumulado[0] += 1
+        acumulado[1] += time.perf_counter() - inicio
+
+
+def _instalar_en(conexion):
+    if _medir_consulta not in conexion.execute_wrappers:
+        conexion.execute_wrappers.append(_medir_consulta)
+
+
+def _conexion_creada(sender, connection, **kwargs):
+    _instalar_en(connection)
+
+
+connection_created.connect(_conexion_creada, dispatch_uid='backtecho_metricas')
+
+
+def _ruta(request):
+    # Patrón de la URL (p. ej. 'solicitudes/documento/<int:doc_id>/'), no la ruta concreta,
+    # para que la cantidad de series no crezca con los ids.
+    coincidencia = getattr(request, 'resolver_match', None)
+    return coincidencia.route if coincidencia else 'sin_ruta'
+
+
+class MetricasMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.es_async = iscoroutinefunction(get_response)
+        if self.es_async:
+            markcoroutinefunction(self)
+        # Conexiones abiertas antes de cargar el middleware (las nuevas llegan por la señal).
+        for conexion in connections.all(initialized_only=True):
+            _instalar_en(conexion)
+
+    def __call__(self, request):
+        if self.es_async:
+            return self.__acall__(request)
+        acumulado = [0, 0.0]
+        token = _consultas.set(acumulado)
+        inicio = time.perf_counter()
+        try:
+            respuesta = self.get_response(request)
+        finally:
+            _consultas.reset(token)
+        self.registrar(request, respuesta, time.perf_counter() - inicio, acumulado)
+        return respuesta
+
+    async def __acall__(self, request):
+        acumulado = [0, 0.0]
+        token = _consultas.set(acumulado)
+        inicio = time.perf_counter()
+        try:
+            respuesta = await self.get_response(request)
+        finally:
+            _consultas.reset(token)
+        self.registrar(request, respuesta, time.perf_counter() - inicio, acumulado)
+        return respuesta
+
+    def registrar(self, request, respuesta, duracion, acumulado):
+        ruta = _ruta(request)
+        registro.incrementar('backtecho_http_requests_total', {
+            'ruta': ruta, 'metodo': request.method, 'estado': respuesta.status_code
+        })
+        registro.observar('backtecho_http_request_duration_seconds', {'ruta': ruta, 'metodo': request.method}, duracion)
+        registro.observar('backtecho_db_queries_per_request', {'ruta': ruta}, acumulado[0])
+        registro.incrementar('backtecho_db_query_duration_seconds_total', {'ruta': ruta}, acumulado[1])
+        if not respuesta.streaming:
+            registro.observar('backtecho_http_response_size_bytes', {'ruta': ruta}, len(respuesta.content))
+        registro.volcar()
+
+
+def vista_metricas(request):
+    # Sin METRICAS_TOKEN, /metrics solo se sirve con DEBUG: expone todas las rutas y su tráfico.
+    token = settings.METRICAS_TOKEN
+    if not token and not settings.DEBUG:
+        return HttpResponseForbidden("Configure METRICAS_TOKEN para exponer /metrics.")
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponseForbidden()
+    registro.volcar(forzar=True)
+    return HttpResponse(
+        texto_prometheus(combinar(settings.METRICAS_DIRECTORIO)),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
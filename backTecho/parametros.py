@@ -0,0 +1,9 @@
+# backTecho/parametros.py
+
+# Lectura de parámetros de petición compartida por las apps.
+
+
+def es_verdadero(valor):
+    if isinstance(valor, bool):
+        return valor
+    return str(valor).strip().lower() in ('1', 'true', 'si', 'sí', 'yes')
@@ -0,0 +1,168 @@
+# backTecho/replicas.py
+import contextvars
+import random
+import sqlite3
+from functools import wraps
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Lecturas en réplicas y escrituras en la base principal.
+#
+# Solo las vistas marcadas con @solo_lectura leen de una réplica (settings.REPLICAS_LECTURA);
+# el resto, incluidas las lecturas dentro de las vistas que escriben, usa 'default'. Cuando
+# un usuario escribe, sus lecturas siguientes van a la principal durante
+# REPLICAS_VENTANA_ESCRITURA segundos, para que vea lo que acaba de escribir aunque la
+# réplica venga atrasada. La marca vive en la caché de Django, que debe ser compartida por
+# los workers: si no, la petición siguiente puede caer en otro worker que no la ve.
+
+# Alias de la réplica de la vista en curso (None = base principal).
+_alias_lectura = contextvars.ContextVar('replicas_alias_lectura', default=None)
+# [escribió] de la petición en curso; lo marca el router, lo lee ReplicasMiddleware.
+_escrituras = contextvars.ContextVar('replicas_escrituras', default=None)
+
+
+class RouterLecturaEscritura:
+
+    def db_for_read(self, model, **hints):
+        return _alias_lectura.get()
+
+    def db_for_write(self, model, **hints):
+        escrituras = _escrituras.get()
+        if escrituras is not None:
+            escrituras[0] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Las réplicas reciben el esquema por replicación, no por migrate.
+        return False if db in settings.REPLICAS_LECTURA else None
+
+
+# Backends que guardan los datos dentro de cada proceso.
+CACHES_POR_PROCESO = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def verificar_configuracion():
+    # Se llama al arrancar (SolicitudesConfig.ready).
+    if settings.REPLICAS_LECTURA and settings.CACHES['default']['BACKEND'] in CACHES_POR_PROCESO:
+        raise ImproperlyConfigured(
+            "Las réplicas de lectura necesitan una caché compartida por los workers (CACHES['default']); "
+            f"{settings.CACHES['default']['BACKEND']} guarda la marca de escritura solo en cada proceso."
+        )
+
+
+def _clave(usuario_id):
+    return f'replicas:primaria:{usuario_id}'
+
+
+def marcar_escritura(usuario):
+    cache.set(_clave(usuario.pk), True, timeout=settings.REPLICAS_VENTANA_ESCRITURA)
+
+
+def elegir_replica(usuario):
+    if not settings.REPLICAS_LECTURA:
+        return None
+    if usuario is not None and usuario.is_authenticated and cache.get(_clave(usuario.pk)):
+        return None
+    return random.choice(settings.REPLICAS_LECTURA)
+
+
+def _iterar_en(alias, contenido):
+    # El contenido de una respuesta streaming se consulta después de que la vista retorna;
+    # se fija el alias en cada paso sin dejarlo puesto en el contexto del servidor.
+    iterador = iter(contenido)
+    while True:
+        token = _alias_lectura.set(alias)
+        try:
+            fragmento = next(iterador)
+        except StopIteration:
+            return
+        finally:
+            _alias_lectura.reset(token)
+        yield fragmento
+
+
+def solo_lectura(vista):
+    # Debe ir debajo de @api_view/@vista_async: necesita request.user ya autenticado.
+    if iscoroutinefunction(vista):
+        @wraps(vista)
+        async def envoltura_async(request, *args, **kwargs):
+            token = _alias_lectura.set(elegir_replica(getattr(request, 'user', None)))
+            try:
+                return await vista(request, *args, **kwargs)
+            finally:
+                _alias_lectura.reset(token)
+        return envoltura_async
+
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        alias = elegir_replica(getattr(request, 'user', None))
+        token = _alias_lectura.set(alias)
+        try:
+            respuesta = vista(request, *args, **kwargs)
+        finally:
+            _alias_lectura.reset(token)
+        if alias and getattr(respuesta, 'streaming', False):
+            respuesta.streaming_content = _iterar_en(alias, respuesta.streaming_content)
+        return respuesta
+    return envoltura
+
+
+class ReplicasMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.es_async = iscoroutinefunction(get_response)
+        if self.es_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.es_async:
+            return self.__acall__(request)
+        escrituras = [False]
+        token = _escrituras.set(escrituras)
+        try:
+            respuesta = self.get_response(request)
+        finally:
+            _escrituras.reset(token)
+        self.registrar(request, escrituras)
+        return respuesta
+
+    async def __acall__(self, request):
+        escrituras = [False]
+        token = _escrituras.set(escrituras)
+        try:
+            respuesta = await self.get_response(request)
+        finally:
+            _escrituras.reset(token)
+        self.registrar(request, escrituras)
+        return respuesta
+
+    def registrar(self, request, escrituras):
+        usuario = getattr(request, 'user', None)
+        if escrituras[0] and usuario is not None and usuario.is_authenticated:
+            marcar_escritura(usuario)
+
+
+def replicar(destinos=None):
+    # Sustituto local de la replicación: copia la base principal SQLite sobre cada réplica
+    # con la API de backup (una copia consistente, aunque haya escrituras en curso).
+    origen = connections[DEFAULT_DB_ALIAS]
+    origen.ensure_connection()
+    for alias in settings.REPLICAS_LECTURA if destinos is None else destinos:
+        connections[alias].close()
+        destino = sqlite3.connect(str(connections[alias].settings_dict['NAME']))
+        try:
+            origen.connection.backup(destino)
+        finally:
+            destino.close()
@@ -34,6 +34,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'backTecho.metricas.MetricasMiddleware',
+    'backTecho.replicas.ReplicasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -71,6 +73,48 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # BEGIN IMMEDIATE: las transacciones de escritura toman el bloqueo al empezar (y
+            # esperan busy_timeout si está tomado) en vez de fallar con "database is locked"
+            # al pasar de lectura a escritura a mitad de la transacción.
+            'transaction_mode': 'IMMEDIATE',
+        },
+    }
+}
+
+# PRAGMAs que backTecho/sqlite.py aplica, en orden, a cada conexión SQLite nueva. Con WAL los lectores
+# no esperan a los escritores; synchronous=NORMAL es seguro con WAL (solo se pueden perder
+# las últimas transacciones ante un corte de energía, nunca se corrompe la base).
+SQLITE_PERFIL = {
+    'busy_timeout': config('SQLITE_BUSY_TIMEOUT', default=5000, cast=int),   # milisegundos
+    'journal_mode': config('SQLITE_JOURNAL_MODE', default='wal'),
+    'synchronous': 'NORMAL',
+    'mmap_size': config('SQLITE_MMAP_SIZE', default=256 * 1024 * 1024, cast=int),
+    'cache_size': -64 * 1024,   # negativo = KiB por conexión
+    'temp_store': 'MEMORY',
+}
+
+# Réplicas de solo lectura (backTecho/replicas.py): DB_REPLICAS_SQLITE es una lista de rutas
+# separadas por comas, cada una expuesta como alias 'replica_<n>'. Sin réplicas, todo va a
+# 'default'. En local, 'manage.py replicar_sqlite' hace de replicación.
+REPLICAS_SQLITE = config('DB_REPLICAS_SQLITE', default='', cast=lambda v: [r.strip() for r in v.split(',') if r.strip()])
+for numero, ruta in enumerate(REPLICAS_SQLITE, start=1):
+    DATABASES[f'replica_{numero}'] = {**DATABASES['default'], 'NAME': ruta, 'TEST': {'MIRROR': 'default'}}
+REPLICAS_LECTURA = [f'replica_{numero}' for numero in range(1, len(REPLICAS_SQLITE) + 1)]
+# Segundos que un usuario lee de la principal después de escribir.
+REPLICAS_VENTANA_ESCRITURA = config('DB_REPLICAS_VENTANA_ESCRITURA', default=10, cast=int)
+DATABASE_ROUTERS = ['backTecho.replicas.RouterLecturaEscritura']
+
+# Caché de Django. Guarda la marca de escritura reciente de las réplicas, así que debe ser
+# compartida por todos los workers: por defecto, archivos en var/cache (workers de un mismo
+# servidor); con varios servidores, un backend de red (Redis, Memcached). Con réplicas, un
+# backend por proceso (LocMemCache, DummyCache) detiene el arranque.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': config('CACHE_LOCATION', default=str(BASE_DIR / 'var' / 'cache')),
     }
 }
 
@@ -119,21 +163,94 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.autenticacion.TokenCacheadoAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ]
 }
 
+# Paginación por cursor de los listados (filtrar_solicitudes, listar_usuarios).
+# Los clientes que no envían 'cursor' ni 'limit' reciben como máximo PAGINACION_LIMITE_MAXIMO filas.
+PAGINACION_LIMITE_POR_DEFECTO = 100
+PAGINACION_LIMITE_MAXIMO = 500
+
+# Entrega de documentos en ver_documento: 'django', 'x-accel-redirect' (nginx) o 'x-sendfile' (Apache).
+# Con 'x-accel-redirect', nginx debe tener una location 'internal' en DOCUMENTOS_X_ACCEL_PREFIJO
+# cuyo alias apunte a MEDIA_ROOT.
+DOCUMENTOS_ENTREGA = config('DOCUMENTOS_ENTREGA', default='django')
+DOCUMENTOS_X_ACCEL_PREFIJO = config('DOCUMENTOS_X_ACCEL_PREFIJO', default='/documentos-protegidos/')
+
+# Segundos durante los que no se borra un blob recién usado aunque no tenga referencias
+# (protege subidas concurrentes del mismo contenido). Los huérfanos se limpian con
+# 'manage.py deduplicar_documentos --purgar-huerfanos'.
+DOCUMENTOS_BLOB_GRACIA = 300
+
+# Formatos ya comprimidos que el ZIP de documentos de una solicitud guarda sin comprimir (STORED).
+DOCUMENTOS_ZIP_SIN_COMPRIMIR = (
+    '.docx', '.xlsx', '.pptx', '.odt', '.ods', '.png', '.jpg', '.jpeg', '.gif', '.webp',
+    '.zip', '.gz', '.rar', '.7z', '.mp3', '.mp4',
+)
+
+# Filas leídas por consulta en las exportaciones con stream=true.
+EXPORTACION_TAMANO_LOTE = 2000
+
+# Máximo de solicitudes por llamada a estado/masivo/ (una sola transacción).
+CAMBIO_MASIVO_MAXIMO = 1000
+
 AUTH_USER_MODEL = 'users.CustomUser'
 
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
-EMAIL_HOST = 'smtp.gmail.com'
-EMAIL_PORT = 587
-EMAIL_USE_TLS = True
+# Métricas Prometheus (backTecho/metricas.py) servidas en /metrics. El directorio debe ser
+# compartido por todos los workers y vaciarse al iniciar el servicio. Con METRICAS_TOKEN,
+# /metrics exige 'Authorization: Bearer <token>'; sin él, solo responde con DEBUG.
+METRICAS_DIRECTORIO = config('METRICAS_DIRECTORIO', default=str(BASE_DIR / 'var' / 'metricas'))
+METRICAS_INTERVALO_VOLCADO = 2
+METRICAS_TOKEN = config('METRICAS_TOKEN', default='')
+
+# Importación masiva de usuarios (importar_usuarios): procesos para calcular los hashes
+# (None = todos los núcleos), filas por INSERT y mínimo de filas para usar el pool.
+USUARIOS_IMPORTACION_PROCESOS = config('USUARIOS_IMPORTACION_PROCESOS', default=None, cast=lambda v: int(v) if v else None)
+USUARIOS_IMPORTACION_LOTE = 500
+USUARIOS_IMPORTACION_MINIMO_PARALELO = 20
+
+# Caché de tokens de TokenCacheadoAuthentication. Los workers detectan invalidaciones
+# por cambios en el archivo AUTH_TOKEN_CACHE_MARCA (debe ser compartido por todos ellos).
+AUTH_TOKEN_CACHE_MAX_ENTRADAS = 1024
+AUTH_TOKEN_CACHE_TTL = 60
+AUTH_TOKEN_CACHE_MARCA = config('AUTH_TOKEN_CACHE_MARCA', default=str(BASE_DIR / 'var' / 'auth_tokens.marca'))
+
+EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.smtp.EmailBackend')
+EMAIL_HOST = config('EMAIL_HOST', default='smtp.gmail.com')
+EMAIL_PORT = config('EMAIL_PORT', default=587, cast=int)
+EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=True, cast=bool)
 EMAIL_HOST_USER = config('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD')
+EMAIL_TIMEOUT = config('EMAIL_TIMEOUT', default=30, cast=int)
+
+# Bandeja de salida de correos (manage.py enviar_correos).
+# Para probar en local: EMAIL_HOST=localhost EMAIL_PORT=1025 EMAIL_USE_TLS=False
+# con un servidor SMTP de prueba escuchando en ese puerto.
+CORREOS_TAMANO_LOTE = 50
+CORREOS_MAX_INTENTOS = 5
+CORREOS_REINTENTO_BASE = 30       # segundos; se duplica en cada intento
+CORREOS_REINTENTO_MAXIMO = 3600
+# Segundos que un lote reclamado queda reservado para el proceso que lo envía; si ese proceso
+# muere, los correos vuelven a estar pendientes al vencer. Debe superar lo que tarda un lote.
+CORREOS_ARRIENDO = 600
+
+# Extracción de texto de documentos (solicitudes/extraccion.py, 'manage.py extraer_textos').
+TEXTOS_PROCESOS = config('TEXTOS_PROCESOS', default=None, cast=lambda v: int(v) if v else None)  # None = todos los núcleos
+TEXTOS_LOTE = 200
+TEXTOS_EXTENSIONES = ('.docx',)
+TEXTOS_MAXIMO_BYTES = 50 * 1024 * 1024       # XML descomprimido por parte del DOCX
+TEXTOS_MAXIMO_CARACTERES = 1_000_000         # texto guardado por documento
+
+# Feed de cambios (solicitudes/cambios.py), servido bajo ASGI en solicitudes/async/cambios/.
+CAMBIOS_INTERVALO_SONDEO = 1.0   # segundos entre consultas del sondeo compartido por proceso
+CAMBIOS_LOTE = 500               # cambios máximos por consulta y por respuesta
+CAMBIOS_BUFER = 2000             # cambios recientes en memoria para los suscriptores
+CAMBIOS_ESPERA_MAXIMA = 30       # segundos que espera un long-poll sin cambios
+CAMBIOS_LATIDO = 15              # segundos entre comentarios de keep-alive en SSE
 
 CORS_ALLOWED_ORIGINS = [
     "http://127.0.0.1:8001",
@@ -0,0 +1,21 @@
+# backTecho/sqlite.py
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+# Perfil de conexión para SQLite: aplica settings.SQLITE_PERFIL a cada conexión nueva.
+# journal_mode=wal queda guardado en el archivo; el resto de los PRAGMAs es por conexión.
+
+
+def aplicar_perfil(conexion, perfil=None):
+    perfil = settings.SQLITE_PERFIL if perfil is None else perfil
+    with conexion.cursor() as cursor:
+        for nombre, valor in perfil.items():
+            cursor.execute(f'PRAGMA {nombre} = {valor}')
+
+
+def _conexion_creada(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        aplicar_perfil(connection)
+
+
+connection_created.connect(_conexion_creada, dispatch_uid='backtecho_sqlite')
@@ -2,8 +2,10 @@
 
 from django.urls import path
 from django.urls import path, include
+from .metricas import vista_metricas
 
 urlpatterns = [
     path('api/auth/', include('users.urls')),
     path('solicitudes/', include('solicitudes.urls')),
+    path('metrics', vista_metricas, name='metricas'),
 ]
\ No newline at end of file
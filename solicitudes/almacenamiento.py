@@ -0,0 +1,100 @@
+# solicitudes/almacenamiento.py
+import hashlib
+import os
+import tempfile
+from django.core.files.storage import FileSystemStorage
+
+# Almacenamiento direccionado por contenido para DocumentoSolicitud: cada archivo se guarda una
+# sola vez en solicitud_archivos/blobs/<aa>/<bb>/<sha256>. Varias filas pueden apuntar al mismo
+# blob; el nombre original del archivo se conserva en DocumentoSolicitud.doc_nombre_original.
+
+PREFIJO_BLOBS = 'solicitud_archivos/blobs'
+
+
+def nombre_blob(sha256):
+    return f'{PREFIJO_BLOBS}/{sha256[:2]}/{sha256[2:4]}/{sha256}'
+
+
+def sha256_de_nombre(nombre):
+    # Devuelve el hash de un nombre de blob, o '' si el archivo no está en el almacén.
+    if not nombre or not nombre.startswith(PREFIJO_BLOBS + '/'):
+        return ''
+    sha256 = os.path.basename(nombre)
+    return sha256 if len(sha256) == 64 else ''
+
+
+class AlmacenamientoDeduplicado(FileSystemStorage):
+
+    def get_available_name(self, name, max_length=None):
+        # El nombre definitivo lo decide _save() a partir del contenido; nunca se agregan sufijos.
+        return name
+
+    def directorio_temporal(self):
+        # Los temporales viven en el mismo sistema de archivos que los blobs para poder moverlos con rename().
+        directorio = self.path(f'{PREFIJO_BLOBS}/tmp')
+        os.makedirs(directorio, exist_ok=True)
+        return directorio
+
+    def guardar_temporal(self, ruta_temporal, sha256):
+        # Mueve un temporal ya hasheado a su blob; si el blob existe solo se descarta el temporal.
+        return self._mover_temporal(ruta_temporal, sha256)[0]
+
+    def _mover_temporal(self, ruta_temporal, sha256):
+        # Devuelve (nombre, creado_ns): el mtime del blob si esta llamada lo creó, o None si
+        # ya existía. Con creado_ns, descartar_documentos puede borrar tras un rollback solo
+        # lo que nadie más reutilizó.
+        nombre = nombre_blob(sha256)
+        ruta_final = self.path(nombre)
+        while True:
+            try:
+                # Marca el blob como recién usado para que una liberación concurrente no lo borre
+                # (liberar_blob lo aparta antes de mirar el mtime; si ya no está, se usa el temporal).
+                os.utime(ruta_final)
+            except FileNotFoundError:
+                pass
+            else:
+                os.unlink(ruta_temporal)
+                return nombre, None
+            os.makedirs(os.path.dirname(ruta_final), exist_ok=True)
+            if self.file_permissions_mode is not None:
+                os.chmod(ruta_temporal, self.file_permissions_mode)
+            creado_ns = os.stat(ruta_temporal).st_mtime_ns
+            try:
+                # link() falla si el blob apareció entretanto: así se sabe quién lo creó.
+                os.link(ruta_temporal, ruta_final)
+            except FileExistsError:
+                continue
+            os.unlink(ruta_temporal)
+            return nombre, creado_ns
+
+    def _save(self, name, content):
+        # Subidas de SubidaDirectaHandler: el temporal ya está en este sistema de archivos y
+        # hasheado, basta con renombrarlo.
+        sha256 = getattr(content, 'sha256', None)
+        if sha256 and hasattr(content, 'temporary_file_path'):
+            ruta_temporal = content.temporary_file_path()
+            if os.path.dirname(ruta_temporal) == self.directorio_temporal() and os.path.exists(ruta_temporal):
+                nombre, content.blob_creado_ns = self._mover_temporal(ruta_temporal, sha256)
+                return nombre
+
+        # Resto de archivos: una sola pasada que escribe el temporal mientras calcula el SHA-256.
+        descriptor, ruta_temporal = tempfile.mkstemp(dir=self.directorio_temporal())
+        try:
+            hasher = hashlib.sha256()
+            with os.fdopen(descriptor, 'wb') as destino:
+                for bloque in content.chunks():
+                    hasher.update(bloque)
+                    destino.write(bloque)
+            nombre, content.blob_creado_ns = self._mover_temporal(ruta_temporal, hasher.hexdigest())
+            return nombre
+        except BaseException:
+            if os.path.exists(ruta_temporal):
+                os.unlink(ruta_temporal)
+            raise
+
+
+almacenamiento_documentos = AlmacenamientoDeduplicado()
+
+
+def obtener_almacenamiento_documentos():
+    return almacenamiento_documentos
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class SolicitudesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'solicitudes'
+
+    def ready(self):
+        from backTecho import sqlite  # noqa: F401
+        from . import signals  # noqa: F401
+        from backTecho.replicas import verificar_configuracion
+        verificar_configuracion()
@@ -0,0 +1,213 @@
+# solicitudes/busqueda.py
+import re
+from django.conf import settings
+from django.db import connection, connections, router, transaction
+from .filtros import FiltroInvalido, filtrar_solicitudes_por
+from .models import SolicitudAyuda
+
+# Búsqueda de texto completo con SQLite FTS5 sobre títulos, descripciones, observaciones
+# de bitácora y el texto extraído de los documentos (TextoDocumento). El índice lo mantienen
+# triggers, así también lo actualizan bulk_create, update() y los borrados en cascada.
+# rowid = id * 4 + tipo, para que cada fila del índice apunte a su origen sin una tabla
+# intermedia.
+
+TABLA = 'solicitudes_busqueda'
+TIPO_SOLICITUD = 0
+TIPO_BITACORA = 1
+TIPO_DOCUMENTO = 2
+TIPOS = {TIPO_SOLICITUD: 'solicitud', TIPO_BITACORA: 'bitacora', TIPO_DOCUMENTO: 'documento'}
+
+CREAR_TABLA = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA} USING fts5(
+        titulo, contenido, sca_id UNINDEXED, tipo UNINDEXED,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )
+"""
+
+# Las migraciones que reconstruyen una tabla en SQLite borran sus triggers; el comando
+# reconstruir_busqueda los vuelve a crear. Las migraciones 0006 y 0010 guardan su propia
+# copia de este SQL: un cambio aquí necesita además una migración nueva.
+TRIGGERS = {
+    'solicitudes_busqueda_sca_ai': f"""
+        AFTER INSERT ON solicitudes_solicitudayuda BEGIN
+            INSERT INTO {TABLA} (rowid, titulo, contenido, sca_id, tipo)
+            VALUES (new.sca_id * 4, new.sca_titulo, new.sca_descripcion, new.sca_id, {TIPO_SOLICITUD});
+        END
+    """,
+    'solicitudes_busqueda_sca_au': f"""
+        AFTER UPDATE OF sca_titulo, sca_descripcion ON solicitudes_solicitudayuda BEGIN
+            UPDATE {TABLA} SET titulo = new.sca_titulo, contenido = new.sca_descripcion
+            WHERE rowid = new.sca_id * 4;
+        END
+    """,
+    'solicitudes_busqueda_sca_ad': f"""
+        AFTER DELETE ON solicitudes_solicitudayuda BEGIN
+            DELETE FROM {TABLA} WHERE rowid = old.sca_id * 4;
+        END
+    """,
+    'solicitudes_busqueda_bsca_ai': f"""
+        AFTER INSERT ON solicitudes_bitacorasolicitud BEGIN
+            INSERT INTO {TABLA} (rowid, titulo, contenido, sca_id, tipo)
+            VALUES (new.bsca_id * 4 + {TIPO_BITACORA}, '', new.bsca_observacion, new.sca_id_id, {TIPO_BITACORA});
+        END
+    """,
+    'solicitudes_busqueda_bsca_au': f"""
+        AFTER UPDATE OF bsca_observacion ON solicitudes_bitacorasolicitud BEGIN
+            UPDATE {TABLA} SET contenido = new.bsca_observacion WHERE rowid = new.bsca_id * 4 + {TIPO_BITACORA};
+        END
+    """,
+    'solicitudes_busqueda_bsca_ad': f"""
+        AFTER DELETE ON solicitudes_bitacorasolicitud BEGIN
+            DELETE FROM {TABLA} WHERE rowid = old.bsca_id * 4 + {TIPO_BITACORA};
+        END
+    """,
+}
+
+# Documentos: el título es el nombre original del archivo.
+_INSERTAR_DOCUMENTO = f"""
+    INSERT INTO {TABLA} (rowid, titulo, contenido, sca_id, tipo)
+    SELECT d.doc_id * 4 + {TIPO_DOCUMENTO}, d.doc_nombre_original, new.tdo_texto, d.solicitud_id, {TIPO_DOCUMENTO}
+    FROM solicitudes_documentosolicitud d
+    WHERE d.doc_id = new.documento_id AND new.tdo_texto != '';
+"""
+TRIGGERS_DOCUMENTOS = {
+    'solicitudes_busqueda_tdo_ai': f"""
+        AFTER INSERT ON solicitudes_textodocumento BEGIN
+            {_INSERTAR_DOCUMENTO}
+        END
+    """,
+    'solicitudes_busqueda_tdo_au': f"""
+        AFTER UPDATE OF tdo_texto ON solicitudes_textodocumento BEGIN
+            DELETE FROM {TABLA} WHERE rowid = old.documento_id * 4 + {TIPO_DOCUMENTO};
+            {_INSERTAR_DOCUMENTO}
+        END
+    """,
+    'solicitudes_busqueda_tdo_ad': f"""
+        AFTER DELETE ON solicitudes_textodocumento BEGIN
+            DELETE FROM {TABLA} WHERE rowid = old.documento_id * 4 + {TIPO_DOCUMENTO};
+        END
+    """,
+}
+
+POBLAR = [
+    f"""
+    INSERT INTO {TABLA} (rowid, titulo, contenido, sca_id, tipo)
+    SELECT sca_id * 4, sca_titulo, sca_descripcion, sca_id, {TIPO_SOLICITUD} FROM solicitudes_solicitudayuda
+    """,
+    f"""
+    INSERT INTO {TABLA} (rowid, titulo, contenido, sca_id, tipo)
+    SELECT bsca_id * 4 + {TIPO_BITACORA}, '', bsca_observacion, sca_id_id, {TIPO_BITACORA}
+    FROM solicitudes_bitacorasolicitud
+    """,
+]
+POBLAR_DOCUMENTOS = [
+    f"""
+    INSERT INTO {TABLA} (rowid, titulo, contenido, sca_id, tipo)
+    SELECT d.doc_id * 4 + {TIPO_DOCUMENTO}, d.doc_nombre_original, t.tdo_texto, d.solicitud_id, {TIPO_DOCUMENTO}
+    FROM solicitudes_textodocumento t JOIN solicitudes_documentosolicitud d ON d.doc_id = t.documento_id
+    WHERE t.tdo_texto != ''
+    """,
+]
+
+
+def sql_crear_triggers(triggers):
+    return [f'CREATE TRIGGER IF NOT EXISTS {nombre} {cuerpo}' for nombre, cuerpo in triggers.items()]
+
+
+def sql_eliminar_triggers(triggers):
+    return [f'DROP TRIGGER IF EXISTS {nombre}' for nombre in triggers]
+
+
+def sql_crear():
+    return [CREAR_TABLA] + sql_crear_triggers(TRIGGERS)
+
+
+def sql_eliminar():
+    return sql_eliminar_triggers(TRIGGERS) + [f'DROP TABLE IF EXISTS {TABLA}']
+
+
+def reconstruir():
+    # Recrea tabla y triggers si faltan y vuelve a indexar todas las filas.
+    with transaction.atomic(), connection.cursor() as cursor:
+        for sql in sql_crear() + sql_crear_triggers(TRIGGERS_DOCUMENTOS):
+            cursor.execute(sql)
+        cursor.execute(f'DELETE FROM {TABLA}')
+        for sql in POBLAR + POBLAR_DOCUMENTOS:
+            cursor.execute(sql)
+        cursor.execute(f"INSERT INTO {TABLA} ({TABLA}) VALUES ('optimize')")
+        cursor.execute(f'SELECT count(*) FROM {TABLA}')
+        return cursor.fetchone()[0]
+
+
+_TERMINO = re.compile(r'(\w+)(\*?)')
+
+
+def consulta_fts(texto):
+    # Convierte el texto del usuario en una consulta FTS5 segura: cada palabra va entre
+    # comillas (sin operadores ni sintaxis de columnas) y 'pala*' se conserva como prefijo.
+    terminos = [f'"{palabra}"{asterisco}' for palabra, asterisco in _TERMINO.findall(str(texto or ''))]
+    if not terminos:
+        raise FiltroInvalido("El campo 'q' debe contener al menos una palabra.")
+    return ' '.join(terminos)
+
+
+def _entero(valor, nombre, por_defecto, maximo):
+    if valor in (None, ''):
+        return por_defecto
+    try:
+        valor = int(valor)
+    except (TypeError, ValueError):
+        raise FiltroInvalido(f"El parámetro '{nombre}' debe ser un número entero.")
+    if valor < 0:
+        raise FiltroInvalido(f"El parámetro '{nombre}' no puede ser negativo.")
+    return min(valor, maximo)
+
+
+def buscar(filtros):
+    # Devuelve [(sca_id, relevancia, fragmentos)] ordenado por bm25, aplicando los mismos
+    # filtros de estado, fechas y solicitante que filtrar_solicitudes.
+    consulta = consulta_fts(filtros.get('q'))
+    limite = _entero(filtros.get('limit'), 'limit', settings.PAGINACION_LIMITE_POR_DEFECTO, settings.PAGINACION_LIMITE_MAXIMO)
+    desplazamiento = _entero(filtros.get('offset'), 'offset', 0, 10 ** 9)
+
+    candidatas = filtrar_solicitudes_por(SolicitudAyuda.objects.all(), filtros)
+    sql_candidatas, parametros_candidatas = candidatas.values('sca_id').query.sql_with_params()
+
+    # SQL crudo: se elige la base como lo haría el ORM, para que @solo_lectura la envíe a una réplica.
+    with connections[router.db_for_read(SolicitudAyuda)].cursor() as cursor:
+        # bm25 es menor cuanto más relevante; el título pesa más que el contenido. El CTE
+        # materializado evita que SQLite aplane la subconsulta (bm25 no puede ir dentro de MIN).
+        cursor.execute(
+            f"""
+            WITH coincidencias AS MATERIALIZED (
+                SELECT sca_id, bm25({TABLA}, 5.0, 1.0) AS puntaje
+                FROM {TABLA}
+                WHERE {TABLA} MATCH %s AND sca_id IN ({sql_candidatas})
+            )
+            SELECT sca_id, MIN(puntaje) AS puntaje
+            FROM coincidencias
+            GROUP BY sca_id
+            ORDER BY puntaje, sca_id
+            LIMIT %s OFFSET %s
+            """,
+            [consulta, *parametros_candidatas, limite, desplazamiento]
+        )
+        ranking = cursor.fetchall()
+        if not ranking:
+            return []
+
+        ids = [sca_id for sca_id, _ in ranking]
+        cursor.execute(
+            f"""
+            SELECT sca_id, tipo, snippet({TABLA}, -1, '<b>', '</b>', '…', 12)
+            FROM {TABLA}
+            WHERE {TABLA} MATCH %s AND sca_id IN ({', '.join(['%s'] * len(ids))})
+            ORDER BY sca_id, rank
+            """,
+            [consulta, *ids]
+        )
+        fragmentos = {}
+        for sca_id, tipo, texto in cursor.fetchall():
+            fragmentos.setdefault(sca_id, []).append({"tipo": TIPOS.get(tipo, tipo), "texto": texto})
+
+    return [(sca_id, -puntaje, fragmentos.get(sca_id, [])) for sca_id, puntaje in ranking]
@@ -0,0 +1,154 @@
+# solicitudes/cambios.py
+import asyncio
+import bisect
+import logging
+import weakref
+from django.conf import settings
+from .models import CambioSolicitud
+
+# Feed de cambios de solicitudes (CambioSolicitud), consumido como long-poll o Server-Sent
+# Events desde vistas_async.py.
+#
+# Con SQLite las escrituras se serializan (transacciones IMMEDIATE) y cso_id es AUTOINCREMENT,
+# así que la secuencia se confirma en orden: un cliente que vio el cambio N ya vio todos los
+# anteriores. Cada proceso tiene un solo Difusor y, por event loop, una tarea que consulta la
+# tabla cada CAMBIOS_INTERVALO_SONDEO segundos mientras haya suscriptores y guarda los cambios
+# recientes en memoria; los suscriptores solo esperan una condición, de modo que miles de
+# conexiones inactivas cuestan una consulta por intervalo en total.
+
+logger = logging.getLogger(__name__)
+
+
+def registrar(solicitud, tipo, **datos):
+    CambioSolicitud.objects.create(sca_id=solicitud, cso_tipo=tipo, cso_datos=datos)
+
+
+def registrar_varios(cambios):
+    # [(solicitud, tipo, datos)] con un solo INSERT.
+    CambioSolicitud.objects.bulk_create([
+        CambioSolicitud(sca_id=solicitud, cso_tipo=tipo, cso_datos=datos) for solicitud, tipo, datos in cambios
+    ])
+
+
+def serializar_cambio(cambio):
+    return {
+        "seq": cambio.cso_id,
+        "tipo": cambio.cso_tipo,
+        "solicitud_id": cambio.sca_id_id,
+        "datos": cambio.cso_datos,
+        "fecha": cambio.cso_fecha,
+    }
+
+
+async def leer_desde(desde, limite):
+    queryset = CambioSolicitud.objects.filter(cso_id__gt=desde).order_by('cso_id')[:limite]
+    return [serializar_cambio(cambio) async for cambio in queryset]
+
+
+async def ultima_secuencia():
+    return await CambioSolicitud.objects.order_by('-cso_id').values_list('cso_id', flat=True).afirst() or 0
+
+
+class _Canal:
+    # Estado del difusor en un event loop: las primitivas de asyncio no se pueden compartir
+    # entre loops.
+
+    def __init__(self):
+        self.tarea = None
+        self.suscriptores = 0
+        self.bufer = []      # cambios serializados con seq > base, en orden
+        self.base = 0
+        self.ultimo = 0
+        self.condicion = asyncio.Condition()
+        self.listo = asyncio.Event()
+        self.despertar = asyncio.Event()
+
+
+class Difusor:
+    # Un canal por event loop. Bajo ASGI hay un solo loop por proceso y por lo tanto una sola
+    # tarea de sondeo; bajo WSGI/runserver cada vista async corre en su propio loop y hace su
+    # propio sondeo, sin pisar el estado de las demás.
+
+    def __init__(self):
+        self._canales = weakref.WeakKeyDictionary()
+
+    def _canal(self):
+        loop = asyncio.get_running_loop()
+        canal = self._canales.get(loop)
+        if canal is None:
+            canal = self._canales[loop] = _Canal()
+        return canal
+
+    async def _asegurar(self, canal):
+        if canal.tarea is None:
+            canal.listo.clear()
+            canal.tarea = asyncio.get_running_loop().create_task(self._sondear(canal))
+        await canal.listo.wait()
+
+    async def _sondear(self, canal):
+        try:
+            canal.ultimo = canal.base = await ultima_secuencia()
+            canal.bufer = []
+            canal.listo.set()
+            while canal.suscriptores:
+                try:
+                    nuevos = await leer_desde(canal.ultimo, settings.CAMBIOS_LOTE)
+                except Exception:
+                    logger.exception("Error al leer el feed de cambios; se reintenta en el próximo intervalo.")
+                    nuevos = []
+                if nuevos:
+                    canal.bufer.extend(nuevos)
+                    exceso = len(canal.bufer) - settings.CAMBIOS_BUFER
+                    if exceso > 0:
+                        canal.base = canal.bufer[exceso - 1]['seq']
+                        del canal.bufer[:exceso]
+                    canal.ultimo = nuevos[-1]['seq']
+                    async with canal.condicion:
+                        canal.condicion.notify_all()
+                    if len(nuevos) == settings.CAMBIOS_LOTE:
+                        continue
+                canal.despertar.clear()
+                try:
+                    await asyncio.wait_for(canal.despertar.wait(), settings.CAMBIOS_INTERVALO_SONDEO)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            canal.listo.set()   # si falló la primera lectura, que nadie quede esperando
+            canal.tarea = None
+
+    async def siguientes(self, desde, espera):
+        # Cambios con seq > desde (como mucho CAMBIOS_LOTE); si no hay, espera hasta 'espera'
+        # segundos a que llegue alguno y devuelve [] al vencer el plazo.
+        loop = asyncio.get_running_loop()
+        limite = loop.time() + espera
+        canal = self._canal()
+        canal.suscriptores += 1
+        try:
+            await self._asegurar(canal)
+            while True:
+                if desde < canal.base:
+                    # Más antiguo que el búfer: se lee de la tabla. Lo que falte hasta base
+                    # no existe (la secuencia se confirma en orden).
+                    cambios = await leer_desde(desde, settings.CAMBIOS_LOTE)
+                    if cambios:
+                        return cambios
+                    desde = canal.base
+                else:
+                    inicio = bisect.bisect_right(canal.bufer, desde, key=lambda cambio: cambio['seq'])
+                    if inicio < len(canal.bufer):
+                        return canal.bufer[inicio:inicio + settings.CAMBIOS_LOTE]
+                restante = limite - loop.time()
+                if restante <= 0:
+                    return []
+                async with canal.condicion:
+                    try:
+                        await asyncio.wait_for(canal.condicion.wait_for(lambda: canal.ultimo > desde), restante)
+                    except asyncio.TimeoutError:
+                        return []
+        finally:
+            canal.suscriptores -= 1
+            if not canal.suscriptores and canal.tarea is not None:
+                canal.despertar.set()
+
+
+difusor = Difusor()
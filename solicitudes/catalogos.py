@@ -0,0 +1,70 @@
+# solicitudes/catalogos.py
+import threading
+from django.db.models import F
+from .models import EstadoSolicitud, VersionCatalogo
+from users.models import TipoUsuario
+
+# Caché en memoria (por proceso) de los catálogos pequeños. Cada lectura consulta solo el
+# contador de versión en la base de datos; si otro proceso lo incrementó, se recarga el catálogo.
+# Así todos los workers ven los cambios en su siguiente petición sin un servicio de caché externo.
+
+
+class CatalogoCacheado:
+
+    def __init__(self, nombre, cargar):
+        self.nombre = nombre
+        self._cargar = cargar
+        self._version = None
+        self._datos = None
+        self._lock = threading.Lock()
+
+    def _version_actual(self):
+        version = VersionCatalogo.objects.filter(pk=self.nombre).values_list('vca_version', flat=True).first()
+        return version or 0
+
+    def obtener_con_version(self):
+        # (datos, versión) con una sola consulta; la versión sirve como validador HTTP.
+        version = self._version_actual()
+        with self._lock:
+            if self._datos is None or self._version != version:
+                self._datos = self._cargar()
+                self._version = version
+            return self._datos, version
+
+    def obtener(self):
+        return self.obtener_con_version()[0]
+
+    def limpiar(self):
+        # Descarta la copia local (solo este proceso); usado por las pruebas.
+        with self._lock:
+            self._datos = None
+            self._version = None
+
+    def invalidar(self):
+        # Lo llaman las señales de solicitudes/signals.py al confirmarse cada cambio. La fila la
+        # crea la migración 0011; un catálogo nuevo necesita su propia fila sembrada.
+        VersionCatalogo.objects.filter(pk=self.nombre).update(vca_version=F('vca_version') + 1)
+
+
+estados = CatalogoCacheado(
+    'estado_solicitud',
+    lambda: {estado.est_id: estado for estado in EstadoSolicitud.objects.order_by('est_id')}
+)
+tipos_usuario = CatalogoCacheado(
+    'tipo_usuario',
+    lambda: {tipo.tiu_id: tipo for tipo in TipoUsuario.objects.order_by('tiu_id')}
+)
+
+
+def obtener_estado(est_id):
+    try:
+        return estados.obtener()[int(est_id)]
+    except (KeyError, TypeError, ValueError):
+        raise EstadoSolicitud.DoesNotExist(f"No existe el estado de solicitud con ID {est_id}.")
+
+
+def obtener_tipo_usuario(tiu_id):
+    try:
+        return tipos_usuario.obtener()[int(tiu_id)]
+    except (KeyError, TypeError, ValueError):
+        raise TipoUsuario.DoesNotExist(f"No existe el tipo de usuario con ID {tiu_id}.")
@@ -0,0 +1,75 @@
+# solicitudes/condicional.py
+import hashlib
+import json
+from django.db.models import Count, Max
+from django.http import HttpResponseNotModified
+from django.utils.http import parse_etags
+from .models import BitacoraSolicitud
+from users.autenticacion import marca_usuarios
+
+# ETag de los listados que el front-end consulta periódicamente. El validador se calcula con
+# agregados (última actualización y cantidad de filas del filtro, sin serializarlas) y
+# los parámetros de la petición; si coincide con If-None-Match se responde 304 sin cuerpo.
+# Estos POST son lecturas, por eso aceptan If-None-Match igual que un GET.
+
+# Subir si cambia el formato de las respuestas, para invalidar las copias de los clientes.
+VERSION_FORMATO = 1
+
+
+def _parametros(datos):
+    if hasattr(datos, 'getlist'):
+        return {clave: datos.getlist(clave) for clave in datos}
+    return datos
+
+
+def calcular_etag(*partes):
+    contenido = json.dumps([VERSION_FORMATO, *partes], sort_keys=True, default=str)
+    return '"%s"' % hashlib.sha256(contenido.encode()).hexdigest()[:32]
+
+
+def agregados(queryset, campo_fecha, pk, documentos=False):
+    # Una sola consulta por listado. Con documentos, el JOIN suma su última actualización y
+    # cantidad (el queryset no debe tener otros JOIN a relaciones múltiples).
+    if not documentos:
+        return queryset.aggregate(ultima=Max(campo_fecha), total=Count(pk))
+    return queryset.aggregate(
+        ultima=Max(campo_fecha), total=Count(pk, distinct=True),
+        doc_ultima=Max('documentos__doc_fecha_actualizacion'), doc_total=Count('documentos__doc_id')
+    )
+
+
+def etag_listado(request, datos, *partes):
+    # Incluye la marca de usuarios: las filas muestran email, RUT o teléfono del usuario.
+    return calcular_etag(request.path, _parametros(datos), marca_usuarios(), *partes)
+
+
+def etag_solicitudes(request, datos, queryset, campos):
+    return etag_listado(
+        request, datos, agregados(queryset, 'sca_fecha_actualizacion', 'sca_id', documentos='documentos' in campos)
+    )
+
+
+def etag_bitacora(request, datos, solicitud_id):
+    queryset = BitacoraSolicitud.objects.filter(sca_id=solicitud_id)
+    return etag_listado(request, datos, agregados(queryset, 'bsca_fecha_actualizacion', 'bsca_id', documentos=True))
+
+
+def no_modificado(request, etag):
+    # None si hay que construir la respuesta; si no, el 304 listo para devolver.
+    encabezado = request.headers.get('If-None-Match')
+    if not encabezado:
+        return None
+    etags = parse_etags(encabezado)
+    if '*' in etags or etag.strip('"') in {e.removeprefix('W/').strip('"') for e in etags}:
+        # HttpResponse de Django: sirve igual en las vistas DRF y en las async.
+        respuesta = HttpResponseNotModified()
+        respuesta['ETag'] = etag
+        return respuesta
+    return None
+
+
+def con_etag(respuesta, etag):
+    respuesta['ETag'] = etag
+    # Sin caché compartida (las respuestas dependen del token) y siempre revalidadas.
+    respuesta['Cache-Control'] = 'private, no-cache'
+    return respuesta
@@ -0,0 +1,145 @@
+# solicitudes/consultas.py
+from django.db.models import Prefetch, Q
+from .filtros import FiltroInvalido, leer_fecha
+from .models import SolicitudAyuda, DocumentoSolicitud, BitacoraSolicitud
+
+# Capa de consultas compartida por las vistas de listado.
+# Cada queryset carga el resultado completo en un número fijo de consultas:
+# un JOIN para las relaciones 1-a-1 y un único fetch por lotes para los documentos.
+
+
+def _documentos_prefetch():
+    return Prefetch(
+        'documentos',
+        queryset=DocumentoSolicitud.objects.only('doc_id', 'doc_archivo', 'solicitud_id', 'bitacora_id').order_by('doc_id')
+    )
+
+
+def solicitudes_con_relaciones(queryset=None):
+    if queryset is None:
+        queryset = SolicitudAyuda.objects.all()
+    return queryset.select_related('solicitante').prefetch_related(_documentos_prefetch())
+
+
+def bitacora_con_relaciones(queryset=None):
+    if queryset is None:
+        queryset = BitacoraSolicitud.objects.all()
+    return queryset.select_related('usuario').prefetch_related(_documentos_prefetch())
+
+
+def bitacora_desde(queryset, datos):
+    # Solo las entradas posteriores a 'since_bsca_id' (la última que ya tiene el cliente) y/o a
+    # la fecha-hora 'since'. Devuelve (queryset, incremental).
+    since_bsca_id = datos.get('since_bsca_id')
+    since = datos.get('since')
+    if since_bsca_id not in (None, ''):
+        try:
+            since_bsca_id = int(since_bsca_id)
+        except (TypeError, ValueError):
+            raise FiltroInvalido("El parámetro 'since_bsca_id' debe ser un número entero.")
+        ultima = BitacoraSolicitud.objects.filter(pk=since_bsca_id).values_list('bsca_fecha_creacion', flat=True).first()
+        if ultima is None:
+            raise FiltroInvalido("El parámetro 'since_bsca_id' no corresponde a un registro de bitácora.")
+        # (fecha, id) > (ultima, since_bsca_id); el __gte redundante deja a SQLite recorrer solo
+        # el tramo nuevo de bsca_solicitud_fecha_idx.
+        queryset = queryset.filter(
+            Q(bsca_fecha_creacion__gt=ultima) | Q(bsca_fecha_creacion=ultima, bsca_id__gt=since_bsca_id),
+            bsca_fecha_creacion__gte=ultima
+        )
+    if since not in (None, ''):
+        queryset = queryset.filter(bsca_fecha_creacion__gt=leer_fecha(since, 'since'))
+    return queryset, since_bsca_id not in (None, '') or since not in (None, '')
+
+
+def serializar_documentos(documentos, request):
+    return [
+        {
+            "doc_id": doc.doc_id,
+            "url_archivo": request.build_absolute_uri(doc.doc_archivo.url) if doc.doc_archivo else None
+        }
+        for doc in documentos
+    ]
+
+
+# Campos de serializar_solicitud: nombre -> (columnas que necesita, función que lo obtiene).
+# 'solicitante__*' implica un JOIN con users_customuser y 'documentos' la consulta de prefetch.
+CAMPOS_SOLICITUD = {
+    "sca_id": (['sca_id'], lambda s, request: s.sca_id),
+    "id_solicitante": (['solicitante_id'], lambda s, request: s.solicitante_id),
+    'rut': (['solicitante__rut'], lambda s, request: s.solicitante.rut),
+    'telefono': (['solicitante__telefono'], lambda s, request: s.solicitante.telefono),
+    "sca_titulo": (['sca_titulo'], lambda s, request: s.sca_titulo),
+    'sca_descripcion': (['sca_descripcion'], lambda s, request: s.sca_descripcion),
+    "estado": (['est_id'], lambda s, request: s.est_id_id),
+    "solicitante_email": (['solicitante__email'], lambda s, request: s.solicitante.email),
+    "sca_fecha_creacion": (['sca_fecha_creacion'], lambda s, request: s.sca_fecha_creacion),
+    "documentos": ([], lambda s, request: serializar_documentos(s.documentos.all(), request)),
+}
+
+PRESETS_SOLICITUD = {
+    'resumen': ['sca_id', 'sca_titulo', 'estado', 'sca_fecha_creacion'],
+    'completo': list(CAMPOS_SOLICITUD),
+}
+
+
+def leer_campos_solicitud(valor):
+    # 'fields' admite una lista o un texto separado por comas, con nombres de campos y/o
+    # presets. Sin 'fields' se devuelve la fila completa, como antes.
+    if not valor:
+        return PRESETS_SOLICITUD['completo']
+    if isinstance(valor, str):
+        valor = valor.split(',')
+    pedidos = set()
+    for nombre in (str(v).strip() for v in valor):
+        if nombre in PRESETS_SOLICITUD:
+            pedidos.update(PRESETS_SOLICITUD[nombre])
+        elif nombre in CAMPOS_SOLICITUD:
+            pedidos.add(nombre)
+        elif nombre:
+            opciones = ', '.join(list(PRESETS_SOLICITUD) + list(CAMPOS_SOLICITUD))
+            raise FiltroInvalido(f"El campo '{nombre}' no existe. Opciones: {opciones}.")
+    return [campo for campo in CAMPOS_SOLICITUD if campo in pedidos]
+
+
+def solicitudes_proyectadas(queryset, campos):
+    # Como solicitudes_con_relaciones, pero leyendo solo las columnas de 'campos': sin JOIN
+    # si no se pide nada del solicitante y sin prefetch si no se piden documentos.
+    # sca_id y sca_fecha_creacion se leen siempre (son la clave del cursor).
+    columnas = {'sca_id', 'sca_fecha_creacion'}
+    for campo in campos:
+        columnas.update(CAMPOS_SOLICITUD[campo][0])
+    if any(columna.startswith('solicitante__') for columna in columnas):
+        queryset = queryset.select_related('solicitante')
+    if 'documentos' in campos:
+        queryset = queryset.prefetch_related(_documentos_prefetch())
+    return queryset.only(*columnas)
+
+
+def serializar_solicitud(solicitud, request, campos=None):
+    if campos is None:
+        campos = CAMPOS_SOLICITUD
+    return {campo: CAMPOS_SOLICITUD[campo][1](solicitud, request) for campo in campos}
+
+
+def serializar_registro_bitacora(registro, request):
+    return {
+        "bsca_id": registro.bsca_id,
+        "observacion": registro.bsca_observacion,
+        "usuario_email": registro.usuario.email if registro.usuario else "Usuario eliminado",
+        "fecha_creacion": registro.bsca_fecha_creacion,
+        "documentos_adjuntos": serializar_documentos(registro.documentos.all(), request)
+    }
+
+
+def serializar_usuario(usuario):
+    return {
+        "id": usuario.id,
+        "email": usuario.email,
+        "rut": usuario.rut,
+        "nombre": usuario.first_name,
+        "apellido_paterno": usuario.last_name,
+        "apellido_materno": usuario.apellido_materno,
+        "tipo_usuario": usuario.tiu_id.tiu_nombre if usuario.tiu_id else None,
+        "es_staff": usuario.is_staff,
+        "esta_activo": usuario.is_active
+    }
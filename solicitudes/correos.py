@@ -0,0 +1,104 @@
+# solicitudes/correos.py
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+from .models import CorreoPendiente
+
+# Envío diferido de notificaciones. Las vistas solo insertan filas en CorreoPendiente;
+# el comando 'manage.py enviar_correos' las despacha por lotes sobre una sola conexión SMTP.
+# Pueden correr varios comandos a la vez: cada uno reclama su lote antes de enviarlo.
+
+
+def encolar_correo(asunto, mensaje, destinatarios, remitente=None):
+    # Si se llama dentro de transaction.atomic() la fila se confirma (o se descarta) junto
+    # con el cambio que originó la notificación.
+    return CorreoPendiente.objects.create(
+        cop_asunto=asunto,
+        cop_mensaje=mensaje,
+        cop_remitente=remitente or settings.EMAIL_HOST_USER,
+        cop_destinatarios=list(destinatarios)
+    )
+
+
+def _espera_reintento(intentos):
+    segundos = settings.CORREOS_REINTENTO_BASE * 2 ** (intentos - 1)
+    return timedelta(seconds=min(segundos, settings.CORREOS_REINTENTO_MAXIMO))
+
+
+def _registrar_fallo(correo, error, max_intentos):
+    correo.cop_intentos += 1
+    correo.cop_ultimo_error = str(error)[:1000]
+    if correo.cop_intentos >= max_intentos:
+        correo.cop_estado = CorreoPendiente.FALLIDO
+    else:
+        correo.cop_proximo_intento = timezone.now() + _espera_reintento(correo.cop_intentos)
+    correo.save(update_fields=['cop_intentos', 'cop_ultimo_error', 'cop_estado', 'cop_proximo_intento'])
+
+
+def reclamar_lote(tamano_lote):
+    # Con transaction_mode IMMEDIATE, atomic() toma el bloqueo de escritura: dos procesos no
+    # pueden leer el mismo lote. Se reserva moviendo cop_proximo_intento al fin del arriendo,
+    # así los demás no lo ven vencido mientras se envía.
+    ahora = timezone.now()
+    with transaction.atomic():
+        lote = list(
+            CorreoPendiente.objects
+            .filter(cop_estado=CorreoPendiente.PENDIENTE, cop_proximo_intento__lte=ahora)
+            .order_by('cop_proximo_intento', 'cop_id')[:tamano_lote]
+        )
+        arriendo = ahora + timedelta(seconds=settings.CORREOS_ARRIENDO)
+        CorreoPendiente.objects.filter(pk__in=[correo.pk for correo in lote]).update(cop_proximo_intento=arriendo)
+    for correo in lote:
+        correo.cop_proximo_intento = arriendo
+    return lote
+
+
+def procesar_pendientes(tamano_lote=None, max_intentos=None):
+    # Envía un lote de correos vencidos reutilizando una conexión. Devuelve (enviados, fallidos).
+    tamano_lote = tamano_lote or settings.CORREOS_TAMANO_LOTE
+    max_intentos = max_intentos or settings.CORREOS_MAX_INTENTOS
+
+    lote = reclamar_lote(tamano_lote)
+    if not lote:
+        return 0, 0
+
+    conexion = get_connection(fail_silently=False)
+    try:
+        conexion.open()
+    except Exception as e:
+        for correo in lote:
+            _registrar_fallo(correo, e, max_intentos)
+        return 0, len(lote)
+
+    enviados, con_error = [], []
+    try:
+        for correo in lote:
+            mensaje = EmailMessage(
+                correo.cop_asunto, correo.cop_mensaje, correo.cop_remitente, correo.cop_destinatarios,
+                connection=conexion
+            )
+            try:
+                if not conexion.send_messages([mensaje]):
+                    raise RuntimeError("El servidor no aceptó el mensaje.")
+                enviados.append(correo.cop_id)
+            except Exception as e:
+                con_error.append(correo.cop_id)
+                _registrar_fallo(correo, e, max_intentos)
+                # La conexión puede haber quedado inutilizable; se reabre para el resto del lote.
+                # Si no se puede, los correos restantes siguen pendientes para la próxima vuelta.
+                try:
+                    conexion.close()
+                    conexion.open()
+                except Exception:
+                    break
+    finally:
+        conexion.close()
+        CorreoPendiente.objects.filter(pk__in=enviados).update(
+            cop_estado=CorreoPendiente.ENVIADO, cop_fecha_envio=timezone.now()
+        )
+        # Los que no se llegaron a intentar se liberan para la próxima vuelta.
+        sin_intentar = [correo.cop_id for correo in lote if correo.cop_id not in enviados and correo.cop_id not in con_error]
+        CorreoPendiente.objects.filter(pk__in=sin_intentar).update(cop_proximo_intento=timezone.now())
+    return len(enviados), len(con_error)
@@ -0,0 +1,114 @@
+# solicitudes/documentos.py
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import transaction
+from .almacenamiento import almacenamiento_documentos, sha256_de_nombre
+from .extraccion import encolar_extraccion
+from .models import DocumentoSolicitud
+
+# Ciclo de vida de los archivos de DocumentoSolicitud sobre el almacén deduplicado.
+# El conteo de referencias de un blob es el número de filas de DocumentoSolicitud con su hash.
+
+
+def preparar_documentos(archivos, **campos):
+    # Guarda los archivos en el almacén y devuelve instancias aún sin insertar, para llamar
+    # a bulk_create dentro de la transacción. Se hace antes de abrir la transacción para no
+    # mantener el bloqueo de escritura de SQLite mientras se mueven archivos.
+    documentos = []
+    for archivo in archivos:
+        nombre = almacenamiento_documentos.save(archivo.name, archivo)
+        documento = DocumentoSolicitud(
+            doc_archivo=nombre,
+            doc_nombre_original=os.path.basename(archivo.name),
+            doc_sha256=sha256_de_nombre(nombre),
+            doc_tamano=archivo.size,
+            **campos
+        )
+        documento.blob_creado_ns = getattr(archivo, 'blob_creado_ns', None)
+        documentos.append(documento)
+    return documentos
+
+
+@contextmanager
+def descartar_si_falla(documentos):
+    # with descartar_si_falla(preparados), transaction.atomic(): ...
+    # El descarte corre después del rollback, fuera de la transacción fallida.
+    try:
+        yield
+    except BaseException:
+        descartar_documentos(documentos)
+        raise
+
+
+def descartar_documentos(documentos):
+    # Llamar si la transacción que iba a insertar 'documentos' falló. Solo se borran los blobs
+    # que creó esta subida y que nadie reutilizó desde entonces; si otra subida en curso los
+    # tocó, quedan para la gracia normal y 'deduplicar_documentos --purgar-huerfanos'.
+    for documento in documentos:
+        if documento.blob_creado_ns is not None:
+            liberar_blob(documento.doc_archivo.name, creado_ns=documento.blob_creado_ns)
+
+
+def insertar_documentos(documentos, **campos):
+    for documento in documentos:
+        for campo, valor in campos.items():
+            setattr(documento, campo, valor)
+    documentos = DocumentoSolicitud.objects.bulk_create(documentos)
+    encolar_extraccion(documentos)
+    return documentos
+
+
+def referencias_blob(nombre):
+    # Los blobs se cuentan por doc_sha256 (indexado); doc_archivo no tiene índice.
+    sha256 = sha256_de_nombre(nombre)
+    if sha256:
+        return DocumentoSolicitud.objects.filter(doc_sha256=sha256).count()
+    return DocumentoSolicitud.objects.filter(doc_archivo=nombre).count()
+
+
+def liberar_blob(nombre, gracia=None, creado_ns=None):
+    # Borra el blob si ya ninguna fila lo referencia. Un blob usado hace menos de 'gracia'
+    # segundos se conserva: puede pertenecer a una subida en curso aún sin confirmar. Con
+    # 'creado_ns' (descartar_documentos) se conserva si su mtime cambió desde que se creó.
+    sha256 = sha256_de_nombre(nombre)
+    if not sha256:
+        return False
+    gracia = settings.DOCUMENTOS_BLOB_GRACIA if gracia is None else gracia
+    ruta = almacenamiento_documentos.path(nombre)
+    # Con transaction_mode IMMEDIATE, atomic() toma el bloqueo de escritura de SQLite al
+    # empezar: ninguna subida puede insertar una fila que apunte al blob hasta que termine.
+    with transaction.atomic():
+        if referencias_blob(nombre):
+            return False
+        # Se aparta el blob con un rename atómico antes de mirar su mtime. Una subida que lo
+        # busque desde ahora no lo encuentra y deja su propia copia; una que ya lo encontró
+        # actualizó el mtime (guardar_temporal) y el blob vuelve a su lugar.
+        apartado = os.path.join(almacenamiento_documentos.directorio_temporal(), f'{sha256}.{uuid.uuid4().hex}.liberando')
+        try:
+            os.rename(ruta, apartado)
+        except FileNotFoundError:
+            return False
+        mtime_ns = os.stat(apartado).st_mtime_ns
+        if creado_ns is not None:
+            en_uso = mtime_ns != creado_ns
+        else:
+            en_uso = time.time() - mtime_ns / 1e9 < gracia
+        if en_uso:
+            os.replace(apartado, ruta)
+            return False
+        os.unlink(apartado)
+    return True
+
+
+def eliminar_documento_y_blob(documento):
+    # Debe llamarse dentro de transaction.atomic(): el blob solo se libera si la eliminación se confirma.
+    nombre = documento.doc_archivo.name
+    documento.delete()
+    if sha256_de_nombre(nombre):
+        transaction.on_commit(lambda: liberar_blob(nombre))
+    elif nombre and not DocumentoSolicitud.objects.filter(doc_archivo=nombre).exists():
+        # Archivo anterior a la deduplicación (ruta propia por documento).
+        transaction.on_commit(lambda: almacenamiento_documentos.delete(nombre))
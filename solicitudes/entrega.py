@@ -0,0 +1,241 @@
+# solicitudes/entrega.py
+import asyncio
+import logging
+import mimetypes
+import os
+import zipfile
+from urllib.parse import quote
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+# Entrega de archivos de DocumentoSolicitud una vez verificados los permisos.
+# Modos (settings.DOCUMENTOS_ENTREGA):
+#   'django'          -> Django sirve el archivo (con soporte de 304 y Range/206).
+#   'x-accel-redirect'-> nginx sirve el archivo desde una location 'internal'.
+#   'x-sendfile'      -> Apache/lighttpd sirven el archivo (mod_xsendfile).
+# Los ZIP con todos los documentos de una solicitud siempre los arma Django (respuesta_zip).
+
+TAMANO_BLOQUE = 64 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+class RangoNoSatisfacible(Exception):
+    pass
+
+
+def _etag(documento, estado):
+    if getattr(documento, 'doc_sha256', ''):
+        return f'"{documento.doc_sha256}"'
+    return '"%x-%x-%x"' % (documento.pk, estado.st_size, estado.st_mtime_ns)
+
+
+def _leer_rango(cabecera, tamano):
+    # Devuelve (inicio, fin) inclusivo, o None si se debe entregar el archivo completo.
+    # Solo se atiende un rango; con varios rangos se responde el archivo completo (RFC 9110).
+    if not cabecera or not cabecera.startswith('bytes='):
+        return None
+    especificacion = cabecera[len('bytes='):].strip()
+    if ',' in especificacion:
+        return None
+    inicio_txt, separador, fin_txt = especificacion.partition('-')
+    if not separador:
+        return None
+    if tamano == 0:
+        # Ningún rango es satisfacible en un archivo vacío (evita 'bytes 0--1/0').
+        raise RangoNoSatisfacible()
+    try:
+        if inicio_txt == '':
+            sufijo = int(fin_txt)
+            if sufijo <= 0:
+                raise RangoNoSatisfacible()
+            return max(tamano - sufijo, 0), tamano - 1
+        inicio = int(inicio_txt)
+        fin = int(fin_txt) if fin_txt else None
+    except ValueError:
+        return None
+    if inicio < 0 or (fin is not None and fin < inicio):
+        return None
+    if inicio >= tamano:
+        raise RangoNoSatisfacible()
+    return inicio, tamano - 1 if fin is None else min(fin, tamano - 1)
+
+
+def _rango_vigente(request, etag, ultima_modificacion):
+    # If-Range: el rango solo aplica si el cliente tiene la misma versión del archivo.
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    fecha = parse_http_date_safe(if_range)
+    return fecha is not None and fecha >= ultima_modificacion
+
+
+def _iterar_rango(ruta, inicio, longitud):
+    with open(ruta, 'rb') as archivo:
+        archivo.seek(inicio)
+        restante = longitud
+        while restante > 0:
+            datos = archivo.read(min(TAMANO_BLOQUE, restante))
+            if not datos:
+                break
+            restante -= len(datos)
+            yield datos
+
+
+async def _iterar_rango_async(ruta, inicio, longitud):
+    # Lecturas en el pool de hilos por bloques: el event loop no se bloquea en disco.
+    archivo = await asyncio.to_thread(open, ruta, 'rb')
+    try:
+        await asyncio.to_thread(archivo.seek, inicio)
+        restante = longitud
+        while restante > 0:
+            datos = await asyncio.to_thread(archivo.read, min(TAMANO_BLOQUE, restante))
+            if not datos:
+                break
+            restante -= len(datos)
+            yield datos
+    finally:
+        archivo.close()
+
+
+def _cabeceras_comunes(response, etag, ultima_modificacion, nombre):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(ultima_modificacion)
+    response['Cache-Control'] = 'private, no-cache'
+    if nombre:
+        response['Content-Disposition'] = content_disposition_header(False, nombre)
+    return response
+
+
+def entregar_documento(request, documento, nombre=None, asincrono=False):
+    ruta = documento.doc_archivo.path
+    estado = os.stat(ruta)
+    etag = _etag(documento, estado)
+    ultima_modificacion = int(estado.st_mtime)
+    nombre = nombre or os.path.basename(documento.doc_archivo.name)
+    tipo_contenido = mimetypes.guess_type(nombre)[0] or 'application/octet-stream'
+
+    no_modificado = get_conditional_response(request, etag=etag, last_modified=ultima_modificacion)
+    if no_modificado is not None:
+        return _cabeceras_comunes(no_modificado, etag, ultima_modificacion, None)
+
+    modo = settings.DOCUMENTOS_ENTREGA
+    if modo == 'x-accel-redirect':
+        response = HttpResponse(content_type=tipo_contenido)
+        response['X-Accel-Redirect'] = settings.DOCUMENTOS_X_ACCEL_PREFIJO + quote(documento.doc_archivo.name)
+        return _cabeceras_comunes(response, etag, ultima_modificacion, nombre)
+    if modo == 'x-sendfile':
+        response = HttpResponse(content_type=tipo_contenido)
+        response['X-Sendfile'] = ruta
+        return _cabeceras_comunes(response, etag, ultima_modificacion, nombre)
+
+    tamano = estado.st_size
+    rango = None
+    if _rango_vigente(request, etag, ultima_modificacion):
+        try:
+            rango = _leer_rango(request.META.get('HTTP_RANGE'), tamano)
+        except RangoNoSatisfacible:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{tamano}'
+            return response
+
+    if asincrono:
+        # Bajo ASGI el archivo se transmite con un iterador asíncrono.
+        inicio, fin = rango or (0, tamano - 1)
+        response = StreamingHttpResponse(
+            _iterar_rango_async(ruta, inicio, fin - inicio + 1), status=206 if rango else 200, content_type=tipo_contenido
+        )
+        response['Content-Length'] = str(fin - inicio + 1)
+        if rango:
+            response['Content-Range'] = f'bytes {inicio}-{fin}/{tamano}'
+    elif rango is None:
+        response = FileResponse(open(ruta, 'rb'), content_type=tipo_contenido)
+    else:
+        inicio, fin = rango
+        response = StreamingHttpResponse(_iterar_rango(ruta, inicio, fin - inicio + 1), status=206, content_type=tipo_contenido)
+        response['Content-Range'] = f'bytes {inicio}-{fin}/{tamano}'
+        response['Content-Length'] = str(fin - inicio + 1)
+    response['Accept-Ranges'] = 'bytes'
+    return _cabeceras_comunes(response, etag, ultima_modificacion, nombre)
+
+
+class _SalidaZip:
+    # Destino de zipfile sin seek: acumula lo escrito hasta que el generador lo entrega.
+    # Sin seek, zipfile escribe los tamaños y el CRC en un descriptor tras cada entrada.
+
+    def __init__(self):
+        self._partes = []
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b''.join(self._partes)
+        self._partes = []
+        return datos
+
+
+def _nombre_en_zip(nombre, usados):
+    nombre = os.path.basename(nombre.replace('\\', '/')) or 'documento'
+    base, extension = os.path.splitext(nombre)
+    candidato, n = nombre, 1
+    while candidato.lower() in usados:
+        n += 1
+        candidato = f'{base} ({n}){extension}'
+    usados.add(candidato.lower())
+    return candidato
+
+
+def _generar_zip(documentos):
+    # Un documento a la vez y por bloques de TAMANO_BLOQUE: la memoria no depende del tamaño
+    # del expediente (zipfile solo guarda un ZipInfo por entrada para el directorio central).
+    salida = _SalidaZip()
+    usados = set()
+    with zipfile.ZipFile(salida, 'w', allowZip64=True) as archivo_zip:
+        for documento in documentos:
+            nombre = _nombre_en_zip(documento.nombre_archivo, usados)
+            almacenamiento = documento.doc_archivo.storage
+            try:
+                origen = almacenamiento.open(documento.doc_archivo.name, 'rb')
+                tamano = documento.doc_tamano if documento.doc_tamano is not None else origen.size
+            except OSError:
+                # Ya no se puede responder con un error: se omite el archivo faltante.
+                logger.warning("Documento %s sin archivo; se omite del ZIP.", documento.pk)
+                usados.discard(nombre.lower())
+                continue
+            with origen:
+                info = zipfile.ZipInfo(nombre, timezone.localtime(documento.doc_fecha_actualizacion).timetuple()[:6])
+                info.external_attr = 0o644 << 16
+                info.file_size = tamano   # decide si la entrada necesita ZIP64
+                sin_comprimir = os.path.splitext(nombre)[1].lower() in settings.DOCUMENTOS_ZIP_SIN_COMPRIMIR
+                info.compress_type = zipfile.ZIP_STORED if sin_comprimir else zipfile.ZIP_DEFLATED
+                with archivo_zip.open(info, 'w') as entrada:
+                    while True:
+                        datos = origen.read(TAMANO_BLOQUE)
+                        if not datos:
+                            break
+                        entrada.write(datos)
+                        bloque = salida.vaciar()
+                        if bloque:
+                            yield bloque
+            bloque = salida.vaciar()
+            if bloque:
+                yield bloque
+    yield salida.vaciar()
+
+
+def respuesta_zip(documentos, nombre):
+    # 'documentos' se recorre mientras se transmite la respuesta (pasar un iterador).
+    response = StreamingHttpResponse(_generar_zip(documentos), content_type='application/zip')
+    response['Content-Disposition'] = content_disposition_header(True, nombre)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
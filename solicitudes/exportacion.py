@@ -0,0 +1,33 @@
+# solicitudes/exportacion.py
+import json
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+# Exportación completa en modo streaming: el arreglo JSON se emite por partes
+# a medida que se recorre el queryset por lotes, sin materializar la lista completa.
+
+TAMANO_BLOQUE_SALIDA = 64 * 1024
+
+
+def _generar_arreglo_json(filas, serializar):
+    # Mismo formato que el JSONRenderer de DRF (compacto y sin escapar unicode).
+    codificador = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    bloque = ['[']
+    tamano = 1
+    separador = ''
+    for fila in filas:
+        texto = separador + codificador.encode(serializar(fila))
+        separador = ','
+        bloque.append(texto)
+        tamano += len(texto)
+        if tamano >= TAMANO_BLOQUE_SALIDA:
+            yield ''.join(bloque)
+            bloque, tamano = [], 0
+    bloque.append(']')
+    yield ''.join(bloque)
+
+
+def respuesta_json_streaming(queryset, serializar):
+    filas = queryset.iterator(chunk_size=settings.EXPORTACION_TAMANO_LOTE)
+    return StreamingHttpResponse(_generar_arreglo_json(filas, serializar), content_type='application/json')
@@ -0,0 +1,138 @@
+# solicitudes/extraccion.py
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from django.conf import settings
+from django.utils import timezone
+from .models import DocumentoSolicitud, TextoDocumento
+from .texto_docx import extraer_texto_docx
+
+# Extracción en segundo plano del texto de los documentos DOCX. Las vistas solo insertan la
+# fila PENDIENTE junto con el documento (encolar_extraccion); 'manage.py extraer_textos'
+# procesa los pendientes por lotes en un pool de procesos, uno por núcleo por defecto.
+
+
+def es_docx(documento):
+    nombre = documento.doc_nombre_original or documento.doc_archivo.name or ''
+    return os.path.splitext(nombre)[1].lower() in settings.TEXTOS_EXTENSIONES
+
+
+def encolar_extraccion(documentos):
+    # Llamar dentro de la transacción que inserta los documentos. Los formatos no soportados
+    # quedan resueltos de inmediato.
+    return TextoDocumento.objects.bulk_create([
+        TextoDocumento(
+            documento=documento,
+            tdo_estado=TextoDocumento.PENDIENTE if es_docx(documento) else TextoDocumento.NO_SOPORTADO
+        )
+        for documento in documentos
+    ])
+
+
+def rellenar_pendientes():
+    # Encola los documentos que no tienen fila de texto (anteriores a la extracción).
+    faltantes = (
+        DocumentoSolicitud.objects.filter(texto__isnull=True)
+        .only('doc_id', 'doc_archivo', 'doc_nombre_original').order_by('doc_id')
+    )
+    creados = 0
+    while True:
+        lote = list(faltantes[:settings.TEXTOS_LOTE])
+        if not lote:
+            return creados
+        creados += len(encolar_extraccion(lote))
+
+
+def crear_ejecutor(procesos=None):
+    procesos = procesos or settings.TEXTOS_PROCESOS or os.cpu_count() or 1
+    if procesos <= 1:
+        return None
+    # 'spawn': los hijos solo cargan solicitudes/texto_docx.py, sin Django ni conexiones heredadas.
+    return ProcessPoolExecutor(max_workers=procesos, mp_context=get_context('spawn'))
+
+
+def _origen(nombre):
+    almacenamiento = DocumentoSolicitud._meta.get_field('doc_archivo').storage
+    try:
+        return almacenamiento.path(nombre)
+    except NotImplementedError:
+        with almacenamiento.open(nombre, 'rb') as archivo:
+            return archivo.read()
+
+
+def _extraer_archivos(nombres, ejecutor):
+    # {nombre: (texto, error)}
+    resultados = {}
+    origenes = {}
+    for nombre in nombres:
+        try:
+            origenes[nombre] = _origen(nombre)
+        except Exception as e:
+            resultados[nombre] = ('', f'{e.__class__.__name__}: {e}')
+    argumentos = (
+        list(origenes.values()),
+        [settings.TEXTOS_MAXIMO_BYTES] * len(origenes), [settings.TEXTOS_MAXIMO_CARACTERES] * len(origenes)
+    )
+    if ejecutor is None:
+        extraidos = map(extraer_texto_docx, *argumentos)
+    else:
+        # extraer_texto_docx no lanza excepciones; si el pool se rompe (BrokenProcessPool)
+        # el error sube para que el comando lo recree.
+        extraidos = ejecutor.map(extraer_texto_docx, *argumentos)
+    resultados.update(zip(origenes, extraidos))
+    return resultados
+
+
+def _lote_pendiente(tamano_lote=None):
+    tamano_lote = tamano_lote or settings.TEXTOS_LOTE
+    return list(
+        TextoDocumento.objects.filter(tdo_estado=TextoDocumento.PENDIENTE)
+        .select_related('documento').order_by('documento_id')[:tamano_lote]
+    )
+
+
+def marcar_lote_fallido(error, tamano_lote=None):
+    # El lote que procesar_pendientes tomaría a continuación queda como fallido, para que no
+    # vuelva a romper el pool en la próxima ejecución. Devuelve cuántos documentos marcó.
+    lote = [texto.pk for texto in _lote_pendiente(tamano_lote)]
+    return TextoDocumento.objects.filter(pk__in=lote, tdo_estado=TextoDocumento.PENDIENTE).update(
+        tdo_estado=TextoDocumento.FALLIDO, tdo_error=str(error)[:1000], tdo_fecha_actualizacion=timezone.now()
+    )
+
+
+def procesar_pendientes(ejecutor=None, tamano_lote=None):
+    # Extrae un lote de pendientes y devuelve (extraidos, fallidos). Cada archivo se lee una
+    # sola vez aunque varios documentos compartan el mismo blob, y un blob ya extraído para
+    # otro documento no se vuelve a abrir.
+    lote = _lote_pendiente(tamano_lote)
+    if not lote:
+        return 0, 0
+
+    nombres = {texto.documento.doc_archivo.name for texto in lote}
+    # Los blobs ya extraídos se buscan por doc_sha256 (indexado), no por doc_archivo.
+    extraidos_antes = dict(
+        TextoDocumento.objects.filter(
+            tdo_estado=TextoDocumento.EXTRAIDO,
+            documento__doc_sha256__in={texto.documento.doc_sha256 for texto in lote} - {''}
+        ).values_list('documento__doc_sha256', 'tdo_texto')
+    )
+    resultados = {
+        texto.documento.doc_archivo.name: (extraidos_antes[texto.documento.doc_sha256], '')
+        for texto in lote if texto.documento.doc_sha256 in extraidos_antes
+    }
+    resultados.update(_extraer_archivos(sorted(nombres - resultados.keys()), ejecutor))
+
+    ahora = timezone.now()
+    extraidos = fallidos = 0
+    for texto in lote:
+        contenido, error = resultados[texto.documento.doc_archivo.name]
+        texto.tdo_texto = contenido
+        texto.tdo_error = error[:1000]
+        texto.tdo_estado = TextoDocumento.FALLIDO if error else TextoDocumento.EXTRAIDO
+        texto.tdo_fecha_actualizacion = ahora
+        if error:
+            fallidos += 1
+        else:
+            extraidos += 1
+    TextoDocumento.objects.bulk_update(lote, ['tdo_texto', 'tdo_error', 'tdo_estado', 'tdo_fecha_actualizacion'])
+    return extraidos, fallidos
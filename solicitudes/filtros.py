@@ -0,0 +1,103 @@
+# solicitudes/filtros.py
+from datetime import datetime, timedelta
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+# Filtros de fecha como rangos semiabiertos [inicio, fin) sobre la columna, para que
+# SQLite pueda usar los índices en lugar de evaluar strftime() fila por fila.
+
+
+class FiltroInvalido(ValueError):
+    pass
+
+
+def _entero(valor, nombre, minimo=None, maximo=None):
+    try:
+        valor = int(valor)
+    except (TypeError, ValueError):
+        raise FiltroInvalido(f"El filtro '{nombre}' debe ser un número entero.")
+    if (minimo is not None and valor < minimo) or (maximo is not None and valor > maximo):
+        raise FiltroInvalido(f"El filtro '{nombre}' debe estar entre {minimo} y {maximo}.")
+    return valor
+
+
+def _consciente(valor):
+    if timezone.is_naive(valor):
+        return timezone.make_aware(valor)
+    return valor
+
+
+def _inicio_del_dia(fecha):
+    return _consciente(datetime(fecha.year, fecha.month, fecha.day))
+
+
+def rango_fechas(year, month=None, day=None):
+    # Devuelve (inicio, fin) del año, mes o día indicado en la zona horaria actual.
+    try:
+        if day is not None:
+            inicio = datetime(year, month, day)
+            fin = inicio + timedelta(days=1)
+        elif month is not None:
+            inicio = datetime(year, month, 1)
+            fin = datetime(year + (month == 12), month % 12 + 1, 1)
+        else:
+            inicio = datetime(year, 1, 1)
+            fin = datetime(year + 1, 1, 1)
+    except ValueError:
+        raise FiltroInvalido("La fecha indicada en 'year', 'month' y 'day' no es válida.")
+    return _consciente(inicio), _consciente(fin)
+
+
+def leer_fecha(valor, nombre, fin=False):
+    # Acepta fecha (AAAA-MM-DD) o fecha-hora ISO. Una fecha sin hora usada como 'hasta'
+    # incluye el día completo, por lo que se convierte en el inicio del día siguiente.
+    if hasattr(valor, 'isoformat'):
+        valor = valor.isoformat()
+    try:
+        fecha = parse_date(str(valor))
+        if fecha is not None:
+            return _inicio_del_dia(fecha + timedelta(days=1) if fin else fecha)
+        fecha_hora = parse_datetime(str(valor))
+    except ValueError:
+        fecha_hora = None
+    if fecha_hora is None:
+        raise FiltroInvalido(f"El filtro '{nombre}' debe ser una fecha (AAAA-MM-DD) o fecha-hora ISO válida.")
+    return _consciente(fecha_hora)
+
+
+def filtrar_por_fecha(queryset, campo, filtros):
+    year = filtros.get('year')
+    month = filtros.get('month')
+    day = filtros.get('day')
+    # Se validan con o sin año: sin él, un valor inválido llegaría crudo a __month/__day.
+    month = _entero(month, 'month', 1, 12) if month not in (None, '') else None
+    day = _entero(day, 'day', 1, 31) if day not in (None, '') else None
+
+    if year not in (None, ''):
+        # El prefijo año[/mes[/día]] se resuelve como un solo rango.
+        year = _entero(year, 'year')
+        inicio, fin = rango_fechas(year, month, day if month else None)
+        queryset = queryset.filter(**{f'{campo}__gte': inicio, f'{campo}__lt': fin})
+        if day and not month:
+            queryset = queryset.filter(**{f'{campo}__day': day})
+    else:
+        # Sin año no hay un rango contiguo; se mantienen las búsquedas por componente.
+        if month is not None:
+            queryset = queryset.filter(**{f'{campo}__month': month})
+        if day is not None:
+            queryset = queryset.filter(**{f'{campo}__day': day})
+
+    if filtros.get('desde'):
+        queryset = queryset.filter(**{f'{campo}__gte': leer_fecha(filtros['desde'], 'desde')})
+    if filtros.get('hasta'):
+        queryset = queryset.filter(**{f'{campo}__lt': leer_fecha(filtros['hasta'], 'hasta', fin=True)})
+    return queryset
+
+
+def filtrar_solicitudes_por(queryset, filtros):
+    if filtros.get('estado_id'):
+        queryset = queryset.filter(est_id=_entero(filtros['estado_id'], 'estado_id'))
+    queryset = filtrar_por_fecha(queryset, 'sca_fecha_creacion', filtros)
+    if filtros.get('solicitante_id'):
+        queryset = queryset.filter(solicitante_id=_entero(filtros['solicitante_id'], 'solicitante_id'))
+    return queryset
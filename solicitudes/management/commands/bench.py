@@ -0,0 +1,243 @@
+import gc
+import json
+import os
+import platform
+import statistics
+import time
+import tracemalloc
+from asgiref.sync import async_to_sync
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Max
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+from solicitudes.models import SolicitudAyuda, DocumentoSolicitud, CambioSolicitud
+from solicitudes.management.sembrado import base_datos_temporal, sembrar
+from users.models import CustomUser, TipoUsuario
+
+# Escenarios: nombre -> función (contexto, iteración) -> (método, ruta, datos, formato).
+# Los que modifican datos rotan sobre los ids sembrados para no depender del orden.
+
+
+def _solicitud(ctx, i):
+    return ctx['solicitudes'][i % len(ctx['solicitudes'])]
+
+
+def _usuario(ctx, i):
+    return ctx['usuarios'][i % len(ctx['usuarios'])]
+
+
+ESCENARIOS = {
+    'crear_solicitud': lambda ctx, i: ('post', '/solicitudes/crear/', {
+        'sca_titulo': f'Bench {i}', 'sca_descripcion': 'Solicitud creada por el benchmark.',
+        'est_id': ctx['estado'], 'documentos_data': [SimpleUploadedFile(f'bench{i}.docx', os.urandom(8192))]
+    }, 'multipart'),
+    'modificar_solicitud': lambda ctx, i: ('post', '/solicitudes/modificar/', {
+        'solicitud_id': _solicitud(ctx, i), 'sca_titulo': f'Modificada {i}'
+    }, 'multipart'),
+    'filtrar_solicitudes': lambda ctx, i: ('post', '/solicitudes/filtrar/', {'limit': 100}, 'json'),
+    'filtrar_solicitudes_resumen': lambda ctx, i: ('post', '/solicitudes/filtrar/', {'limit': 100, 'fields': 'resumen'}, 'json'),
+    'filtrar_solicitudes_estado': lambda ctx, i: ('post', '/solicitudes/filtrar/', {'estado_id': ctx['estado'], 'limit': 100}, 'json'),
+    'filtrar_solicitudes_async': lambda ctx, i: ('post', '/solicitudes/async/filtrar/', {'limit': 100}, 'json'),
+    'buscar_solicitudes': lambda ctx, i: ('post', '/solicitudes/buscar/', {'q': 'solicitud', 'limit': 50}, 'json'),
+    'anular_solicitud': lambda ctx, i: ('post', '/solicitudes/anular/', {'solicitud_id': _solicitud(ctx, i)}, 'json'),
+    'cambiar_estado_masivo': lambda ctx, i: ('post', '/solicitudes/estado/masivo/', {
+        'solicitud_ids': ctx['solicitudes'][(i * 50) % len(ctx['solicitudes']):][:50], 'est_id': ctx['estado']
+    }, 'json'),
+    'crear_bitacora': lambda ctx, i: ('post', '/solicitudes/bitacora/crear/', {
+        'solicitud_id': _solicitud(ctx, i), 'bsca_observacion': f'Observación {i}'
+    }, 'json'),
+    'filtrar_bitacora': lambda ctx, i: ('post', '/solicitudes/bitacora/filtrar/', {'solicitud_id': _solicitud(ctx, i)}, 'json'),
+    'crear_estado': lambda ctx, i: ('post', '/solicitudes/estado/crear/', {'nombre_estado': f'Estado {i}'}, 'json'),
+    'filtrar_estados': lambda ctx, i: ('post', '/solicitudes/estado/filtrar/', {}, 'json'),
+    'estadisticas': lambda ctx, i: ('get', '/solicitudes/estadisticas/', {}, None),
+    'ver_documento': lambda ctx, i: ('get', f"/solicitudes/documento/{ctx['documentos'][i % len(ctx['documentos'])]}/", {}, None),
+    'descargar_documentos': lambda ctx, i: ('get', f"/solicitudes/documento/zip/{_solicitud(ctx, i)}/", {}, None),
+    'crear_tipo_usuario': lambda ctx, i: ('post', '/solicitudes/tipo/crear/', {'tiu_nombre': f'Tipo {i}'}, 'json'),
+    'ver_tipos_usuario': lambda ctx, i: ('get', '/solicitudes/tipo/ver/', {}, None),
+    'asignar_tipo_usuario': lambda ctx, i: ('post', '/solicitudes/tipo/usuario/', {
+        'rut': ctx['ruts'][i % len(ctx['ruts'])], 'tiu_id': ctx['tipo']
+    }, 'json'),
+    'listar_usuarios': lambda ctx, i: ('get', '/solicitudes/usuario/lista/', {'limit': 100}, None),
+    'modificar_usuario': lambda ctx, i: ('post', '/solicitudes/usuario/modificar/', {
+        'id': _usuario(ctx, i), 'telefono': f'+569{i:08d}'
+    }, 'json'),
+    'desactivar_usuario': lambda ctx, i: ('post', '/solicitudes/usuario/desactivar_usuario/', {'id': _usuario(ctx, i)}, 'json'),
+    'activar_usuario': lambda ctx, i: ('post', '/solicitudes/usuario/activar_usuario/', {'id': _usuario(ctx, i)}, 'json'),
+    # Cada iteración elimina un documento distinto (ver Command.sembrar).
+    'eliminar_documento': lambda ctx, i: ('post', '/solicitudes/documento/eliminar/', {'doc_id': ctx['eliminables'][i]}, 'json'),
+    # Vistas async: el cliente de pruebas las ejecuta con async_to_sync, como un worker WSGI.
+    'filtrar_bitacora_async': lambda ctx, i: ('post', '/solicitudes/async/bitacora/filtrar/', {'solicitud_id': _solicitud(ctx, i)}, 'json'),
+    'filtrar_estados_async': lambda ctx, i: ('post', '/solicitudes/async/estado/filtrar/', {}, 'json'),
+    'listar_usuarios_async': lambda ctx, i: ('get', '/solicitudes/async/usuario/lista/', {'limit': 100}, None),
+    'ver_documento_async': lambda ctx, i: ('get', f"/solicitudes/async/documento/{ctx['documentos'][i % len(ctx['documentos'])]}/", {}, None),
+    # Long-poll del feed de cambios sin espera: devuelve los últimos 100 cambios sembrados.
+    # El stream SSE no termina por sí solo y queda fuera.
+    'cambios': lambda ctx, i: ('get', '/solicitudes/async/cambios/', {'desde': ctx['desde_cambios'], 'espera': 0}, None),
+}
+
+async def _consumir(contenido):
+    async for _ in contenido:
+        pass
+
+
+METRICAS_COMPARADAS = ('p50_ms', 'p95_ms', 'p99_ms', 'consultas_por_peticion', 'memoria_pico_kb')
+
+
+def _percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, max(0, round(p / 100 * len(valores)) - 1))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Siembra una base de datos SQLite temporal, recorre los endpoints de solicitudes con el "
+        "cliente de pruebas de DRF e informa latencia (p50/p95/p99), consultas por petición y "
+        "memoria pico en JSON; con --base compara contra una medición anterior."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=200)
+        parser.add_argument('--solicitudes', type=int, default=2000)
+        parser.add_argument('--bitacora', type=int, default=3, help="Registros de bitácora por solicitud.")
+        parser.add_argument('--documentos', type=int, default=1, help="Documentos por solicitud.")
+        parser.add_argument('--repeticiones', type=int, default=30, help="Peticiones medidas por escenario.")
+        parser.add_argument('--calentamiento', type=int, default=3, help="Peticiones descartadas por escenario.")
+        parser.add_argument('--semilla', type=int, default=1)
+        parser.add_argument('--escenario', action='append', choices=sorted(ESCENARIOS), help="Repetible; por defecto, todos.")
+        parser.add_argument('--salida', help="Archivo donde guardar el JSON (además de imprimirlo).")
+        parser.add_argument('--base', help="JSON de una ejecución anterior con el que comparar.")
+        parser.add_argument('--umbral', type=float, default=0.2, help="Aumento relativo tolerado frente a --base (0.2 = 20%%).")
+
+    def handle(self, *args, **options):
+        base = None
+        if options['base']:
+            try:
+                with open(options['base']) as archivo:
+                    base = json.load(archivo)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"No se pudo leer la base {options['base']}: {e}")
+
+        with base_datos_temporal() as directorio, override_settings(
+            METRICAS_DIRECTORIO=os.path.join(directorio, 'metricas'),
+            AUTH_TOKEN_CACHE_MARCA=os.path.join(directorio, 'auth_tokens.marca'),
+        ):
+            contexto, token = self.sembrar(options)
+            cliente = APIClient()
+            cliente.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+            escenarios = {
+                nombre: self.medir(cliente, ESCENARIOS[nombre], contexto, options)
+                for nombre in options['escenario'] or ESCENARIOS
+            }
+
+        resultado = {
+            "configuracion": {
+                campo: options[campo]
+                for campo in ('usuarios', 'solicitudes', 'bitacora', 'documentos', 'repeticiones', 'semilla')
+            },
+            "entorno": {"python": platform.python_version(), "plataforma": platform.platform()},
+            "escenarios": escenarios,
+        }
+        texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+        self.stdout.write(texto)
+        if options['salida']:
+            with open(options['salida'], 'w') as archivo:
+                archivo.write(texto + '\n')
+
+        if base is not None:
+            regresiones = self.comparar(base, resultado, options['umbral'])
+            if regresiones:
+                raise CommandError("Regresiones frente a la base:\n" + '\n'.join(regresiones))
+            self.stderr.write(self.style.SUCCESS("Sin regresiones frente a la base."))
+
+    def sembrar(self, options):
+        operador, token = sembrar(
+            usuarios=options['usuarios'], solicitudes=options['solicitudes'],
+            bitacora_por_solicitud=options['bitacora'], documentos_por_solicitud=options['documentos'],
+            semilla=options['semilla']
+        )
+        usuarios = CustomUser.objects.exclude(pk=operador.pk).order_by('id')
+        contexto = {
+            'estado': SolicitudAyuda.objects.values_list('est_id', flat=True).first(),
+            'solicitudes': list(SolicitudAyuda.objects.order_by('sca_id').values_list('sca_id', flat=True)),
+            'documentos': list(DocumentoSolicitud.objects.order_by('doc_id').values_list('doc_id', flat=True)[:100]),
+            'usuarios': list(usuarios.values_list('id', flat=True)),
+            'ruts': list(usuarios.values_list('rut', flat=True)),
+            'tipo': TipoUsuario.objects.create(tiu_nombre='Voluntario').tiu_id,
+            'desde_cambios': max(0, (CambioSolicitud.objects.aggregate(ultimo=Max('cso_id'))['ultimo'] or 0) - 100),
+        }
+        if not contexto['solicitudes'] or not contexto['usuarios'] or not contexto['documentos']:
+            raise CommandError("Se necesitan al menos un usuario, una solicitud y un documento por solicitud.")
+        # eliminar_documento borra los últimos documentos; ver_documento* lee solo los anteriores.
+        necesarios = options['calentamiento'] + options['repeticiones'] + 3
+        if 'eliminar_documento' in (options['escenario'] or ESCENARIOS):
+            todos = list(DocumentoSolicitud.objects.order_by('doc_id').values_list('doc_id', flat=True))
+            if len(todos) <= necesarios:
+                raise CommandError(f"eliminar_documento necesita más de {necesarios} documentos sembrados.")
+            contexto['eliminables'] = todos[-necesarios:]
+            contexto['documentos'] = todos[:min(100, len(todos) - necesarios)]
+        return contexto, token
+
+    def peticion(self, cliente, escenario, contexto, i):
+        metodo, ruta, datos, formato = escenario(contexto, i)
+        respuesta = getattr(cliente, metodo)(ruta, datos, format=formato) if formato else getattr(cliente, metodo)(ruta, datos)
+        if respuesta.status_code >= 400:
+            raise CommandError(f"{metodo.upper()} {ruta} respondió {respuesta.status_code}")
+        if respuesta.streaming and respuesta.is_async:
+            # Las vistas async entregan un iterador async (ver_documento_async).
+            async_to_sync(_consumir)(respuesta.streaming_content)
+        elif respuesta.streaming:
+            b''.join(respuesta.streaming_content)
+        return respuesta
+
+    def medir(self, cliente, escenario, contexto, options):
+        for i in range(options['calentamiento']):
+            self.peticion(cliente, escenario, contexto, i)
+
+        tiempos = []
+        consultas = []
+        gc.collect()
+        for i in range(options['calentamiento'], options['calentamiento'] + options['repeticiones']):
+            with CaptureQueriesContext(connection) as capturadas:
+                inicio = time.perf_counter()
+                self.peticion(cliente, escenario, contexto, i)
+                tiempos.append(time.perf_counter() - inicio)
+            consultas.append(len(capturadas))
+
+        # Memoria en una pasada aparte: tracemalloc distorsiona la latencia.
+        desde = options['calentamiento'] + options['repeticiones']
+        # El pico se reinicia por petición; se informa el mayor de las tres.
+        tracemalloc.start()
+        try:
+            pico = 0
+            for i in range(desde, desde + 3):
+                tracemalloc.reset_peak()
+                self.peticion(cliente, escenario, contexto, i)
+                pico = max(pico, tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+
+        return {
+            "p50_ms": round(_percentil(tiempos, 50) * 1000, 3),
+            "p95_ms": round(_percentil(tiempos, 95) * 1000, 3),
+            "p99_ms": round(_percentil(tiempos, 99) * 1000, 3),
+            "media_ms": round(statistics.fmean(tiempos) * 1000, 3),
+            "consultas_por_peticion": round(statistics.fmean(consultas), 2),
+            "memoria_pico_kb": round(pico / 1024, 1),
+        }
+
+    def comparar(self, base, actual, umbral):
+        # Las consultas son deterministas: cualquier aumento es una regresión.
+        regresiones = []
+        for nombre, medicion in actual['escenarios'].items():
+            anterior = base.get('escenarios', {}).get(nombre)
+            if not anterior:
+                continue
+            for metrica in METRICAS_COMPARADAS:
+                if metrica not in anterior:
+                    continue
+                tolerancia = 0 if metrica == 'consultas_por_peticion' else umbral
+                if medicion[metrica] > anterior[metrica] * (1 + tolerancia) + 1e-9:
+                    regresiones.append(f"{nombre}.{metrica}: {anterior[metrica]} -> {medicion[metrica]}")
+        return regresiones
@@ -0,0 +1,91 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client
+from solicitudes.models import DocumentoSolicitud
+from solicitudes.management.sembrado import base_datos_temporal, sembrar
+
+# Escenario -> (método, ruta sync, ruta async, datos).
+ESCENARIOS = {
+    'filtrar': ('post', '/solicitudes/filtrar/', '/solicitudes/async/filtrar/', {'limit': 50}),
+    'estados': ('post', '/solicitudes/estado/filtrar/', '/solicitudes/async/estado/filtrar/', {}),
+    'usuarios': ('get', '/solicitudes/usuario/lista/', '/solicitudes/async/usuario/lista/', {'limit': 50}),
+    'documento': ('get', '/solicitudes/documento/{doc}/', '/solicitudes/async/documento/{doc}/', {}),
+}
+
+
+def _resumen(tiempos, total):
+    tiempos = sorted(tiempos)
+    return {
+        'req_s': round(len(tiempos) / total, 1),
+        'p50_ms': round(statistics.median(tiempos) * 1000, 2),
+        'p95_ms': round(tiempos[max(0, int(len(tiempos) * 0.95) - 1)] * 1000, 2),
+    }
+
+
+def _verificar(respuesta, ruta):
+    # Una comparación entre respuestas de error no dice nada.
+    if respuesta.status_code >= 400:
+        raise CommandError(f"{ruta} respondió {respuesta.status_code}")
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara las vistas de lectura sync (WSGI, un hilo por petición) con las async (ASGI) "
+        "sobre una base de datos SQLite temporal con datos sintéticos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--peticiones', type=int, default=200)
+        parser.add_argument('--concurrencia', type=int, default=16)
+        parser.add_argument('--solicitudes', type=int, default=2000)
+        parser.add_argument('--escenario', choices=sorted(ESCENARIOS), action='append')
+
+    def handle(self, *args, **options):
+        with base_datos_temporal():
+            _, token = sembrar(solicitudes=options['solicitudes'])
+            doc = DocumentoSolicitud.objects.values_list('doc_id', flat=True).first()
+            cabecera = {'Authorization': f'Token {token.key}'}
+
+            for nombre in options['escenario'] or sorted(ESCENARIOS):
+                metodo, ruta_sync, ruta_async, datos = ESCENARIOS[nombre]
+                ruta_sync, ruta_async = ruta_sync.format(doc=doc), ruta_async.format(doc=doc)
+                wsgi = self.medir_wsgi(metodo, ruta_sync, datos, cabecera, options)
+                asgi = asyncio.run(self.medir_asgi(metodo, ruta_async, datos, cabecera, options))
+                self.stdout.write(f"{nombre:<10} WSGI {wsgi}")
+                self.stdout.write(f"{'':<10} ASGI {asgi}")
+
+    def medir_wsgi(self, metodo, ruta, datos, cabecera, options):
+        def peticion(_):
+            inicio = time.perf_counter()
+            respuesta = getattr(Client(), metodo)(ruta, datos, headers=cabecera)
+            _verificar(respuesta, ruta)
+            b''.join(respuesta) if respuesta.streaming else respuesta.content
+            connections.close_all()
+            return time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrencia']) as ejecutor:
+            tiempos = list(ejecutor.map(peticion, range(options['peticiones'])))
+        return _resumen(tiempos, time.perf_counter() - inicio)
+
+    async def medir_asgi(self, metodo, ruta, datos, cabecera, options):
+        cliente = AsyncClient()
+        semaforo = asyncio.Semaphore(options['concurrencia'])
+
+        async def peticion():
+            async with semaforo:
+                inicio = time.perf_counter()
+                respuesta = await getattr(cliente, metodo)(ruta, datos, headers=cabecera)
+                _verificar(respuesta, ruta)
+                if respuesta.streaming:
+                    async for _ in respuesta:
+                        pass
+                return time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        tiempos = await asyncio.gather(*(peticion() for _ in range(options['peticiones'])))
+        return _resumen(tiempos, time.perf_counter() - inicio)
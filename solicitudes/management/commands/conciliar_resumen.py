@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from solicitudes.resumen import conciliar
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula desde cero el resumen de solicitudes por estado y mes, informando los "
+        "contadores que se habían desviado del conteo real."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--simular', action='store_true', help="Solo informa las diferencias, sin corregirlas.")
+
+    def handle(self, *args, **options):
+        diferencias = conciliar(aplicar=not options['simular'])
+        for (estado, anio, mes), en_resumen, real in diferencias:
+            self.stdout.write(f"estado {estado} {anio}-{mes:02d}: resumen {en_resumen}, real {real}")
+        if not diferencias:
+            self.stdout.write(self.style.SUCCESS("El resumen coincide con las solicitudes."))
+        elif options['simular']:
+            self.stdout.write(self.style.WARNING(f"{len(diferencias)} contador(es) desviado(s); no se modificó nada."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{len(diferencias)} contador(es) corregido(s)."))
@@ -0,0 +1,114 @@
+import hashlib
+import os
+import time
+from django.conf import settings
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from solicitudes.almacenamiento import PREFIJO_BLOBS, almacenamiento_documentos, sha256_de_nombre
+from solicitudes.documentos import liberar_blob, referencias_blob
+from solicitudes.models import DocumentoSolicitud
+
+
+class Command(BaseCommand):
+    help = (
+        "Mueve los archivos de DocumentoSolicitud al almacén deduplicado: los duplicados quedan "
+        "como un solo blob por SHA-256 y se borran las copias antiguas sin referencias."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--simular', action='store_true', help="Solo informa lo que se haría, sin modificar nada.")
+        parser.add_argument('--purgar-huerfanos', action='store_true', help="Borra además los blobs sin referencias.")
+
+    def handle(self, *args, **options):
+        self.migrar(options['simular'])
+        if options['purgar_huerfanos']:
+            self.purgar_huerfanos(options['simular'])
+
+    def migrar(self, simular):
+        almacen = almacenamiento_documentos
+        pendientes = (
+            DocumentoSolicitud.objects
+            .exclude(doc_archivo__startswith=PREFIJO_BLOBS + '/')
+            .exclude(doc_archivo='')
+            .order_by('doc_id')
+        )
+        antiguos = {}
+        blobs = set()
+        migrados = faltantes = 0
+
+        for documento in pendientes.iterator():
+            nombre = documento.doc_archivo.name
+            ruta = almacen.path(nombre)
+            if not os.path.exists(ruta):
+                faltantes += 1
+                self.stderr.write(f"Documento {documento.doc_id}: no existe el archivo '{nombre}'.")
+                continue
+
+            tamano = os.path.getsize(ruta)
+            if simular:
+                hasher = hashlib.sha256()
+                with open(ruta, 'rb') as archivo:
+                    for bloque in iter(lambda: archivo.read(1024 * 1024), b''):
+                        hasher.update(bloque)
+                sha256 = hasher.hexdigest()
+            else:
+                with open(ruta, 'rb') as archivo:
+                    nuevo_nombre = almacen.save(nombre, File(archivo))
+                sha256 = sha256_de_nombre(nuevo_nombre)
+                DocumentoSolicitud.objects.filter(pk=documento.pk).update(
+                    doc_archivo=nuevo_nombre,
+                    doc_sha256=sha256,
+                    doc_tamano=tamano,
+                    doc_nombre_original=documento.doc_nombre_original or os.path.basename(nombre)
+                )
+            blobs.add((sha256, tamano))
+            antiguos[nombre] = tamano
+            migrados += 1
+
+        bytes_antes = sum(antiguos.values())
+        bytes_despues = sum(tamano for _, tamano in blobs)
+        eliminados = 0
+        if not simular:
+            # doc_archivo no tiene índice: una consulta por lote de nombres, no una por archivo.
+            nombres = list(antiguos)
+            en_uso = set()
+            for inicio in range(0, len(nombres), 500):
+                en_uso.update(
+                    DocumentoSolicitud.objects.filter(doc_archivo__in=nombres[inicio:inicio + 500])
+                    .values_list('doc_archivo', flat=True)
+                )
+            for nombre in antiguos:
+                if nombre not in en_uso:
+                    almacen.delete(nombre)
+                    eliminados += 1
+
+        prefijo = "[simulación] " if simular else ""
+        self.stdout.write(
+            f"{prefijo}Documentos migrados: {migrados}; blobs distintos: {len(blobs)}; "
+            f"archivos antiguos eliminados: {eliminados}; sin archivo: {faltantes}; "
+            f"bytes: {bytes_antes} -> {bytes_despues}."
+        )
+
+    def purgar_huerfanos(self, simular):
+        almacen = almacenamiento_documentos
+        raiz = almacen.path(PREFIJO_BLOBS)
+        if not os.path.isdir(raiz):
+            return
+        borrados = 0
+        for directorio, subdirectorios, archivos in os.walk(raiz):
+            if os.path.abspath(directorio) == os.path.abspath(almacen.directorio_temporal()):
+                # Temporales de subidas interrumpidas.
+                for archivo in archivos:
+                    ruta = os.path.join(directorio, archivo)
+                    if time.time() - os.path.getmtime(ruta) > settings.DOCUMENTOS_BLOB_GRACIA:
+                        if not simular:
+                            os.unlink(ruta)
+                        borrados += 1
+                continue
+            for archivo in archivos:
+                nombre = os.path.relpath(os.path.join(directorio, archivo), almacen.path('')).replace(os.sep, '/')
+                if simular:
+                    borrados += not referencias_blob(nombre)
+                elif liberar_blob(nombre):
+                    borrados += 1
+        self.stdout.write(f"{'[simulación] ' if simular else ''}Blobs huérfanos eliminados: {borrados}.")
@@ -0,0 +1,27 @@
+import time
+from django.core.management.base import BaseCommand
+from solicitudes.correos import procesar_pendientes
+
+
+class Command(BaseCommand):
+    help = "Despacha por lotes los correos pendientes de la bandeja de salida (CorreoPendiente)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=None, help="Correos por lote (por defecto CORREOS_TAMANO_LOTE).")
+        parser.add_argument('--max-intentos', type=int, default=None, help="Intentos antes de marcar un correo como fallido.")
+        parser.add_argument('--intervalo', type=float, default=5, help="Segundos de espera cuando no hay correos pendientes.")
+        parser.add_argument('--una-vez', action='store_true', help="Vacía la bandeja una vez y termina.")
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                enviados, fallidos = procesar_pendientes(options['lote'], options['max_intentos'])
+            except Exception as e:
+                self.stderr.write(f"Error al procesar la bandeja de salida: {e}")
+                enviados, fallidos = 0, 0
+            if enviados or fallidos:
+                self.stdout.write(f"Correos enviados: {enviados}, con error: {fallidos}")
+                continue
+            if options['una_vez']:
+                break
+            time.sleep(options['intervalo'])
@@ -0,0 +1,61 @@
+import time
+from concurrent.futures.process import BrokenProcessPool
+from django.core.management.base import BaseCommand, CommandError
+from solicitudes.extraccion import crear_ejecutor, marcar_lote_fallido, procesar_pendientes, rellenar_pendientes
+
+ROTURAS_MAXIMAS = 3
+
+
+class Command(BaseCommand):
+    help = (
+        "Extrae por lotes el texto de los documentos DOCX pendientes (TextoDocumento) en un pool "
+        "de procesos; con --rellenar encola antes los documentos subidos sin fila de texto."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rellenar', action='store_true', help="Encola los documentos existentes que no tienen fila de texto.")
+        parser.add_argument('--procesos', type=int, default=None, help="Procesos del pool (por defecto TEXTOS_PROCESOS o uno por núcleo).")
+        parser.add_argument('--lote', type=int, default=None, help="Documentos por lote (por defecto TEXTOS_LOTE).")
+        parser.add_argument('--intervalo', type=float, default=5, help="Segundos de espera cuando no hay documentos pendientes.")
+        parser.add_argument('--una-vez', action='store_true', help="Procesa los pendientes una vez y termina.")
+
+    def handle(self, *args, **options):
+        if options['rellenar']:
+            self.stdout.write(f"Documentos encolados: {rellenar_pendientes()}")
+
+        ejecutor = crear_ejecutor(options['procesos'])
+        roturas = 0
+        try:
+            while True:
+                try:
+                    extraidos, fallidos = procesar_pendientes(ejecutor, options['lote'])
+                except BrokenProcessPool as e:
+                    # Un hijo murió (p. ej. sin memoria): se descarta el pool y se reintenta el
+                    # lote con uno nuevo. Si se rompe varias veces seguidas, se detiene.
+                    roturas += 1
+                    ejecutor.shutdown(wait=False, cancel_futures=True)
+                    ejecutor = None
+                    if roturas >= ROTURAS_MAXIMAS:
+                        # El lote que lo rompe se marca como fallido: si no, la próxima ejecución
+                        # volvería a empezar por los mismos documentos.
+                        marcados = marcar_lote_fallido(f'El pool de extracción se rompió {roturas} veces: {e}', options['lote'])
+                        raise CommandError(
+                            f"El pool de extracción se rompió {roturas} veces seguidas: {e}. "
+                            f"{marcados} documento(s) del lote quedaron como fallidos."
+                        )
+                    self.stderr.write(f"El pool de extracción se rompió, se vuelve a crear: {e}")
+                    ejecutor = crear_ejecutor(options['procesos'])
+                    continue
+                except Exception as e:
+                    self.stderr.write(f"Error al extraer textos: {e}")
+                    extraidos, fallidos = 0, 0
+                roturas = 0
+                if extraidos or fallidos:
+                    self.stdout.write(f"Textos extraídos: {extraidos}, con error: {fallidos}")
+                    continue
+                if options['una_vez']:
+                    break
+                time.sleep(options['intervalo'])
+        finally:
+            if ejecutor is not None:
+                ejecutor.shutdown()
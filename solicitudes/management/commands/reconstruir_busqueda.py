@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from solicitudes.busqueda import reconstruir
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye el índice de búsqueda de texto completo (FTS5) de solicitudes y bitácora, "
+        "recreando la tabla y los triggers si faltan."
+    )
+
+    def handle(self, *args, **options):
+        filas = reconstruir()
+        self.stdout.write(self.style.SUCCESS(f"Índice de búsqueda reconstruido: {filas} filas."))
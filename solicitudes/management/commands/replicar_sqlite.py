@@ -0,0 +1,25 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from backTecho.replicas import replicar
+
+
+class Command(BaseCommand):
+    help = (
+        "Copia la base principal SQLite sobre las réplicas de DB_REPLICAS_SQLITE. Sustituye a la "
+        "replicación para probar en local el enrutamiento de lecturas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalo', type=float, default=5, help="Segundos entre copias.")
+        parser.add_argument('--una-vez', action='store_true', help="Copia una vez y termina.")
+
+    def handle(self, *args, **options):
+        if not settings.REPLICAS_LECTURA:
+            raise CommandError("No hay réplicas configuradas (DB_REPLICAS_SQLITE).")
+        while True:
+            replicar()
+            self.stdout.write(f"Réplicas actualizadas: {', '.join(settings.REPLICAS_LECTURA)}")
+            if options['una_vez']:
+                break
+            time.sleep(options['intervalo'])
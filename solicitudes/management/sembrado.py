@@ -0,0 +1,110 @@
+# solicitudes/management/sembrado.py
+import os
+import random
+import shutil
+import tempfile
+from contextlib import contextmanager
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from rest_framework.authtoken.models import Token
+from users.models import CustomUser
+from solicitudes.almacenamiento import almacenamiento_documentos, sha256_de_nombre
+from solicitudes.cambios import registrar_varios as registrar_cambios
+from solicitudes.catalogos import estados
+from solicitudes.models import SolicitudAyuda, BitacoraSolicitud, DocumentoSolicitud, EstadoSolicitud, CambioSolicitud
+from solicitudes.resumen import conciliar
+
+# Datos sintéticos y base de datos desechable para los comandos de benchmark. Vive junto a
+# los comandos (no en la app) porque usa el arnés de pruebas de Django.
+# Nunca se escribe en la base de datos configurada: todo ocurre en un SQLite temporal.
+
+LOTE = 500
+
+
+@contextmanager
+def base_datos_temporal():
+    # Crea una base de datos SQLite en un archivo temporal (con migraciones aplicadas) y un
+    # MEDIA_ROOT temporal; ambos se eliminan al salir.
+    directorio = tempfile.mkdtemp(prefix='bench_')
+    prueba = connection.settings_dict.setdefault('TEST', {})
+    nombre_prueba_anterior = prueba.get('NAME')
+    prueba['NAME'] = os.path.join(directorio, 'bench.sqlite3')
+    setup_test_environment()
+    nombre_anterior = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        with override_settings(MEDIA_ROOT=os.path.join(directorio, 'media')):
+            yield directorio
+    finally:
+        connection.creation.destroy_test_db(nombre_anterior, verbosity=0)
+        prueba['NAME'] = nombre_prueba_anterior
+        teardown_test_environment()
+        shutil.rmtree(directorio, ignore_errors=True)
+
+
+def sembrar(usuarios=50, solicitudes=500, bitacora_por_solicitud=2, documentos_por_solicitud=1, semilla=1):
+    # Inserta el volumen pedido con bulk_create. Devuelve (usuario_operador, token).
+    azar = random.Random(semilla)
+    clave = make_password('bench')
+
+    lista_estados = EstadoSolicitud.objects.bulk_create(
+        [EstadoSolicitud(est_nombre=nombre) for nombre in ('Ingresada', 'En revisión', 'Aprobada', 'Rechazada', 'Anulada')]
+    )
+    estados.invalidar()
+
+    operador = CustomUser.objects.create(
+        email='operador@bench.local', rut='0-0', password=clave,
+        first_name='Operador', last_name='Bench', apellido_materno='Bench', is_staff=True
+    )
+    token = Token.objects.create(user=operador)
+    CustomUser.objects.bulk_create([
+        CustomUser(
+            email=f'usuario{n}@bench.local', rut=f'{n + 1}-{n % 10}', password=clave,
+            first_name=f'Nombre {n}', last_name='Paterno', apellido_materno='Materno'
+        )
+        for n in range(usuarios)
+    ], batch_size=LOTE)
+    ids_usuarios = list(CustomUser.objects.values_list('id', flat=True))
+
+    # Un puñado de archivos reales; las filas los comparten gracias al almacén deduplicado.
+    blobs = [
+        almacenamiento_documentos.save(f'bench{n}.docx', ContentFile(os.urandom(16 * 1024)))
+        for n in range(max(1, min(documentos_por_solicitud, 5)))
+    ]
+
+    for inicio in range(0, solicitudes, LOTE):
+        creadas = SolicitudAyuda.objects.bulk_create([
+            SolicitudAyuda(
+                sca_titulo=f'Solicitud {n}',
+                sca_descripcion=f'Descripción de la solicitud {n}. ' * 5,
+                est_id=azar.choice(lista_estados),
+                solicitante_id=azar.choice(ids_usuarios)
+            )
+            for n in range(inicio, min(inicio + LOTE, solicitudes))
+        ])
+        registrar_cambios([(solicitud, CambioSolicitud.CREADA, {}) for solicitud in creadas])
+        registros = BitacoraSolicitud.objects.bulk_create([
+            BitacoraSolicitud(sca_id=solicitud, usuario_id=azar.choice(ids_usuarios), bsca_observacion=f'Observación {i}')
+            for solicitud in creadas
+            for i in range(bitacora_por_solicitud)
+        ])
+        por_solicitud = {}
+        for registro in registros:
+            por_solicitud.setdefault(registro.sca_id_id, registro)
+        DocumentoSolicitud.objects.bulk_create([
+            DocumentoSolicitud(
+                solicitud=solicitud,
+                bitacora=por_solicitud.get(solicitud.sca_id),
+                doc_archivo=blobs[i % len(blobs)],
+                doc_nombre_original=f'documento{i}.docx',
+                doc_sha256=sha256_de_nombre(blobs[i % len(blobs)]),
+                doc_tamano=16 * 1024
+            )
+            for solicitud in creadas
+            for i in range(documentos_por_solicitud)
+        ], batch_size=LOTE)
+
+    # bulk_create no pasa por las vistas: el resumen por estado y mes se calcula al final.
+    conciliar()
+    return operador, token
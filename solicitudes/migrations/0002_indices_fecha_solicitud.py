@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solicitudes', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='solicitudayuda',
+            index=models.Index(fields=['est_id', 'sca_fecha_creacion', 'sca_id'], name='sca_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='solicitudayuda',
+            index=models.Index(fields=['solicitante', 'sca_fecha_creacion', 'sca_id'], name='sca_solicitante_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='solicitudayuda',
+            index=models.Index(fields=['sca_fecha_creacion', 'sca_id'], name='sca_fecha_idx'),
+        ),
+    ]
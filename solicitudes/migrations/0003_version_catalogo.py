@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solicitudes', '0002_indices_fecha_solicitud'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionCatalogo',
+            fields=[
+                ('vca_catalogo', models.CharField(max_length=40, primary_key=True, serialize=False)),
+                ('vca_version', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
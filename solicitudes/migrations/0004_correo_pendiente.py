@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:34
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solicitudes', '0003_version_catalogo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CorreoPendiente',
+            fields=[
+                ('cop_id', models.AutoField(primary_key=True, serialize=False)),
+                ('cop_asunto', models.CharField(max_length=255)),
+                ('cop_mensaje', models.TextField()),
+                ('cop_remitente', models.CharField(max_length=254)),
+                ('cop_destinatarios', models.JSONField(default=list)),
+                ('cop_estado', models.CharField(choices=[('P', 'Pendiente'), ('E', 'Enviado'), ('F', 'Fallido')], default='P', max_length=1)),
+                ('cop_intentos', models.PositiveIntegerField(default=0)),
+                ('cop_proximo_intento', models.DateTimeField(default=django.utils.timezone.now)),
+                ('cop_ultimo_error', models.TextField(blank=True)),
+                ('cop_fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('cop_fecha_envio', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['cop_estado', 'cop_proximo_intento'], name='cop_pendientes_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:37
+
+import solicitudes.almacenamiento
+import solicitudes.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solicitudes', '0004_correo_pendiente'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentosolicitud',
+            name='doc_nombre_original',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='documentosolicitud',
+            name='doc_sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='documentosolicitud',
+            name='doc_tamano',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='documentosolicitud',
+            name='doc_archivo',
+            field=models.FileField(storage=solicitudes.almacenamiento.obtener_almacenamiento_documentos, upload_to=solicitudes.models.ruta_archivos_solicitud),
+        ),
+    ]
@@ -0,0 +1,83 @@
+from django.db import migrations
+
+# Tabla FTS5 y triggers de solicitudes/busqueda.py, más el indexado de las filas existentes.
+# El SQL queda copiado aquí: la migración no debe cambiar si busqueda.py cambia después.
+# rowid = id * 4 + tipo (0 = solicitud, 1 = bitácora).
+
+CREAR = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS solicitudes_busqueda USING fts5(
+        titulo, contenido, sca_id UNINDEXED, tipo UNINDEXED,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS solicitudes_busqueda_sca_ai
+    AFTER INSERT ON solicitudes_solicitudayuda BEGIN
+        INSERT INTO solicitudes_busqueda (rowid, titulo, contenido, sca_id, tipo)
+        VALUES (new.sca_id * 4, new.sca_titulo, new.sca_descripcion, new.sca_id, 0);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS solicitudes_busqueda_sca_au
+    AFTER UPDATE OF sca_titulo, sca_descripcion ON solicitudes_solicitudayuda BEGIN
+        UPDATE solicitudes_busqueda SET titulo = new.sca_titulo, contenido = new.sca_descripcion
+        WHERE rowid = new.sca_id * 4;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS solicitudes_busqueda_sca_ad
+    AFTER DELETE ON solicitudes_solicitudayuda BEGIN
+        DELETE FROM solicitudes_busqueda WHERE rowid = old.sca_id * 4;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS solicitudes_busqueda_bsca_ai
+    AFTER INSERT ON solicitudes_bitacorasolicitud BEGIN
+        INSERT INTO solicitudes_busqueda (rowid, titulo, contenido, sca_id, tipo)
+        VALUES (new.bsca_id * 4 + 1, '', new.bsca_observacion, new.sca_id_id, 1);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS solicitudes_busqueda_bsca_au
+    AFTER UPDATE OF bsca_observacion ON solicitudes_bitacorasolicitud BEGIN
+        UPDATE solicitudes_busqueda SET contenido = new.bsca_observacion WHERE rowid = new.bsca_id * 4 + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS solicitudes_busqueda_bsca_ad
+    AFTER DELETE ON solicitudes_bitacorasolicitud BEGIN
+        DELETE FROM solicitudes_busqueda WHERE rowid = old.bsca_id * 4 + 1;
+    END
+    """,
+    """
+    INSERT INTO solicitudes_busqueda (rowid, titulo, contenido, sca_id, tipo)
+    SELECT sca_id * 4, sca_titulo, sca_descripcion, sca_id, 0 FROM solicitudes_solicitudayuda
+    """,
+    """
+    INSERT INTO solicitudes_busqueda (rowid, titulo, contenido, sca_id, tipo)
+    SELECT bsca_id * 4 + 1, '', bsca_observacion, sca_id_id, 1
+    FROM solicitudes_bitacorasolicitud
+    """,
+]
+
+ELIMINAR = [
+    'DROP TRIGGER IF EXISTS solicitudes_busqueda_sca_ai',
+    'DROP TRIGGER IF EXISTS solicitudes_busqueda_sca_au',
+    'DROP TRIGGER IF EXISTS solicitudes_busqueda_sca_ad',
+    'DROP TRIGGER IF EXISTS solicitudes_busqueda_bsca_ai',
+    'DROP TRIGGER IF EXISTS solicitudes_busqueda_bsca_au',
+    'DROP TRIGGER IF EXISTS solicitudes_busqueda_bsca_ad',
+    'DROP TABLE IF EXISTS solicitudes_busqueda',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solicitudes', '0005_documentos_deduplicados'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREAR, ELIMINAR),
+    ]
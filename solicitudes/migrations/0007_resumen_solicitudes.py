@@ -0,0 +1,46 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def poblar_resumen(apps, schema_editor):
+    SolicitudAyuda = apps.get_model('solicitudes', 'SolicitudAyuda')
+    ResumenSolicitudes = apps.get_model('solicitudes', 'ResumenSolicitudes')
+    filas = (
+        SolicitudAyuda.objects
+        .annotate(anio=ExtractYear('sca_fecha_creacion'), mes=ExtractMonth('sca_fecha_creacion'))
+        .values('est_id', 'anio', 'mes')
+        .annotate(cantidad=Count('sca_id'))
+        .order_by()
+    )
+    ResumenSolicitudes.objects.bulk_create([
+        ResumenSolicitudes(est_id_id=f['est_id'], rso_anio=f['anio'], rso_mes=f['mes'], rso_cantidad=f['cantidad'])
+        for f in filas
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solicitudes', '0006_busqueda_texto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenSolicitudes',
+            fields=[
+                ('rso_id', models.AutoField(primary_key=True, serialize=False)),
+                ('rso_anio', models.PositiveSmallIntegerField()),
+                ('rso_mes', models.PositiveSmallIntegerField()),
+                ('rso_cantidad', models.IntegerField(default=0)),
+                ('est_id', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes', to='solicitudes.estadosolicitud')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('est_id', 'rso_anio', 'rso_mes'), name='rso_estado_periodo_uniq')],
+            },
+        ),
+        migrations.RunPython(poblar_resumen, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:01
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solicitudes', '0007_resumen_solicitudes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bitacorasolicitud',
+            index=models.Index(fields=['sca_id', 'bsca_fecha_creacion', 'bsca_id'], name='bsca_solicitud_fecha_idx'),
+        ),
+    ]
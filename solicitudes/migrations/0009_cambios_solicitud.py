@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solicitudes', '0008_indice_bitacora_solicitud_fecha'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CambioSolicitud',
+            fields=[
+                ('cso_id', models.AutoField(primary_key=True, serialize=False)),
+                ('cso_tipo', models.CharField(choices=[('solicitud_creada', 'Solicitud creada'), ('solicitud_modificada', 'Solicitud modificada'), ('solicitud_anulada', 'Solicitud anulada'), ('bitacora_creada', 'Registro de bitácora creado'), ('documento_eliminado', 'Documento eliminado')], max_length=30)),
+                ('cso_datos', models.JSONField(default=dict)),
+                ('cso_fecha', models.DateTimeField(auto_now_add=True)),
+                ('sca_id', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cambios', to='solicitudes.solicitudayuda')),
+            ],
+        ),
+    ]
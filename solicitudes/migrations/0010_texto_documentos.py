@@ -0,0 +1,66 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Copia fija del SQL de busqueda.TRIGGERS_DOCUMENTOS (rowid = doc_id * 4 + 2). Las filas
+# existentes no se indexan aquí: la tabla solicitudes_textodocumento nace vacía.
+_INSERTAR_DOCUMENTO = """
+        INSERT INTO solicitudes_busqueda (rowid, titulo, contenido, sca_id, tipo)
+        SELECT d.doc_id * 4 + 2, d.doc_nombre_original, new.tdo_texto, d.solicitud_id, 2
+        FROM solicitudes_documentosolicitud d
+        WHERE d.doc_id = new.documento_id AND new.tdo_texto != '';
+"""
+
+CREAR_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS solicitudes_busqueda_tdo_ai
+    AFTER INSERT ON solicitudes_textodocumento BEGIN
+        {_INSERTAR_DOCUMENTO}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS solicitudes_busqueda_tdo_au
+    AFTER UPDATE OF tdo_texto ON solicitudes_textodocumento BEGIN
+        DELETE FROM solicitudes_busqueda WHERE rowid = old.documento_id * 4 + 2;
+        {_INSERTAR_DOCUMENTO}
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS solicitudes_busqueda_tdo_ad
+    AFTER DELETE ON solicitudes_textodocumento BEGIN
+        DELETE FROM solicitudes_busqueda WHERE rowid = old.documento_id * 4 + 2;
+    END
+    """,
+]
+
+ELIMINAR_TRIGGERS = [
+    'DROP TRIGGER IF EXISTS solicitudes_busqueda_tdo_ai',
+    'DROP TRIGGER IF EXISTS solicitudes_busqueda_tdo_au',
+    'DROP TRIGGER IF EXISTS solicitudes_busqueda_tdo_ad',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solicitudes', '0009_cambios_solicitud'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TextoDocumento',
+            fields=[
+                ('documento', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='texto', serialize=False, to='solicitudes.documentosolicitud')),
+                ('tdo_estado', models.CharField(choices=[('P', 'Pendiente'), ('E', 'Extraído'), ('F', 'Fallido'), ('N', 'Formato no soportado')], default='P', max_length=1)),
+                ('tdo_texto', models.TextField(blank=True)),
+                ('tdo_error', models.TextField(blank=True)),
+                ('tdo_fecha_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tdo_estado', 'documento'], name='tdo_estado_idx')],
+            },
+        ),
+        # Indexado del texto extraído en la tabla FTS5 de solicitudes/busqueda.py.
+        migrations.RunSQL(CREAR_TRIGGERS, ELIMINAR_TRIGGERS),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+# Una fila por catálogo de solicitudes/catalogos.py. Con las filas creadas de antemano,
+# CatalogoCacheado.invalidar() es un único UPDATE vca_version + 1, sin carreras al crearlas.
+CATALOGOS = ('estado_solicitud', 'tipo_usuario')
+
+
+def sembrar(apps, schema_editor):
+    VersionCatalogo = apps.get_model('solicitudes', 'VersionCatalogo')
+    for catalogo in CATALOGOS:
+        VersionCatalogo.objects.get_or_create(vca_catalogo=catalogo, defaults={'vca_version': 0})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solicitudes', '0010_texto_documentos'),
+    ]
+
+    operations = [
+        migrations.RunPython(sembrar, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,9 @@
 # solicitudes/models.py
+import os
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
+from .almacenamiento import obtener_almacenamiento_documentos, sha256_de_nombre
 
 def ruta_archivos_solicitud(instance, filename):
     # El archivo se subirá a MEDIA_ROOT/solicitud_archivos/<id_solicitud>/<filename>
@@ -28,6 +31,14 @@ class SolicitudAyuda(models.Model):
     def __str__(self):
         return f"Solicitud #{self.sca_id}: {self.sca_titulo}"
 
+    class Meta:
+        # Filtros por estado/solicitante con rango de fechas y orden del cursor (fecha, id).
+        indexes = [
+            models.Index(fields=['est_id', 'sca_fecha_creacion', 'sca_id'], name='sca_estado_fecha_idx'),
+            models.Index(fields=['solicitante', 'sca_fecha_creacion', 'sca_id'], name='sca_solicitante_fecha_idx'),
+            models.Index(fields=['sca_fecha_creacion', 'sca_id'], name='sca_fecha_idx'),
+        ]
+
 class BitacoraSolicitud(models.Model):
     bsca_id = models.AutoField(primary_key=True)
     sca_id = models.ForeignKey(SolicitudAyuda,on_delete=models.CASCADE,related_name='bitacora')
@@ -42,15 +53,147 @@ class BitacoraSolicitud(models.Model):
 
     class Meta:
         ordering = ['-bsca_fecha_creacion']
+        # Bitácora de una solicitud por fecha; sirve a las lecturas incrementales ('since').
+        indexes = [
+            models.Index(fields=['sca_id', 'bsca_fecha_creacion', 'bsca_id'], name='bsca_solicitud_fecha_idx'),
+        ]
 
 class DocumentoSolicitud(models.Model):
     doc_id = models.AutoField(primary_key=True)
     solicitud = models.ForeignKey( SolicitudAyuda, on_delete=models.CASCADE,related_name='documentos' )
     bitacora = models.ForeignKey(BitacoraSolicitud,related_name='documentos',on_delete=models.SET_NULL,null=True,blank=True,)
-    doc_archivo = models.FileField(upload_to=ruta_archivos_solicitud)
+    doc_archivo = models.FileField(upload_to=ruta_archivos_solicitud, storage=obtener_almacenamiento_documentos)
+    doc_nombre_original = models.CharField(max_length=255, blank=True)
+    doc_sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    doc_tamano = models.PositiveBigIntegerField(null=True, blank=True)
     doc_fecha_creacion = models.DateTimeField(auto_now_add=True)
     doc_fecha_actualizacion = models.DateTimeField(auto_now=True)
     doc_usuario_actualizacion = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL,null=True,blank=True,related_name='+')
 
     def __str__(self):
-        return f"Documento para Solicitud #{self.solicitud.sca_id}"
\ No newline at end of file
+        return f"Documento para Solicitud #{self.solicitud.sca_id}"
+
+    def save(self, *args, **kwargs):
+        archivo = self.doc_archivo
+        if archivo and not archivo._committed:
+            # El almacén renombra el archivo a su hash; se guarda el nombre con que se subió.
+            self.doc_nombre_original = self.doc_nombre_original or os.path.basename(archivo.name)
+            self.doc_tamano = archivo.size
+            archivo.save(archivo.name, archivo.file, save=False)
+        if archivo:
+            self.doc_sha256 = sha256_de_nombre(archivo.name)
+        super().save(*args, **kwargs)
+
+    @property
+    def nombre_archivo(self):
+        return self.doc_nombre_original or os.path.basename(self.doc_archivo.name)
+
+
+class VersionCatalogo(models.Model):
+    # Contador de versión por catálogo; cada proceso compara su copia en caché con este valor.
+    vca_catalogo = models.CharField(max_length=40, primary_key=True)
+    vca_version = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.vca_catalogo} v{self.vca_version}"
+
+class CorreoPendiente(models.Model):
+    # Bandeja de salida: los correos se insertan en la misma transacción que el cambio que
+    # los origina y el comando 'enviar_correos' los despacha por lotes.
+    PENDIENTE = 'P'
+    ENVIADO = 'E'
+    FALLIDO = 'F'
+    ESTADO_CHOICES = [
+        (PENDIENTE, 'Pendiente'),
+        (ENVIADO, 'Enviado'),
+        (FALLIDO, 'Fallido'),
+    ]
+    cop_id = models.AutoField(primary_key=True)
+    cop_asunto = models.CharField(max_length=255)
+    cop_mensaje = models.TextField()
+    cop_remitente = models.CharField(max_length=254)
+    cop_destinatarios = models.JSONField(default=list)
+    cop_estado = models.CharField(max_length=1, choices=ESTADO_CHOICES, default=PENDIENTE)
+    cop_intentos = models.PositiveIntegerField(default=0)
+    cop_proximo_intento = models.DateTimeField(default=timezone.now)
+    cop_ultimo_error = models.TextField(blank=True)
+    cop_fecha_creacion = models.DateTimeField(auto_now_add=True)
+    cop_fecha_envio = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Correo #{self.cop_id}: {self.cop_asunto}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['cop_estado', 'cop_proximo_intento'], name='cop_pendientes_idx'),
+        ]
+
+class ResumenSolicitudes(models.Model):
+    # Cantidad de solicitudes por estado y mes de creación, mantenida en la misma transacción
+    # que crea o cambia de estado cada solicitud (ver solicitudes/resumen.py).
+    rso_id = models.AutoField(primary_key=True)
+    est_id = models.ForeignKey(EstadoSolicitud, on_delete=models.CASCADE, related_name='resumenes')
+    rso_anio = models.PositiveSmallIntegerField()
+    rso_mes = models.PositiveSmallIntegerField()
+    rso_cantidad = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.est_id_id} {self.rso_anio}-{self.rso_mes:02d}: {self.rso_cantidad}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['est_id', 'rso_anio', 'rso_mes'], name='rso_estado_periodo_uniq'),
+        ]
+
+class CambioSolicitud(models.Model):
+    # Registro de cambios (change feed) de solicitudes y bitácora. cso_id es la secuencia que
+    # consumen los clientes (ver solicitudes/cambios.py); se escribe en la misma transacción
+    # que el cambio.
+    CREADA = 'solicitud_creada'
+    MODIFICADA = 'solicitud_modificada'
+    ANULADA = 'solicitud_anulada'
+    BITACORA = 'bitacora_creada'
+    DOCUMENTO_ELIMINADO = 'documento_eliminado'
+    TIPO_CHOICES = [
+        (CREADA, 'Solicitud creada'),
+        (MODIFICADA, 'Solicitud modificada'),
+        (ANULADA, 'Solicitud anulada'),
+        (BITACORA, 'Registro de bitácora creado'),
+        (DOCUMENTO_ELIMINADO, 'Documento eliminado'),
+    ]
+    cso_id = models.AutoField(primary_key=True)
+    sca_id = models.ForeignKey(SolicitudAyuda, on_delete=models.CASCADE, related_name='cambios')
+    cso_tipo = models.CharField(max_length=30, choices=TIPO_CHOICES)
+    cso_datos = models.JSONField(default=dict)
+    cso_fecha = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Cambio #{self.cso_id}: {self.cso_tipo} en solicitud {self.sca_id_id}"
+
+class TextoDocumento(models.Model):
+    # Texto extraído de un DocumentoSolicitud para la búsqueda. La fila se crea PENDIENTE en la
+    # misma transacción que el documento y 'manage.py extraer_textos' la procesa (ver
+    # solicitudes/extraccion.py); los triggers de solicitudes/busqueda.py la indexan.
+    PENDIENTE = 'P'
+    EXTRAIDO = 'E'
+    FALLIDO = 'F'
+    NO_SOPORTADO = 'N'
+    ESTADO_CHOICES = [
+        (PENDIENTE, 'Pendiente'),
+        (EXTRAIDO, 'Extraído'),
+        (FALLIDO, 'Fallido'),
+        (NO_SOPORTADO, 'Formato no soportado'),
+    ]
+    documento = models.OneToOneField(DocumentoSolicitud, on_delete=models.CASCADE, primary_key=True, related_name='texto')
+    tdo_estado = models.CharField(max_length=1, choices=ESTADO_CHOICES, default=PENDIENTE)
+    tdo_texto = models.TextField(blank=True)
+    tdo_error = models.TextField(blank=True)
+    tdo_fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Texto del documento #{self.documento_id} ({self.get_tdo_estado_display()})"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['tdo_estado', 'documento'], name='tdo_estado_idx'),
+        ]
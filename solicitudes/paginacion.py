@@ -0,0 +1,112 @@
+# solicitudes/paginacion.py
+import base64
+import binascii
+import json
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework import status
+from rest_framework.response import Response
+
+# Paginación por cursor (keyset): cada página filtra por "después de la última fila vista"
+# sobre las columnas de orden, así una página profunda cuesta lo mismo que la primera.
+
+
+class ParametroPaginacionInvalido(ValueError):
+    pass
+
+
+def leer_parametros_paginacion(parametros):
+    # Devuelve (cursor, limite, paginado). 'paginado' indica si el cliente pidió paginar;
+    # los clientes antiguos (sin cursor ni limit) reciben la lista con el tope del servidor.
+    cursor = parametros.get('cursor') or None
+    limite = parametros.get('limit')
+    paginado = cursor is not None or limite not in (None, '')
+
+    if limite in (None, ''):
+        limite = settings.PAGINACION_LIMITE_POR_DEFECTO if paginado else settings.PAGINACION_LIMITE_MAXIMO
+    try:
+        limite = int(limite)
+    except (TypeError, ValueError):
+        raise ParametroPaginacionInvalido("El parámetro 'limit' debe ser un número entero.")
+    if limite < 1:
+        raise ParametroPaginacionInvalido("El parámetro 'limit' debe ser mayor que cero.")
+
+    return cursor, min(limite, settings.PAGINACION_LIMITE_MAXIMO), paginado
+
+
+def codificar_cursor(valores):
+    crudo = json.dumps([v.isoformat() if hasattr(v, 'isoformat') else v for v in valores])
+    return base64.urlsafe_b64encode(crudo.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor, modelo, campos):
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+    except (binascii.Error, ValueError, TypeError):
+        raise ParametroPaginacionInvalido("El parámetro 'cursor' no es válido.")
+    if not isinstance(valores, list) or len(valores) != len(campos):
+        raise ParametroPaginacionInvalido("El parámetro 'cursor' no es válido.")
+
+    # Cada valor pasa por to_python() de su campo: un cursor manipulado ('abc' en un id)
+    # debe dar 400, no un error al filtrar.
+    decodificados = []
+    for campo, valor in zip(campos, valores):
+        try:
+            valor = modelo._meta.get_field(campo).to_python(valor)
+        except (ValidationError, TypeError, ValueError):
+            valor = None
+        if valor is None:
+            raise ParametroPaginacionInvalido("El parámetro 'cursor' no es válido.")
+        decodificados.append(valor)
+    return decodificados
+
+
+def _despues_de(campos, valores):
+    # (a, b) > (x, y)  <=>  a > x  OR  (a = x AND b > y)
+    condicion = Q()
+    for i, campo in enumerate(campos):
+        iguales = {campos[j]: valores[j] for j in range(i)}
+        condicion |= Q(**iguales, **{f'{campo}__gt': valores[i]})
+    return condicion
+
+
+def consulta_pagina(queryset, campos, cursor=None, limite=None):
+    # Queryset de la página (con una fila extra para saber si hay otra página).
+    if limite is None:
+        limite = settings.PAGINACION_LIMITE_MAXIMO
+    queryset = queryset.order_by(*campos)
+    if cursor:
+        queryset = queryset.filter(_despues_de(campos, decodificar_cursor(cursor, queryset.model, campos)))
+    return queryset[:limite + 1], limite
+
+
+def paginar_por_cursor(queryset, campos, cursor=None, limite=None):
+    # Devuelve (filas, siguiente_cursor). siguiente_cursor es None en la última página.
+    queryset, limite = consulta_pagina(queryset, campos, cursor, limite)
+    return cerrar_pagina(list(queryset), campos, limite)
+
+
+async def apaginar_por_cursor(queryset, campos, cursor=None, limite=None):
+    queryset, limite = consulta_pagina(queryset, campos, cursor, limite)
+    return cerrar_pagina([fila async for fila in queryset], campos, limite)
+
+
+def cerrar_pagina(filas, campos, limite):
+    siguiente = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        ultima = filas[-1]
+        siguiente = codificar_cursor([getattr(ultima, campo) for campo in campos])
+    return filas, siguiente
+
+
+def respuesta_paginada(results, siguiente, paginado):
+    if paginado:
+        return Response({"results": results, "next_cursor": siguiente}, status=status.HTTP_200_OK)
+    # Formato antiguo (lista): el cursor de la página siguiente viaja en la cabecera.
+    respuesta = Response(results, status=status.HTTP_200_OK)
+    if siguiente:
+        respuesta['X-Next-Cursor'] = siguiente
+    return respuesta
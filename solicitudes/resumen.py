@@ -0,0 +1,114 @@
+# solicitudes/resumen.py
+from collections import Counter
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import ExtractMonth, ExtractYear
+from django.utils import timezone
+from .filtros import FiltroInvalido
+from .models import ResumenSolicitudes, SolicitudAyuda
+
+# Conteo de solicitudes por (estado, año, mes de creación). Las vistas lo actualizan dentro de
+# su transacción, de modo que el resumen nunca queda adelantado ni atrasado respecto de las
+# filas; 'conciliar_resumen' lo recalcula desde cero si alguna escritura lo esquivó.
+
+
+def periodo(fecha):
+    fecha = timezone.localtime(fecha)
+    return fecha.year, fecha.month
+
+
+def sumar(estado_id, anio, mes, delta):
+    if not delta:
+        return
+    filas = ResumenSolicitudes.objects.filter(est_id=estado_id, rso_anio=anio, rso_mes=mes)
+    if filas.update(rso_cantidad=F('rso_cantidad') + delta):
+        return
+    try:
+        with transaction.atomic():
+            ResumenSolicitudes.objects.create(est_id_id=estado_id, rso_anio=anio, rso_mes=mes, rso_cantidad=delta)
+    except IntegrityError:
+        # Otra transacción creó el contador entre el update y el insert.
+        filas.update(rso_cantidad=F('rso_cantidad') + delta)
+
+
+def registrar_creacion(solicitud):
+    sumar(solicitud.est_id_id, *periodo(solicitud.sca_fecha_creacion), 1)
+
+
+def registrar_cambio_estado(solicitud, estado_anterior_id):
+    if estado_anterior_id == solicitud.est_id_id:
+        return
+    anio, mes = periodo(solicitud.sca_fecha_creacion)
+    sumar(estado_anterior_id, anio, mes, -1)
+    sumar(solicitud.est_id_id, anio, mes, 1)
+
+
+def registrar_cambios_estado(cambios):
+    # Igual que registrar_cambio_estado para [(solicitud, estado_anterior_id)], con una
+    # escritura por contador afectado en lugar de dos por solicitud.
+    deltas = Counter()
+    for solicitud, estado_anterior_id in cambios:
+        if estado_anterior_id == solicitud.est_id_id:
+            continue
+        anio, mes = periodo(solicitud.sca_fecha_creacion)
+        deltas[(estado_anterior_id, anio, mes)] -= 1
+        deltas[(solicitud.est_id_id, anio, mes)] += 1
+    for (estado_id, anio, mes), delta in deltas.items():
+        sumar(estado_id, anio, mes, delta)
+
+
+def conteo_real():
+    # {(estado, año, mes): cantidad} calculado sobre SolicitudAyuda.
+    filas = (
+        SolicitudAyuda.objects
+        .annotate(anio=ExtractYear('sca_fecha_creacion'), mes=ExtractMonth('sca_fecha_creacion'))
+        .values('est_id', 'anio', 'mes')
+        .annotate(cantidad=Count('sca_id'))
+        .order_by()
+    )
+    return {(f['est_id'], f['anio'], f['mes']): f['cantidad'] for f in filas}
+
+
+def conteo_resumen():
+    filas = ResumenSolicitudes.objects.values_list('est_id', 'rso_anio', 'rso_mes', 'rso_cantidad')
+    return {(estado, anio, mes): cantidad for estado, anio, mes, cantidad in filas if cantidad}
+
+
+def conciliar(aplicar=True):
+    # Devuelve [(clave, cantidad_resumen, cantidad_real)] de los contadores que difieren y,
+    # si aplicar es True, reemplaza el resumen por el conteo real.
+    with transaction.atomic():
+        real = conteo_real()
+        actual = conteo_resumen()
+        diferencias = [
+            (clave, actual.get(clave, 0), real.get(clave, 0))
+            for clave in sorted(real.keys() | actual.keys())
+            if actual.get(clave, 0) != real.get(clave, 0)
+        ]
+        if aplicar:
+            ResumenSolicitudes.objects.all().delete()
+            ResumenSolicitudes.objects.bulk_create([
+                ResumenSolicitudes(est_id_id=estado, rso_anio=anio, rso_mes=mes, rso_cantidad=cantidad)
+                for (estado, anio, mes), cantidad in real.items()
+            ])
+    return diferencias
+
+
+def _entero(valor, nombre):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        raise FiltroInvalido(f"El filtro '{nombre}' debe ser un número entero.")
+
+
+def contadores(filtros):
+    # Lee solo los contadores pedidos: el costo depende de la cantidad de meses y estados,
+    # no de la cantidad de solicitudes.
+    queryset = ResumenSolicitudes.objects.filter(rso_cantidad__gt=0)
+    if filtros.get('estado_id'):
+        queryset = queryset.filter(est_id=_entero(filtros['estado_id'], 'estado_id'))
+    if filtros.get('year'):
+        queryset = queryset.filter(rso_anio=_entero(filtros['year'], 'year'))
+    if filtros.get('month'):
+        queryset = queryset.filter(rso_mes=_entero(filtros['month'], 'month'))
+    return queryset.order_by('rso_anio', 'rso_mes', 'est_id').values_list('est_id', 'rso_anio', 'rso_mes', 'rso_cantidad')
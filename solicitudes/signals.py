@@ -0,0 +1,23 @@
+# solicitudes/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from users.models import TipoUsuario
+from .catalogos import estados, tipos_usuario
+from .models import EstadoSolicitud
+
+
+# Cualquier cambio en los catálogos (vistas, admin, shell, fixtures) sube su versión para que
+# todos los workers recarguen su copia. bulk_create/update no emiten señales: quien los use
+# debe llamar a invalidar() (ver management/sembrado.py).
+
+@receiver(post_save, sender=EstadoSolicitud)
+@receiver(post_delete, sender=EstadoSolicitud)
+def estado_modificado(sender, **kwargs):
+    transaction.on_commit(estados.invalidar)
+
+
+@receiver(post_save, sender=TipoUsuario)
+@receiver(post_delete, sender=TipoUsuario)
+def tipo_usuario_modificado(sender, **kwargs):
+    transaction.on_commit(tipos_usuario.invalidar)
@@ -0,0 +1,55 @@
+# solicitudes/subidas.py
+import hashlib
+import tempfile
+from functools import wraps
+from django.core.files.uploadedfile import TemporaryUploadedFile, UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from .almacenamiento import almacenamiento_documentos
+
+# Manejador de subidas que escribe cada fragmento directamente en el directorio temporal del
+# almacén de documentos mientras calcula tamaño y SHA-256. Al guardar, el almacén solo tiene
+# que renombrar el temporal a su blob (o descartarlo si ya existe): no hay copias en memoria
+# ni una segunda escritura del archivo.
+
+
+class ArchivoSubidoDirecto(TemporaryUploadedFile):
+
+    def __init__(self, name, content_type, size, charset, content_type_extra=None):
+        archivo = tempfile.NamedTemporaryFile(suffix='.upload', dir=almacenamiento_documentos.directorio_temporal())
+        UploadedFile.__init__(self, archivo, name, content_type, size, charset, content_type_extra)
+        self.sha256 = None
+
+
+class SubidaDirectaHandler(FileUploadHandler):
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.archivo = ArchivoSubidoDirecto(self.file_name, self.content_type, 0, self.charset, self.content_type_extra)
+        self.hasher = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.archivo.write(raw_data)
+        self.hasher.update(raw_data)
+
+    def file_complete(self, file_size):
+        self.archivo.flush()
+        self.archivo.seek(0)
+        self.archivo.size = file_size
+        self.archivo.sha256 = self.hasher.hexdigest()
+        return self.archivo
+
+    def upload_interrupted(self):
+        if hasattr(self, 'archivo'):
+            self.archivo.close()
+
+
+def subida_directa(vista):
+    # Instala SubidaDirectaHandler solo en las vistas que reciben documentos; el resto del
+    # proyecto (usuarios, admin) conserva los FILE_UPLOAD_HANDLERS de Django. Va debajo de
+    # @api_view y antes de cualquier acceso a request.data.
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        peticion = getattr(request, '_request', request)
+        peticion.upload_handlers = [SubidaDirectaHandler(peticion)]
+        return vista(request, *args, **kwargs)
+    return envoltura
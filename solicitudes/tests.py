@@ -1,3 +1,1579 @@
-from django.test import TestCase
+import asyncio
+import hashlib
+import io
+import json
+import os
+import socketserver
+import tempfile
+import threading
+import time
+import zipfile
+from asgiref.sync import sync_to_async
+from concurrent.futures.process import BrokenProcessPool
+from backTecho.metricas import Registro, registro
+from backTecho.replicas import marcar_escritura, replicar, verificar_configuracion
+from datetime import datetime
+from unittest import mock
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection, connections, transaction
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase, APITransactionTestCase
+from users.autenticacion import cache_tokens
+from users.models import CustomUser, TipoUsuario
+from .models import SolicitudAyuda, DocumentoSolicitud, BitacoraSolicitud, EstadoSolicitud, CorreoPendiente, CambioSolicitud, TextoDocumento, VersionCatalogo
+from .cambios import difusor, leer_desde, registrar as registrar_cambio, ultima_secuencia
+from .catalogos import CatalogoCacheado, estados, tipos_usuario
+from .almacenamiento import almacenamiento_documentos, nombre_blob
+from .correos import encolar_correo, procesar_pendientes, reclamar_lote
+from .documentos import liberar_blob, referencias_blob
+from .paginacion import codificar_cursor
+from .extraccion import encolar_extraccion
+from .views import enviar_notificacion_nueva_solicitud
 
-# Create your tests here.
+
+def crear_usuario(numero=0, **extra):
+    return CustomUser.objects.create_user(
+        email=f'usuario{numero}@techo.cl',
+        password='clave-segura',
+        rut=f'{numero}-K',
+        first_name='Nombre',
+        last_name='Paterno',
+        apellido_materno='Materno',
+        **extra
+    )
+
+
+def call_command_salida(*args):
+    salida = io.StringIO()
+    call_command(*args, stdout=salida)
+    return salida.getvalue().strip()
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class BaseSolicitudesTest(APITestCase):
+
+    def setUp(self):
+        estados.limpiar()
+        tipos_usuario.limpiar()
+        self.usuario = crear_usuario()
+        self.estado = EstadoSolicitud.objects.create(est_nombre='Ingresada')
+        self.client.force_authenticate(self.usuario)
+
+    def crear_solicitudes(self, cantidad, documentos_por_solicitud=0, inicio=0):
+        for numero in range(inicio, inicio + cantidad):
+            solicitante = crear_usuario(1000 + numero)
+            solicitud = SolicitudAyuda.objects.create(
+                sca_titulo=f'Solicitud {numero}',
+                sca_descripcion='Descripción',
+                est_id=self.estado,
+                solicitante=solicitante
+            )
+            bitacora = BitacoraSolicitud.objects.create(sca_id=solicitud, usuario=solicitante, bsca_observacion='Creada')
+            for indice in range(documentos_por_solicitud):
+                DocumentoSolicitud(solicitud=solicitud, bitacora=bitacora, doc_archivo=f'solicitud_archivos/{numero}/doc{indice}.docx').save()
+
+    def contar_consultas(self, url, datos):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.post(url, datos, format='json')
+        self.assertEqual(respuesta.status_code, 200)
+        return len(consultas), respuesta
+
+
+class PresupuestoConsultasTest(BaseSolicitudesTest):
+
+    def test_filtrar_solicitudes_no_crece_con_las_filas(self):
+        url = reverse('filtrar-solicitudes')
+        self.crear_solicitudes(2, documentos_por_solicitud=2)
+        pocas, respuesta = self.contar_consultas(url, {})
+        self.assertEqual(len(respuesta.data), 2)
+
+        self.crear_solicitudes(20, documentos_por_solicitud=2, inicio=2)
+        muchas, respuesta = self.contar_consultas(url, {})
+        self.assertEqual(len(respuesta.data), 22)
+        self.assertEqual(len(respuesta.data[-1]['documentos']), 2)
+        self.assertEqual(pocas, muchas)
+
+    def test_filtrar_bitacora_no_crece_con_las_filas(self):
+        url = reverse('filtrar-bitacora')
+        self.crear_solicitudes(1, documentos_por_solicitud=1)
+        solicitud = SolicitudAyuda.objects.get()
+        pocas, _ = self.contar_consultas(url, {'solicitud_id': solicitud.sca_id})
+
+        for numero in range(15):
+            registro = BitacoraSolicitud.objects.create(sca_id=solicitud, usuario=crear_usuario(2000 + numero), bsca_observacion='Nota')
+            DocumentoSolicitud(solicitud=solicitud, bitacora=registro, doc_archivo=f'solicitud_archivos/x/{numero}.png').save()
+        muchas, respuesta = self.contar_consultas(url, {'solicitud_id': solicitud.sca_id})
+        self.assertEqual(len(respuesta.data), 16)
+        self.assertEqual(pocas, muchas)
+
+
+class PaginacionCursorTest(BaseSolicitudesTest):
+
+    def test_recorre_todas_las_paginas_sin_repetir(self):
+        self.crear_solicitudes(7)
+        # Fechas repetidas: el desempate lo hace sca_id.
+        SolicitudAyuda.objects.filter(sca_id__lte=4).update(sca_fecha_creacion=SolicitudAyuda.objects.first().sca_fecha_creacion)
+        url = reverse('filtrar-solicitudes')
+        vistos, cursor = [], None
+        while True:
+            datos = {'limit': 3}
+            if cursor:
+                datos['cursor'] = cursor
+            respuesta = self.client.post(url, datos, format='json')
+            self.assertEqual(respuesta.status_code, 200)
+            vistos += [fila['sca_id'] for fila in respuesta.data['results']]
+            cursor = respuesta.data['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(sorted(vistos), list(SolicitudAyuda.objects.order_by('sca_id').values_list('sca_id', flat=True)))
+        self.assertEqual(len(vistos), len(set(vistos)))
+
+    @override_settings(PAGINACION_LIMITE_MAXIMO=4)
+    def test_clientes_sin_cursor_reciben_lista_con_tope(self):
+        self.crear_solicitudes(6)
+        respuesta = self.client.post(reverse('filtrar-solicitudes'), {}, format='json')
+        self.assertIsInstance(respuesta.data, list)
+        self.assertEqual(len(respuesta.data), 4)
+        self.assertIn('X-Next-Cursor', respuesta)
+
+    def test_cursor_invalido(self):
+        respuesta = self.client.post(reverse('filtrar-solicitudes'), {'cursor': 'no-es-un-cursor'}, format='json')
+        self.assertEqual(respuesta.status_code, 400)
+        # Cursores bien codificados con valores manipulados.
+        for valores in (['2024-01-01T00:00:00', 'abc'], ['ayer', 1], [None, 1], ['2024-01-01T00:00:00', [1]]):
+            cursor = codificar_cursor(valores)
+            respuesta = self.client.post(reverse('filtrar-solicitudes'), {'cursor': cursor, 'limit': 2}, format='json')
+            self.assertEqual(respuesta.status_code, 400, valores)
+        respuesta = self.client.get('/solicitudes/usuario/lista/', {'cursor': codificar_cursor(['abc'])})
+        self.assertEqual(respuesta.status_code, 400)
+
+    def test_listar_usuarios_paginado(self):
+        for numero in range(1, 5):
+            crear_usuario(numero)
+        primera = self.client.get('/solicitudes/usuario/lista/', {'limit': 3})
+        segunda = self.client.get('/solicitudes/usuario/lista/', {'limit': 3, 'cursor': primera.data['next_cursor']})
+        ids = [fila['id'] for fila in primera.data['results'] + segunda.data['results']]
+        self.assertEqual(ids, list(CustomUser.objects.order_by('id').values_list('id', flat=True)))
+        self.assertIsNone(segunda.data['next_cursor'])
+
+
+class ExportacionStreamingTest(BaseSolicitudesTest):
+
+    def leer_json(self, respuesta):
+        self.assertTrue(respuesta.streaming)
+        return json.loads(b''.join(respuesta.streaming_content))
+
+    @override_settings(PAGINACION_LIMITE_MAXIMO=2, EXPORTACION_TAMANO_LOTE=2)
+    def test_filtrar_solicitudes_stream_exporta_todo(self):
+        self.crear_solicitudes(5, documentos_por_solicitud=1)
+        respuesta = self.client.post(reverse('filtrar-solicitudes'), {'stream': True}, format='json')
+        filas = self.leer_json(respuesta)
+        self.assertEqual(len(filas), 5)
+        self.assertEqual(len(filas[0]['documentos']), 1)
+
+    def test_stream_sin_filas(self):
+        respuesta = self.client.post(reverse('filtrar-solicitudes'), {'stream': 'true', 'estado_id': 999}, format='json')
+        self.assertEqual(self.leer_json(respuesta), [])
+
+    def test_listar_usuarios_stream(self):
+        respuesta = self.client.get('/solicitudes/usuario/lista/', {'stream': 'true'})
+        self.assertEqual([fila['email'] for fila in self.leer_json(respuesta)], [self.usuario.email])
+
+
+class FiltroFechasTest(BaseSolicitudesTest):
+
+    def setUp(self):
+        super().setUp()
+        self.crear_solicitudes(4)
+        fechas = [datetime(2025, 1, 31, 23, 59), datetime(2025, 2, 1), datetime(2025, 2, 14, 12), datetime(2026, 2, 14)]
+        for solicitud, fecha in zip(SolicitudAyuda.objects.order_by('sca_id'), fechas):
+            SolicitudAyuda.objects.filter(pk=solicitud.pk).update(sca_fecha_creacion=timezone.make_aware(fecha))
+
+    def titulos(self, filtros):
+        respuesta = self.client.post(reverse('filtrar-solicitudes'), filtros, format='json')
+        self.assertEqual(respuesta.status_code, 200, respuesta.data)
+        return [fila['sca_titulo'] for fila in respuesta.data]
+
+    def test_year_month_day_como_rangos(self):
+        self.assertEqual(self.titulos({'year': 2025}), ['Solicitud 0', 'Solicitud 1', 'Solicitud 2'])
+        self.assertEqual(self.titulos({'year': 2025, 'month': 2}), ['Solicitud 1', 'Solicitud 2'])
+        self.assertEqual(self.titulos({'year': 2025, 'month': 2, 'day': 14}), ['Solicitud 2'])
+        self.assertEqual(self.titulos({'month': 2, 'day': 14}), ['Solicitud 2', 'Solicitud 3'])
+
+    def test_desde_hasta(self):
+        self.assertEqual(self.titulos({'desde': '2025-02-01', 'hasta': '2025-02-14'}), ['Solicitud 1', 'Solicitud 2'])
+        self.assertEqual(self.titulos({'desde': '2025-01-31T23:59:00', 'hasta': '2025-02-14T12:00:00'}), ['Solicitud 0', 'Solicitud 1'])
+
+    def test_fecha_invalida(self):
+        respuesta = self.client.post(reverse('filtrar-solicitudes'), {'year': 2025, 'month': 13}, format='json')
+        self.assertEqual(respuesta.status_code, 400)
+        respuesta = self.client.post(reverse('filtrar-solicitudes'), {'desde': 'ayer'}, format='json')
+        self.assertEqual(respuesta.status_code, 400)
+
+    async def test_parametros_invalidos_dan_400(self):
+        cabecera = {'Authorization': f"Token {(await Token.objects.acreate(user=self.usuario)).key}"}
+        await sync_to_async(cache_tokens.limpiar)()
+        for filtros in ({'day': 'x'}, {'month': 13}, {'month': 0}, {'day': 32}, {'estado_id': 'abc'}, {'solicitante_id': 'abc'}):
+            with self.subTest(filtros=filtros):
+                sync = await sync_to_async(self.client.post)(reverse('filtrar-solicitudes'), filtros, format='json')
+                self.assertEqual(sync.status_code, 400)
+                asincrona = await self.async_client.post(
+                    reverse('filtrar-solicitudes-async'), filtros, content_type='application/json', headers=cabecera
+                )
+                self.assertEqual(asincrona.status_code, 400)
+
+    def test_plan_de_consulta_usa_indices(self):
+        desde, hasta = timezone.make_aware(datetime(2025, 1, 1)), timezone.make_aware(datetime(2026, 1, 1))
+        rango = {'sca_fecha_creacion__gte': desde, 'sca_fecha_creacion__lt': hasta}
+        orden = ('sca_fecha_creacion', 'sca_id')
+
+        plan = SolicitudAyuda.objects.filter(est_id=self.estado, **rango).order_by(*orden).explain()
+        self.assertIn('sca_estado_fecha_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+        plan = SolicitudAyuda.objects.filter(solicitante_id=self.usuario.id, **rango).order_by(*orden).explain()
+        self.assertIn('sca_solicitante_fecha_idx', plan)
+
+        plan = SolicitudAyuda.objects.filter(**rango).order_by(*orden).explain()
+        self.assertIn('sca_fecha_idx', plan)
+
+
+class CacheCatalogosTest(BaseSolicitudesTest):
+
+    def test_estados_se_leen_desde_cache(self):
+        url = reverse('filtrar-estado')
+        self.client.post(url, {}, format='json')
+        with self.assertNumQueries(1):
+            respuesta = self.client.post(url, {}, format='json')
+        self.assertEqual([e['estado_nombre'] for e in respuesta.data['estados']], ['Ingresada'])
+
+    def test_crear_estado_invalida_la_cache(self):
+        url = reverse('filtrar-estado')
+        self.client.post(url, {}, format='json')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('crear-estado'), {'nombre_estado': 'Cerrada'}, format='json')
+        respuesta = self.client.post(url, {}, format='json')
+        self.assertEqual([e['estado_nombre'] for e in respuesta.data['estados']], ['Ingresada', 'Cerrada'])
+
+    def test_cambios_fuera_de_las_vistas_invalidan_la_cache(self):
+        # Admin, shell o fixtures: las señales suben la versión al confirmar.
+        self.assertEqual(list(estados.obtener()), [self.estado.est_id])
+        with self.captureOnCommitCallbacks(execute=True):
+            nuevo = EstadoSolicitud.objects.create(est_nombre='Cerrada')
+        self.assertEqual(list(estados.obtener()), [self.estado.est_id, nuevo.est_id])
+        with self.captureOnCommitCallbacks(execute=True):
+            nuevo.delete()
+        self.assertEqual(list(estados.obtener()), [self.estado.est_id])
+
+        version = tipos_usuario.obtener_con_version()[1]
+        with self.captureOnCommitCallbacks(execute=True):
+            TipoUsuario.objects.create(tiu_nombre='Voluntario')
+        self.assertEqual(tipos_usuario.obtener_con_version()[1], version + 1)
+
+    def test_otro_proceso_ve_la_invalidacion(self):
+        otro_worker = CatalogoCacheado('estado_solicitud', lambda: set(EstadoSolicitud.objects.values_list('est_nombre', flat=True)))
+        self.assertEqual(otro_worker.obtener(), {'Ingresada'})
+        EstadoSolicitud.objects.create(est_nombre='Cerrada')
+        estados.invalidar()
+        self.assertEqual(otro_worker.obtener(), {'Ingresada', 'Cerrada'})
+
+    def test_la_migracion_siembra_una_version_por_catalogo(self):
+        self.assertEqual(
+            set(VersionCatalogo.objects.values_list('vca_catalogo', flat=True)), {estados.nombre, tipos_usuario.nombre}
+        )
+        antes = estados.obtener_con_version()[1]
+        estados.invalidar()
+        self.assertEqual(estados.obtener_con_version()[1], antes + 1)
+
+    def test_tipos_usuario_y_asignacion(self):
+        self.client.post(reverse('crear-tipo-usuario'), {'tiu_nombre': 'Voluntario'}, format='json')
+        tipos = self.client.get('/solicitudes/tipo/ver/').data
+        self.assertEqual([t['tiu_nombre'] for t in tipos], ['Voluntario'])
+        respuesta = self.client.post('/solicitudes/usuario/modificar/', {'id': self.usuario.id, 'tiu_id': tipos[0]['tiu_id']}, format='json')
+        self.assertEqual(respuesta.data['usuario']['tipo_usuario'], 'Voluntario')
+        respuesta = self.client.post('/solicitudes/tipo/usuario/', {'rut': self.usuario.rut, 'tiu_id': 999}, format='json')
+        self.assertEqual(respuesta.status_code, 404)
+
+    def test_crear_solicitud_con_estado_inexistente(self):
+        respuesta = self.client.post(reverse('crear-solicitud'), {'sca_titulo': 'T', 'sca_descripcion': 'D', 'est_id': 999})
+        self.assertEqual(respuesta.status_code, 404)
+
+
+class _ManejadorSMTP(socketserver.StreamRequestHandler):
+    # Servidor SMTP mínimo para pruebas: acepta todo salvo los destinatarios en 'rechazar'.
+
+    def responder(self, linea):
+        self.wfile.write(f'{linea}\r\n'.encode())
+
+    def handle(self):
+        servidor = self.server
+        servidor.conexiones += 1
+        self.responder('220 smtp de prueba')
+        destinatarios = []
+        while True:
+            linea = self.rfile.readline()
+            if not linea:
+                return
+            comando = linea.decode().strip()
+            verbo = comando.split(' ')[0].upper()
+            if verbo == 'MAIL':
+                destinatarios = []
+                self.responder('250 OK')
+            elif verbo == 'RCPT':
+                direccion = comando.split(':', 1)[1].strip('<> ')
+                if direccion in servidor.rechazar:
+                    self.responder('550 destinatario rechazado')
+                else:
+                    destinatarios.append(direccion)
+                    self.responder('250 OK')
+            elif verbo == 'DATA':
+                self.responder('354 terminar con .')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                servidor.mensajes.append(destinatarios)
+                self.responder('250 OK')
+            elif verbo == 'QUIT':
+                self.responder('221 adios')
+                return
+            else:
+                self.responder('250 OK')
+
+
+class ServidorSMTPPrueba(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _ManejadorSMTP)
+        self.conexiones = 0
+        self.mensajes = []
+        self.rechazar = set()
+
+
+class BandejaSalidaCorreosTest(BaseSolicitudesTest):
+
+    def setUp(self):
+        super().setUp()
+        self.smtp = ServidorSMTPPrueba()
+        threading.Thread(target=self.smtp.serve_forever, daemon=True).start()
+        self.addCleanup(self.smtp.server_close)
+        self.addCleanup(self.smtp.shutdown)
+        ajustes = override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1', EMAIL_PORT=self.smtp.server_address[1],
+            EMAIL_USE_TLS=False, EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='',
+        )
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def test_correo_se_descarta_si_la_transaccion_falla(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            encolar_correo('Asunto', 'Mensaje', ['a@techo.cl'])
+            raise RuntimeError()
+        self.assertFalse(CorreoPendiente.objects.exists())
+
+    def test_lote_usa_una_sola_conexion(self):
+        for numero in range(3):
+            encolar_correo('Asunto', 'Mensaje', [f'd{numero}@techo.cl'])
+        self.assertEqual(procesar_pendientes(), (3, 0))
+        self.assertEqual(self.smtp.conexiones, 1)
+        self.assertEqual(len(self.smtp.mensajes), 3)
+        self.assertFalse(CorreoPendiente.objects.exclude(cop_estado=CorreoPendiente.ENVIADO).exists())
+
+    @override_settings(CORREOS_REINTENTO_BASE=0)
+    def test_reintento_y_fallo_definitivo(self):
+        self.smtp.rechazar.add('malo@techo.cl')
+        malo = encolar_correo('Asunto', 'Mensaje', ['malo@techo.cl'])
+        encolar_correo('Asunto', 'Mensaje', ['bueno@techo.cl'])
+        self.assertEqual(procesar_pendientes(max_intentos=2), (1, 1))
+        malo.refresh_from_db()
+        self.assertEqual((malo.cop_estado, malo.cop_intentos), (CorreoPendiente.PENDIENTE, 1))
+        self.assertEqual(procesar_pendientes(max_intentos=2), (0, 1))
+        malo.refresh_from_db()
+        self.assertEqual(malo.cop_estado, CorreoPendiente.FALLIDO)
+
+    def test_lote_reclamado_no_lo_envia_otro_proceso(self):
+        for numero in range(3):
+            encolar_correo('Asunto', 'Mensaje', [f'd{numero}@techo.cl'])
+        reclamados = reclamar_lote(2)
+        self.assertEqual(len(reclamados), 2)
+        # Otro proceso solo ve el que quedó libre.
+        self.assertEqual(procesar_pendientes(), (1, 0))
+        self.assertEqual(procesar_pendientes(), (0, 0))
+        self.assertEqual(len(self.smtp.mensajes), 1)
+
+        # Vencido el arriendo (el proceso que reclamó murió), vuelven a estar pendientes.
+        CorreoPendiente.objects.filter(pk__in=[c.pk for c in reclamados]).update(cop_proximo_intento=timezone.now())
+        self.assertEqual(procesar_pendientes(), (2, 0))
+
+    def test_conexion_perdida_libera_los_no_intentados(self):
+        for numero in range(3):
+            encolar_correo('Asunto', 'Mensaje', [f'd{numero}@techo.cl'])
+        # El primer envío falla y la conexión no se puede reabrir.
+        with mock.patch('django.core.mail.backends.smtp.EmailBackend.open', side_effect=[True, OSError('caída')]):
+            self.assertEqual(procesar_pendientes(), (0, 1))
+        libres = CorreoPendiente.objects.filter(cop_estado=CorreoPendiente.PENDIENTE, cop_proximo_intento__lte=timezone.now())
+        self.assertEqual(libres.count(), 2)
+
+    def test_notificacion_no_envia_en_la_peticion(self):
+        solicitud = SolicitudAyuda.objects.create(sca_titulo='T', sca_descripcion='D', est_id=self.estado, solicitante=self.usuario)
+        with self.assertLogs('solicitudes.views', 'INFO'):
+            enviar_notificacion_nueva_solicitud(solicitud)
+        self.assertEqual(self.smtp.conexiones, 0)
+        self.assertEqual(CorreoPendiente.objects.get().cop_destinatarios, [self.usuario.email])
+
+
+class BaseDocumentosTest(BaseSolicitudesTest):
+
+    def setUp(self):
+        super().setUp()
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(MEDIA_ROOT=directorio.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.solicitud = SolicitudAyuda.objects.create(sca_titulo='T', sca_descripcion='D', est_id=self.estado, solicitante=self.usuario)
+
+    def crear_documento(self, nombre='informe.docx', contenido=b'0123456789', **extra):
+        return DocumentoSolicitud.objects.create(solicitud=self.solicitud, doc_archivo=SimpleUploadedFile(nombre, contenido), **extra)
+
+
+class EntregaDocumentoTest(BaseDocumentosTest):
+
+    def setUp(self):
+        super().setUp()
+        self.documento = self.crear_documento()
+        self.url = reverse('visualizar-documento', args=[self.documento.doc_id])
+
+    def test_respuesta_completa_y_304(self):
+        respuesta = self.client.get(self.url)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(b''.join(respuesta.streaming_content), b'0123456789')
+        self.assertEqual(respuesta['Accept-Ranges'], 'bytes')
+
+        repetida = self.client.get(self.url, HTTP_IF_NONE_MATCH=respuesta['ETag'])
+        self.assertEqual(repetida.status_code, 304)
+        self.assertEqual(repetida['ETag'], respuesta['ETag'])
+        por_fecha = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=respuesta['Last-Modified'])
+        self.assertEqual(por_fecha.status_code, 304)
+
+    def test_rangos(self):
+        parcial = self.client.get(self.url, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(parcial.status_code, 206)
+        self.assertEqual(b''.join(parcial.streaming_content), b'2345')
+        self.assertEqual(parcial['Content-Range'], 'bytes 2-5/10')
+
+        sufijo = self.client.get(self.url, HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(sufijo.streaming_content), b'789')
+
+        fuera = self.client.get(self.url, HTTP_RANGE='bytes=50-')
+        self.assertEqual(fuera.status_code, 416)
+
+        otra_version = self.client.get(self.url, HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"otra"')
+        self.assertEqual(otra_version.status_code, 200)
+
+    def test_rangos_sobre_archivo_vacio(self):
+        vacio = self.crear_documento('vacio.txt', b'')
+        url = reverse('visualizar-documento', args=[vacio.doc_id])
+        for rango in ('bytes=-3', 'bytes=0-', 'bytes=0-0'):
+            respuesta = self.client.get(url, HTTP_RANGE=rango)
+            self.assertEqual(respuesta.status_code, 416, rango)
+            self.assertEqual(respuesta['Content-Range'], 'bytes */0')
+        completa = self.client.get(url)
+        self.assertEqual(completa.status_code, 200)
+        self.assertEqual(b''.join(completa.streaming_content), b'')
+
+    @override_settings(DOCUMENTOS_ENTREGA='x-accel-redirect', DOCUMENTOS_X_ACCEL_PREFIJO='/protegido/')
+    def test_delegado_al_proxy(self):
+        respuesta = self.client.get(self.url)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta['X-Accel-Redirect'], '/protegido/' + self.documento.doc_archivo.name)
+        self.assertEqual(respuesta.content, b'')
+
+
+@override_settings(DOCUMENTOS_BLOB_GRACIA=0)
+class AlmacenDeduplicadoTest(BaseDocumentosTest):
+
+    def eliminar(self, documento):
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.client.post(reverse('eliminar-documento'), {'doc_id': documento.doc_id}, format='json')
+        self.assertEqual(respuesta.status_code, 200, respuesta.data)
+        return respuesta
+
+    def test_contenido_repetido_se_guarda_una_vez(self):
+        primero = self.crear_documento('informe.docx', b'mismo contenido')
+        segundo = self.crear_documento('informe.docx', b'mismo contenido')
+        distinto = self.crear_documento('otro.docx', b'otro contenido')
+        self.assertEqual(primero.doc_archivo.name, segundo.doc_archivo.name)
+        self.assertNotEqual(primero.doc_archivo.name, distinto.doc_archivo.name)
+        self.assertEqual(primero.doc_sha256, hashlib.sha256(b'mismo contenido').hexdigest())
+        self.assertEqual((segundo.doc_nombre_original, segundo.doc_tamano), ('informe.docx', 15))
+
+        ruta = primero.doc_archivo.path
+        respuesta = self.eliminar(primero)
+        self.assertEqual(respuesta.data['documento_eliminado'], 'informe.docx')
+        self.assertTrue(os.path.exists(ruta))
+        self.eliminar(segundo)
+        self.assertFalse(os.path.exists(ruta))
+        self.assertEqual(BitacoraSolicitud.objects.filter(sca_id=self.solicitud).count(), 2)
+
+    def test_liberar_blob_respeta_reutilizacion_reciente(self):
+        documento = self.crear_documento('informe.docx', b'contenido compartido')
+        nombre, ruta = documento.doc_archivo.name, documento.doc_archivo.path
+        DocumentoSolicitud.objects.filter(pk=documento.pk).delete()
+        os.utime(ruta, (0, 0))
+
+        # Una subida del mismo contenido reutiliza el blob antes de que se libere.
+        temporal = os.path.join(almacenamiento_documentos.directorio_temporal(), 'subida')
+        with open(temporal, 'wb') as archivo:
+            archivo.write(b'contenido compartido')
+        almacenamiento_documentos.guardar_temporal(temporal, documento.doc_sha256)
+        self.assertFalse(liberar_blob(nombre, gracia=60))
+        self.assertTrue(os.path.exists(ruta))
+
+        os.utime(ruta, (0, 0))
+        self.assertTrue(liberar_blob(nombre, gracia=60))
+        self.assertFalse(os.path.exists(ruta))
+        self.assertEqual(os.listdir(almacenamiento_documentos.directorio_temporal()), [])
+
+    def test_referencias_usan_el_indice_de_sha256(self):
+        documento = self.crear_documento('informe.docx', b'contenido compartido')
+        self.crear_documento('copia.docx', b'contenido compartido')
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(referencias_blob(documento.doc_archivo.name), 2)
+        self.assertIn('doc_sha256', consultas[0]['sql'])
+        self.assertNotIn('doc_archivo', consultas[0]['sql'].split('WHERE')[1])
+        plan = DocumentoSolicitud.objects.filter(doc_sha256=documento.doc_sha256).explain()
+        self.assertIn('INDEX', plan.upper())
+
+    def test_subida_tras_apartar_el_blob_deja_su_propia_copia(self):
+        documento = self.crear_documento('informe.docx', b'contenido compartido')
+        ruta = documento.doc_archivo.path
+        os.rename(ruta, ruta + '.apartado')   # como liberar_blob a mitad de camino
+        temporal = os.path.join(almacenamiento_documentos.directorio_temporal(), 'subida')
+        with open(temporal, 'wb') as archivo:
+            archivo.write(b'contenido compartido')
+        self.assertEqual(almacenamiento_documentos.guardar_temporal(temporal, documento.doc_sha256), documento.doc_archivo.name)
+        with open(ruta, 'rb') as archivo:
+            self.assertEqual(archivo.read(), b'contenido compartido')
+
+    def test_comando_pliega_duplicados_existentes(self):
+        nombres = ['solicitud_archivos/1/Informe.DOCX', 'solicitud_archivos/1/Informe_PGD7PQ9.DOCX']
+        for nombre in nombres:
+            ruta = os.path.join(settings.MEDIA_ROOT, nombre)
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            with open(ruta, 'wb') as archivo:
+                archivo.write(b'informe tecnico')
+            DocumentoSolicitud.objects.create(solicitud=self.solicitud, doc_archivo=nombre)
+
+        call_command('deduplicar_documentos', stdout=io.StringIO())
+
+        documentos = list(DocumentoSolicitud.objects.order_by('doc_id'))
+        self.assertEqual(len({d.doc_archivo.name for d in documentos}), 1)
+        self.assertEqual([d.doc_nombre_original for d in documentos], ['Informe.DOCX', 'Informe_PGD7PQ9.DOCX'])
+        self.assertTrue(os.path.exists(documentos[0].doc_archivo.path))
+        for nombre in nombres:
+            self.assertFalse(os.path.exists(os.path.join(settings.MEDIA_ROOT, nombre)))
+
+
+class SubidaDirectaTest(BaseDocumentosTest):
+
+    def test_crear_solicitud_con_varios_documentos(self):
+        archivos = [
+            SimpleUploadedFile('a.docx', b'contenido A'),
+            SimpleUploadedFile('b.png', b'contenido B' * 100000),
+            SimpleUploadedFile('a-copia.docx', b'contenido A'),
+        ]
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.post(reverse('crear-solicitud'), {
+                'sca_titulo': 'Con documentos', 'sca_descripcion': 'D', 'est_id': self.estado.est_id,
+                'documentos_data': archivos,
+            }, format='multipart')
+        self.assertEqual(respuesta.status_code, 201, respuesta.data)
+
+        inserciones = [c for c in consultas.captured_queries if c['sql'].startswith('INSERT INTO "solicitudes_documentosolicitud"')]
+        self.assertEqual(len(inserciones), 1)
+
+        documentos = DocumentoSolicitud.objects.filter(solicitud_id=respuesta.data['solicitud']['sca_id']).order_by('doc_id')
+        self.assertEqual([d.doc_nombre_original for d in documentos], ['a.docx', 'b.png', 'a-copia.docx'])
+        self.assertEqual(documentos[1].doc_tamano, 1100000)
+        self.assertEqual(documentos[1].doc_sha256, hashlib.sha256(b'contenido B' * 100000).hexdigest())
+        self.assertEqual(documentos[0].doc_archivo.name, documentos[2].doc_archivo.name)
+        with open(documentos[1].doc_archivo.path, 'rb') as archivo:
+            self.assertEqual(archivo.read(), b'contenido B' * 100000)
+        self.assertEqual(os.listdir(almacenamiento_documentos.directorio_temporal()), [])
+
+    def test_rollback_borra_los_blobs_creados(self):
+        existente = self.crear_documento('previo.docx', b'ya guardado')
+        archivos = [SimpleUploadedFile('nuevo.docx', b'contenido nuevo'), SimpleUploadedFile('previo.docx', b'ya guardado')]
+        with mock.patch('solicitudes.views.registrar_creacion', side_effect=RuntimeError('falla')):
+            respuesta = self.client.post(reverse('crear-solicitud'), {
+                'sca_titulo': 'T', 'sca_descripcion': 'D', 'est_id': self.estado.est_id, 'documentos_data': archivos,
+            }, format='multipart')
+        self.assertEqual(respuesta.status_code, 500)
+        self.assertEqual(DocumentoSolicitud.objects.count(), 1)
+        blobs = [os.path.join(raiz, archivo) for raiz, _, archivos in os.walk(almacenamiento_documentos.path('solicitud_archivos/blobs')) for archivo in archivos]
+        self.assertEqual(blobs, [existente.doc_archivo.path])
+
+    def test_bitacora_con_adjunto_fallida_no_deja_blob(self):
+        with mock.patch('solicitudes.views.registrar_cambio', side_effect=RuntimeError('falla')):
+            respuesta = self.client.post(reverse('crear-bitacora'), {
+                'solicitud_id': self.solicitud.sca_id, 'bsca_observacion': 'Con adjunto',
+                'doc_archivo': SimpleUploadedFile('acta.docx', b'acta'),
+            }, format='multipart')
+        self.assertEqual(respuesta.status_code, 500)
+        self.assertFalse(os.path.exists(almacenamiento_documentos.path(nombre_blob(hashlib.sha256(b'acta').hexdigest()))))
+
+        respuesta = self.client.post(reverse('crear-bitacora'), {
+            'solicitud_id': self.solicitud.sca_id, 'bsca_observacion': 'Con adjunto',
+            'doc_archivo': SimpleUploadedFile('acta.docx', b'acta'),
+        }, format='multipart')
+        self.assertEqual(respuesta.status_code, 201)
+        documento = DocumentoSolicitud.objects.get(bitacora_id=respuesta.data['bitacora']['bsca_id'])
+        self.assertEqual((documento.doc_nombre_original, documento.texto.tdo_estado), ('acta.docx', TextoDocumento.PENDIENTE))
+
+    def test_solo_las_vistas_de_documentos_usan_subida_directa(self):
+        CustomUser.objects.filter(pk=self.usuario.pk).update(is_staff=True)
+        self.usuario.is_staff = True
+        with mock.patch('solicitudes.subidas.SubidaDirectaHandler.new_file', side_effect=AssertionError('no debe usarse')):
+            respuesta = self.client.post('/api/auth/importar/', {'archivo': SimpleUploadedFile('u.csv', b'email\n'), 'simular': 'true'}, format='multipart')
+        self.assertEqual(respuesta.status_code, 200, respuesta.data)
+
+        with mock.patch('solicitudes.subidas.SubidaDirectaHandler.new_file', side_effect=AssertionError('usado')):
+            respuesta = self.client.post(reverse('modificar-solicitud'), {
+                'solicitud_id': self.solicitud.sca_id, 'nuevos_documentos': [SimpleUploadedFile('a.docx', b'x')],
+            }, format='multipart')
+        self.assertEqual(respuesta.status_code, 500)
+
+    def test_modificar_solicitud_agrega_documentos(self):
+        respuesta = self.client.post(reverse('modificar-solicitud'), {
+            'solicitud_id': self.solicitud.sca_id,
+            'nuevos_documentos': [SimpleUploadedFile('nuevo.docx', b'x'), SimpleUploadedFile('otro.docx', b'y')],
+        }, format='multipart')
+        self.assertEqual(respuesta.status_code, 200, respuesta.data)
+        nombres = [d['nombre_archivo'] for d in respuesta.data['solicitud_actualizada']['documentos']]
+        self.assertEqual(nombres, ['nuevo.docx', 'otro.docx'])
+
+
+class DescargaZipTest(BaseDocumentosTest):
+
+    def descargar(self, solicitud_id=None, **params):
+        return self.client.get(reverse('descargar-documentos', args=[solicitud_id or self.solicitud.sca_id]), params)
+
+    def leer_zip(self, respuesta):
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta.streaming)
+        self.assertEqual(respuesta['Content-Type'], 'application/zip')
+        return zipfile.ZipFile(io.BytesIO(b''.join(respuesta.streaming_content)))
+
+    def test_zip_con_todos_los_documentos(self):
+        bitacora = BitacoraSolicitud.objects.create(sca_id=self.solicitud, usuario=self.usuario, bsca_observacion='Visita')
+        self.crear_documento('informe.docx', b'docx ' * 1000)
+        self.crear_documento('notas.txt', b'texto ' * 1000)
+        self.crear_documento('plano.PNG', b'png', bitacora=bitacora)
+        self.crear_documento('informe.docx', b'otra version')
+
+        archivo = self.leer_zip(self.descargar())
+        self.assertIsNone(archivo.testzip())
+        entradas = {info.filename: info for info in archivo.infolist()}
+        self.assertEqual(list(entradas), ['informe.docx', 'notas.txt', 'plano.PNG', 'informe (2).docx'])
+        self.assertEqual(entradas['informe.docx'].compress_type, zipfile.ZIP_STORED)
+        self.assertEqual(entradas['plano.PNG'].compress_type, zipfile.ZIP_STORED)
+        self.assertEqual(entradas['notas.txt'].compress_type, zipfile.ZIP_DEFLATED)
+        self.assertEqual(archivo.read('notas.txt'), b'texto ' * 1000)
+        self.assertEqual(archivo.read('informe (2).docx'), b'otra version')
+
+        por_bitacora = self.leer_zip(self.descargar(bitacora_id=bitacora.bsca_id))
+        self.assertEqual(por_bitacora.namelist(), ['plano.PNG'])
+
+    @override_settings(EXPORTACION_TAMANO_LOTE=2)
+    def test_archivo_grande_se_transmite_por_bloques(self):
+        contenido = os.urandom(1024 * 1024)
+        for i in range(3):
+            self.crear_documento(f'foto{i}.jpg', contenido)
+        respuesta = self.descargar()
+        bloques = list(respuesta.streaming_content)
+        self.assertGreater(len(bloques), 40)
+        self.assertLessEqual(max(len(bloque) for bloque in bloques), 65 * 1024)
+        archivo = zipfile.ZipFile(io.BytesIO(b''.join(bloques)))
+        self.assertEqual([archivo.read(nombre) == contenido for nombre in archivo.namelist()], [True] * 3)
+
+    def test_errores(self):
+        otra = SolicitudAyuda.objects.create(sca_titulo='O', sca_descripcion='D', est_id=self.estado, solicitante=self.usuario)
+        ajena = BitacoraSolicitud.objects.create(sca_id=otra, usuario=self.usuario, bsca_observacion='Otra')
+        self.assertEqual(self.descargar(999999).status_code, 404)
+        self.assertEqual(self.descargar(bitacora_id='x').status_code, 400)
+        self.assertEqual(self.descargar(bitacora_id=ajena.bsca_id).status_code, 404)
+        self.assertEqual(self.leer_zip(self.descargar(otra.sca_id)).namelist(), [])
+
+
+class VistasAsyncTest(BaseDocumentosTest):
+
+    def setUp(self):
+        super().setUp()
+        cache_tokens.limpiar()
+        self.cabecera = {'Authorization': f'Token {Token.objects.create(user=self.usuario).key}'}
+
+    async def test_filtrar_igual_que_la_vista_sync(self):
+        await sync_to_async(self.crear_solicitudes)(3)
+        sync = await sync_to_async(self.client.post)(reverse('filtrar-solicitudes'), {'limit': 2}, format='json')
+        respuesta = await self.async_client.post(
+            reverse('filtrar-solicitudes-async'), {'limit': 2}, content_type='application/json', headers=self.cabecera
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json(), sync.json())
+
+    async def test_etag_igual_que_la_vista_sync(self):
+        await sync_to_async(self.crear_solicitudes)(2, documentos_por_solicitud=1)
+        solicitud = await SolicitudAyuda.objects.afirst()
+        for nombre, datos in (
+            ('filtrar-solicitudes-async', {'limit': 1}),
+            ('filtrar-bitacora-async', {'solicitud_id': solicitud.sca_id}),
+            ('filtrar-estado-async', {}),
+        ):
+            with self.subTest(nombre):
+                url = reverse(nombre)
+                primera = await self.async_client.post(url, datos, content_type='application/json', headers=self.cabecera)
+                self.assertEqual(primera.status_code, 200)
+                self.assertEqual(primera['Cache-Control'], 'private, no-cache')
+                repetida = await self.async_client.post(
+                    url, datos, content_type='application/json', headers={**self.cabecera, 'If-None-Match': primera['ETag']}
+                )
+                self.assertEqual(repetida.status_code, 304)
+                self.assertEqual(repetida['ETag'], primera['ETag'])
+
+    async def test_sin_token(self):
+        respuesta = await self.async_client.get(reverse('listar-usuarios-async'))
+        self.assertEqual(respuesta.status_code, 401)
+        invalido = await self.async_client.get(reverse('listar-usuarios-async'), headers={'Authorization': 'Token x'})
+        self.assertEqual(invalido.status_code, 401)
+
+    async def test_documento_por_rangos(self):
+        documento = await sync_to_async(self.crear_documento)()
+        url = reverse('visualizar-documento-async', args=[documento.doc_id])
+        respuesta = await self.async_client.get(url, headers={**self.cabecera, 'Range': 'bytes=2-5'})
+        self.assertEqual(respuesta.status_code, 206)
+        self.assertEqual(b''.join([bloque async for bloque in respuesta.streaming_content]), b'2345')
+
+
+class BusquedaTextoTest(BaseSolicitudesTest):
+
+    def setUp(self):
+        super().setUp()
+        self.otro_estado = EstadoSolicitud.objects.create(est_nombre='Aprobada')
+        self.techo = self.crear('Reparación de techo', 'Filtraciones en la cocina después de la lluvia.')
+        self.agua = self.crear('Conexión de agua', 'Sin agua potable en la vivienda.')
+        self.vivienda = self.crear('Ampliación de vivienda', 'Se necesita un dormitorio adicional.', self.otro_estado)
+
+    def crear(self, titulo, descripcion, estado=None):
+        return SolicitudAyuda.objects.create(
+            sca_titulo=titulo, sca_descripcion=descripcion, est_id=estado or self.estado, solicitante=self.usuario
+        )
+
+    def buscar(self, **datos):
+        respuesta = self.client.post(reverse('buscar-solicitudes'), datos, format='json')
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        return respuesta.json()
+
+    def test_ranking_y_fragmentos(self):
+        resultados = self.buscar(q='vivienda')
+        # La coincidencia en el título pesa más que en la descripción.
+        self.assertEqual([r['sca_id'] for r in resultados], [self.vivienda.sca_id, self.agua.sca_id])
+        self.assertIn('<b>vivienda</b>', resultados[0]['fragmentos'][0]['texto'])
+        self.assertGreater(resultados[0]['relevancia'], resultados[1]['relevancia'])
+
+    def test_prefijo_acentos_y_filtros(self):
+        self.assertEqual([r['sca_id'] for r in self.buscar(q='repara*')], [self.techo.sca_id])
+        self.assertEqual([r['sca_id'] for r in self.buscar(q='reparacion')], [self.techo.sca_id])
+        self.assertEqual(
+            [r['sca_id'] for r in self.buscar(q='vivienda', estado_id=self.otro_estado.est_id)], [self.vivienda.sca_id]
+        )
+
+    def test_triggers_mantienen_el_indice(self):
+        BitacoraSolicitud.objects.create(sca_id=self.agua, usuario=self.usuario, bsca_observacion='Visita del gasfíter')
+        resultados = self.buscar(q='gasfiter')
+        self.assertEqual([r['sca_id'] for r in resultados], [self.agua.sca_id])
+        self.assertEqual(resultados[0]['fragmentos'][0]['tipo'], 'bitacora')
+
+        SolicitudAyuda.objects.filter(pk=self.techo.pk).update(sca_titulo='Cambio de planchas')
+        self.assertEqual(self.buscar(q='techo'), [])
+        self.agua.delete()
+        self.assertEqual(self.buscar(q='gasfiter'), [])
+
+    def test_comando_reconstruye(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER solicitudes_busqueda_sca_ai')
+            cursor.execute('DELETE FROM solicitudes_busqueda')
+        call_command('reconstruir_busqueda', stdout=io.StringIO())
+        self.assertEqual(len(self.buscar(q='vivienda')), 2)
+        self.crear('Techo nuevo', 'Planchas de zinc')
+        self.assertEqual(len(self.buscar(q='zinc')), 1)
+
+    def test_consulta_invalida(self):
+        respuesta = self.client.post(reverse('buscar-solicitudes'), {'q': '"*'}, format='json')
+        self.assertEqual(respuesta.status_code, 400)
+
+
+def docx(*parrafos):
+    # DOCX mínimo: solo word/document.xml, que es lo que lee la extracción.
+    cuerpo = ''.join(f'<w:p><w:r><w:t>{parrafo}</w:t></w:r></w:p>' for parrafo in parrafos)
+    contenido = io.BytesIO()
+    with zipfile.ZipFile(contenido, 'w') as archivo:
+        archivo.writestr('word/document.xml', (
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+            f'<w:body>{cuerpo}</w:body></w:document>'
+        ))
+    return contenido.getvalue()
+
+
+class TextoDocumentosTest(BaseDocumentosTest):
+
+    def extraer(self, *opciones):
+        salida = io.StringIO()
+        call_command('extraer_textos', '--una-vez', *opciones, stdout=salida, stderr=io.StringIO())
+        return salida.getvalue()
+
+    def buscar(self, q):
+        respuesta = self.client.post(reverse('buscar-solicitudes'), {'q': q}, format='json')
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        return respuesta.json()
+
+    def test_subida_encola_y_comando_extrae(self):
+        respuesta = self.client.post(reverse('crear-solicitud'), {
+            'sca_titulo': 'Con informe', 'sca_descripcion': 'D', 'est_id': self.estado.est_id,
+            'documentos_data': [
+                SimpleUploadedFile('Informe_Tecnico_Capstone.DOCX', docx('Medición de la losa', 'Humedad en muros')),
+                SimpleUploadedFile('plano.png', b'imagen'),
+            ],
+        }, format='multipart')
+        self.assertEqual(respuesta.status_code, 201, respuesta.data)
+        textos = TextoDocumento.objects.order_by('documento_id')
+        self.assertEqual([t.tdo_estado for t in textos], [TextoDocumento.PENDIENTE, TextoDocumento.NO_SOPORTADO])
+        self.assertEqual(self.buscar('humedad'), [])
+
+        self.assertIn('Textos extraídos: 1, con error: 0', self.extraer('--procesos', '1'))
+        texto = TextoDocumento.objects.get(pk=textos[0].pk)
+        self.assertEqual(texto.tdo_estado, TextoDocumento.EXTRAIDO)
+        self.assertEqual(texto.tdo_texto, 'Medición de la losa\nHumedad en muros')
+
+        resultados = self.buscar('humedad')
+        self.assertEqual([r['sca_id'] for r in resultados], [respuesta.data['solicitud']['sca_id']])
+        self.assertEqual(resultados[0]['fragmentos'][0]['tipo'], 'documento')
+
+        texto.documento.delete()
+        self.assertEqual(self.buscar('humedad'), [])
+
+    def test_archivo_corrupto_queda_fallido(self):
+        documento = self.crear_documento('roto.docx', b'no es un zip')
+        encolar_extraccion([documento])
+        self.assertIn('con error: 1', self.extraer('--procesos', '1'))
+        texto = TextoDocumento.objects.get(documento=documento)
+        self.assertEqual(texto.tdo_estado, TextoDocumento.FALLIDO)
+        self.assertTrue(texto.tdo_error)
+
+    def test_zip_cifrado_o_con_compresion_desconocida_no_bloquea_la_cola(self):
+        def alterar(contenido, local, central, valor):
+            # Cambia un campo de 2 bytes en la cabecera local y en el directorio central.
+            contenido = bytearray(contenido)
+            for firma, desplazamiento in ((b'PK\x03\x04', local), (b'PK\x01\x02', central)):
+                inicio = contenido.find(firma) + desplazamiento
+                contenido[inicio:inicio + 2] = valor.to_bytes(2, 'little')
+            return bytes(contenido)
+
+        cifrado = alterar(docx('x'), 6, 8, 0x1)          # bit de cifrado
+        desconocido = alterar(docx('x'), 8, 10, 99)      # método de compresión 99
+
+        documentos = [
+            self.crear_documento('cifrado.docx', cifrado),
+            self.crear_documento('desconocido.docx', desconocido),
+            self.crear_documento('bueno.docx', docx('Texto legible')),
+        ]
+        encolar_extraccion(documentos)
+        self.assertIn('Textos extraídos: 1, con error: 2', self.extraer('--procesos', '2'))
+        textos = {t.documento.doc_nombre_original: t for t in TextoDocumento.objects.select_related('documento')}
+        self.assertEqual(textos['bueno.docx'].tdo_estado, TextoDocumento.EXTRAIDO)
+        self.assertIn('RuntimeError', textos['cifrado.docx'].tdo_error)
+        self.assertIn('NotImplementedError', textos['desconocido.docx'].tdo_error)
+        self.assertFalse(TextoDocumento.objects.filter(tdo_estado=TextoDocumento.PENDIENTE).exists())
+
+    def test_pool_roto_se_vuelve_a_crear(self):
+        encolar_extraccion([self.crear_documento('informe.docx', docx('Informe'))])
+        ejecutores = []
+
+        def crear(procesos=None):
+            ejecutores.append(mock.Mock())
+            return ejecutores[-1]
+
+        resultados = iter([BrokenProcessPool('hijo terminado'), (1, 0), (0, 0)])
+
+        def procesar(ejecutor, lote):
+            resultado = next(resultados)
+            if isinstance(resultado, Exception):
+                raise resultado
+            return resultado
+
+        with mock.patch('solicitudes.management.commands.extraer_textos.crear_ejecutor', crear), \
+                mock.patch('solicitudes.management.commands.extraer_textos.procesar_pendientes', procesar):
+            salida = self.extraer()
+        self.assertIn('Textos extraídos: 1', salida)
+        self.assertEqual(len(ejecutores), 2)
+        ejecutores[0].shutdown.assert_called_once_with(wait=False, cancel_futures=True)
+        ejecutores[1].shutdown.assert_called_once_with()
+
+    def test_pool_roto_varias_veces_marca_el_lote_como_fallido(self):
+        documentos = [self.crear_documento(f'informe{i}.docx', docx('Informe')) for i in range(3)]
+        encolar_extraccion(documentos)
+
+        def procesar(ejecutor, lote):
+            raise BrokenProcessPool('hijo terminado')
+
+        with mock.patch('solicitudes.management.commands.extraer_textos.crear_ejecutor', lambda procesos=None: mock.Mock()), \
+                mock.patch('solicitudes.management.commands.extraer_textos.procesar_pendientes', procesar), \
+                self.assertRaisesMessage(CommandError, '2 documento(s) del lote quedaron como fallidos'):
+            self.extraer('--lote', '2')
+        estados_texto = dict(TextoDocumento.objects.values_list('documento_id', 'tdo_estado'))
+        self.assertEqual(
+            [estados_texto[d.doc_id] for d in documentos],
+            [TextoDocumento.FALLIDO, TextoDocumento.FALLIDO, TextoDocumento.PENDIENTE]
+        )
+        self.assertIn('hijo terminado', TextoDocumento.objects.get(documento=documentos[0]).tdo_error)
+
+    def test_rellenar_en_pool_de_procesos(self):
+        documentos = [self.crear_documento(f'informe{i}.docx', docx(f'Informe número {i}')) for i in range(3)]
+        self.assertFalse(TextoDocumento.objects.exists())
+
+        salida = self.extraer('--rellenar', '--procesos', '2')
+        self.assertIn('Documentos encolados: 3', salida)
+        self.assertEqual(
+            list(TextoDocumento.objects.order_by('documento_id').values_list('tdo_estado', 'tdo_texto')),
+            [(TextoDocumento.EXTRAIDO, f'Informe número {i}') for i in range(3)]
+        )
+        self.assertEqual(len(self.buscar('informe')), 1)
+        self.assertIn('Documentos encolados: 0', self.extraer('--rellenar'))
+        self.assertEqual(len(documentos), TextoDocumento.objects.count())
+
+
+class ResumenSolicitudesTest(BaseSolicitudesTest):
+
+    def setUp(self):
+        super().setUp()
+        self.aprobada = EstadoSolicitud.objects.create(est_nombre='Aprobada')
+        self.anulada = EstadoSolicitud.objects.create(est_id=5, est_nombre='Anulada')
+
+    def crear(self, titulo='Solicitud'):
+        respuesta = self.client.post(
+            reverse('crear-solicitud'),
+            {'sca_titulo': titulo, 'sca_descripcion': 'D', 'est_id': self.estado.est_id},
+            format='multipart'
+        )
+        self.assertEqual(respuesta.status_code, 201)
+        return respuesta.json()['solicitud']['sca_id']
+
+    def totales(self, **params):
+        respuesta = self.client.get(reverse('estadisticas-solicitudes'), params)
+        self.assertEqual(respuesta.status_code, 200)
+        return {t['estado_nombre']: t['cantidad'] for t in respuesta.json()['totales']}
+
+    def test_vistas_mantienen_los_contadores(self):
+        primera, segunda, tercera = self.crear(), self.crear(), self.crear()
+        self.client.post(reverse('modificar-solicitud'), {'solicitud_id': primera, 'est_id': self.aprobada.est_id})
+        self.client.post(reverse('anular-solicitudes'), {'solicitud_id': segunda}, format='json')
+        self.client.post(reverse('anular-solicitudes'), {'solicitud_id': segunda}, format='json')
+
+        self.assertEqual(self.totales(), {'Ingresada': 1, 'Aprobada': 1, 'Anulada': 1})
+        self.assertEqual(self.totales(estado_id=self.anulada.est_id), {'Anulada': 1})
+        self.assertEqual(call_command_salida('conciliar_resumen', '--simular'), 'El resumen coincide con las solicitudes.')
+
+        respuesta = self.client.get(reverse('estadisticas-solicitudes'))
+        periodo = respuesta.json()['periodos'][0]
+        ahora = timezone.localtime()
+        self.assertEqual((periodo['year'], periodo['month']), (ahora.year, ahora.month))
+
+    def test_estadisticas_no_leen_solicitudes(self):
+        self.crear()
+        estados.obtener()
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(reverse('estadisticas-solicitudes'), {'year': timezone.localtime().year})
+        self.assertFalse(any('solicitudes_solicitudayuda' in c['sql'] for c in consultas.captured_queries))
+
+    def test_conciliar_corrige_desvios(self):
+        self.crear()
+        SolicitudAyuda.objects.create(sca_titulo='T', sca_descripcion='D', est_id=self.aprobada, solicitante=self.usuario)
+        self.assertEqual(self.totales(), {'Ingresada': 1})
+
+        salida = call_command_salida('conciliar_resumen')
+        self.assertIn(f'estado {self.aprobada.est_id}', salida)
+        self.assertEqual(self.totales(), {'Ingresada': 1, 'Aprobada': 1})
+
+    def test_filtro_invalido(self):
+        self.assertEqual(self.client.get(reverse('estadisticas-solicitudes'), {'year': 'x'}).status_code, 400)
+
+
+class CambioEstadoMasivoTest(BaseSolicitudesTest):
+
+    def setUp(self):
+        super().setUp()
+        self.cerrada = EstadoSolicitud.objects.create(est_nombre='Cerrada')
+        self.anulada = EstadoSolicitud.objects.create(est_id=5, est_nombre='Anulada')
+        self.crear_solicitudes(5)
+        self.ids = list(SolicitudAyuda.objects.order_by('sca_id').values_list('sca_id', flat=True))
+        call_command_salida('conciliar_resumen')
+
+    def cambiar(self, **datos):
+        return self.client.post(reverse('cambiar-estado-masivo'), datos, format='json')
+
+    def test_cambia_en_lote_con_resultado_por_id(self):
+        SolicitudAyuda.objects.filter(pk=self.ids[0]).update(est_id=self.cerrada)
+        call_command_salida('conciliar_resumen')
+        bitacora_antes = BitacoraSolicitud.objects.count()
+
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.cambiar(solicitud_ids=self.ids + [999999], est_id=self.cerrada.est_id)
+        self.assertEqual(respuesta.status_code, 200)
+        resultados = {r['solicitud_id']: r['resultado'] for r in respuesta.json()['resultados']}
+        self.assertEqual(resultados[self.ids[0]], 'sin_cambios')
+        self.assertEqual(resultados[999999], 'no_existe')
+        self.assertEqual(sum(r == 'actualizada' for r in resultados.values()), 4)
+
+        self.assertEqual(SolicitudAyuda.objects.filter(est_id=self.cerrada).count(), 5)
+        self.assertEqual(BitacoraSolicitud.objects.count() - bitacora_antes, 4)
+        escrituras = [c['sql'] for c in consultas.captured_queries if c['sql'].startswith(('UPDATE', 'INSERT'))]
+        self.assertEqual(sum('solicitudes_solicitudayuda' in sql for sql in escrituras), 1)
+        self.assertEqual(sum('solicitudes_bitacorasolicitud' in sql for sql in escrituras), 1)
+        self.assertIn('coincide', call_command_salida('conciliar_resumen', '--simular'))
+
+    def test_anulacion_masiva(self):
+        respuesta = self.cambiar(solicitud_ids=self.ids[:3], anular=True)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(SolicitudAyuda.objects.filter(est_id=self.anulada).count(), 3)
+        self.assertTrue(BitacoraSolicitud.objects.filter(bsca_observacion__startswith='Solicitud ANULADA').exists())
+
+    def test_validaciones(self):
+        self.assertEqual(self.cambiar(solicitud_ids=[], est_id=self.cerrada.est_id).status_code, 400)
+        self.assertEqual(self.cambiar(solicitud_ids=['x'], est_id=self.cerrada.est_id).status_code, 400)
+        self.assertEqual(self.cambiar(solicitud_ids=self.ids, est_id=12345).status_code, 404)
+        with override_settings(CAMBIO_MASIVO_MAXIMO=2):
+            self.assertEqual(self.cambiar(solicitud_ids=self.ids, est_id=self.cerrada.est_id).status_code, 400)
+
+
+class ListadosCondicionalesTest(BaseSolicitudesTest):
+
+    def setUp(self):
+        super().setUp()
+        self.crear_solicitudes(3, documentos_por_solicitud=1)
+        self.solicitud = SolicitudAyuda.objects.order_by('sca_id').first()
+
+    def post(self, nombre, datos, etag=None):
+        extra = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.post(reverse(nombre), datos, format='json', **extra)
+
+    def test_filtrar_solicitudes_304_sin_serializar(self):
+        primera = self.post('filtrar-solicitudes', {'limit': 2})
+        self.assertEqual(primera.status_code, 200)
+        etag = primera['ETag']
+
+        with CaptureQueriesContext(connection) as consultas:
+            repetida = self.post('filtrar-solicitudes', {'limit': 2}, etag)
+        self.assertEqual(repetida.status_code, 304)
+        self.assertEqual(repetida.content, b'')
+        self.assertEqual(repetida['ETag'], etag)
+        self.assertEqual(len(consultas), 1)
+
+        self.assertNotEqual(self.post('filtrar-solicitudes', {'limit': 1})['ETag'], etag)
+        self.solicitud.sca_titulo = 'Nuevo título'
+        self.solicitud.save()
+        self.assertEqual(self.post('filtrar-solicitudes', {'limit': 2}, etag).status_code, 200)
+
+    def test_etag_agrega_una_sola_consulta(self):
+        # El validador (solicitudes y sus documentos) cuesta una consulta agregada por listado.
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.post('filtrar-solicitudes', {'fields': 'sca_id,documentos'}).status_code, 200)
+            self.assertEqual(self.post('filtrar-bitacora', {'solicitud_id': self.solicitud.sca_id}).status_code, 200)
+        agregadas = [c['sql'] for c in consultas if 'MAX(' in c['sql'].upper()]
+        self.assertEqual(len(agregadas), 2)
+        self.assertEqual(len(consultas), 7)
+
+    def test_documento_nuevo_cambia_el_etag(self):
+        etag = self.post('filtrar-solicitudes', {})['ETag']
+        DocumentoSolicitud.objects.filter(solicitud=self.solicitud).delete()
+        self.assertEqual(self.post('filtrar-solicitudes', {}, etag).status_code, 200)
+
+    def test_bitacora(self):
+        datos = {'solicitud_id': self.solicitud.sca_id}
+        etag = self.post('filtrar-bitacora', datos)['ETag']
+        self.assertEqual(self.post('filtrar-bitacora', datos, etag).status_code, 304)
+        BitacoraSolicitud.objects.create(sca_id=self.solicitud, usuario=self.usuario, bsca_observacion='Visita')
+        self.assertEqual(self.post('filtrar-bitacora', datos, etag).status_code, 200)
+
+    def test_estados(self):
+        etag = self.post('filtrar-estado', {})['ETag']
+        with self.assertNumQueries(1):
+            self.assertEqual(self.post('filtrar-estado', {}, etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post('crear-estado', {'nombre_estado': 'Cerrada'})
+        self.assertEqual(self.post('filtrar-estado', {}, etag).status_code, 200)
+
+
+class CamposDispersosTest(BaseSolicitudesTest):
+
+    def setUp(self):
+        super().setUp()
+        self.crear_solicitudes(3, documentos_por_solicitud=2)
+
+    def filtrar(self, **datos):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.post(reverse('filtrar-solicitudes'), datos, format='json')
+        return respuesta, [c['sql'] for c in consultas.captured_queries]
+
+    def test_preset_resumen_sin_join_ni_documentos(self):
+        respuesta, consultas = self.filtrar(fields='resumen')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(set(respuesta.json()[0]), {'sca_id', 'sca_titulo', 'estado', 'sca_fecha_creacion'})
+        self.assertFalse(any('solicitudes_documentosolicitud' in sql for sql in consultas))
+        self.assertFalse(any('users_customuser' in sql for sql in consultas))
+        self.assertFalse(any('sca_descripcion' in sql for sql in consultas))
+
+    def test_lista_de_campos_y_presets_combinados(self):
+        respuesta, consultas = self.filtrar(fields=['resumen', 'rut', 'documentos'])
+        fila = respuesta.json()[0]
+        self.assertEqual(list(fila), ['sca_id', 'rut', 'sca_titulo', 'estado', 'sca_fecha_creacion', 'documentos'])
+        self.assertEqual(len(fila['documentos']), 2)
+        self.assertFalse(any('"users_customuser"."email"' in sql for sql in consultas))
+
+    def test_sin_fields_devuelve_todo_y_stream_respeta_fields(self):
+        completa, _ = self.filtrar()
+        self.assertIn('sca_descripcion', completa.json()[0])
+        exportada = self.client.post(reverse('filtrar-solicitudes'), {'stream': True, 'fields': 'sca_id'}, format='json')
+        filas = json.loads(b''.join(exportada.streaming_content))
+        self.assertEqual(filas, [{'sca_id': fila['sca_id']} for fila in completa.json()])
+
+    def test_campo_invalido(self):
+        respuesta, _ = self.filtrar(fields='sca_id,clave')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('clave', respuesta.json()['error'])
+
+
+class MetricasTest(BaseSolicitudesTest):
+
+    def setUp(self):
+        super().setUp()
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(METRICAS_DIRECTORIO=directorio.name, METRICAS_TOKEN='', DEBUG=True)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        registro.limpiar()
+
+    def metricas(self, **extra):
+        respuesta = self.client.get('/metrics', **extra)
+        return respuesta, respuesta.content.decode()
+
+    def test_latencia_consultas_y_estados_por_ruta(self):
+        self.crear_solicitudes(2)
+        self.client.post(reverse('filtrar-solicitudes'), {}, format='json')
+        self.client.post(reverse('filtrar-solicitudes'), {'limit': 'x'}, format='json')
+
+        respuesta, texto = self.metricas()
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn('backtecho_http_requests_total{estado="200",metodo="POST",ruta="solicitudes/filtrar/"} 1', texto)
+        self.assertIn('backtecho_http_requests_total{estado="400",metodo="POST",ruta="solicitudes/filtrar/"} 1', texto)
+        self.assertIn(
+            'backtecho_http_request_duration_seconds_bucket{metodo="POST",ruta="solicitudes/filtrar/",le="+Inf"} 2', texto
+        )
+        consultas = [l for l in texto.splitlines() if l.startswith('backtecho_db_queries_per_request_sum{ruta="solicitudes/filtrar/"}')]
+        self.assertGreater(float(consultas[0].split()[-1]), 0)
+        self.assertIn('backtecho_http_response_size_bytes_count{ruta="solicitudes/filtrar/"} 2', texto)
+
+    def test_suma_los_volcados_de_otros_procesos(self):
+        with open(os.path.join(settings.METRICAS_DIRECTORIO, '999999.json'), 'w') as archivo:
+            json.dump([['backtecho_http_requests_total', [['estado', 200], ['metodo', 'GET'], ['ruta', 'metrics']], 5]], archivo)
+        self.metricas()
+        _, texto = self.metricas()
+        self.assertIn('backtecho_http_requests_total{estado="200",metodo="GET",ruta="metrics"} 6', texto)
+
+    @override_settings(METRICAS_TOKEN='secreto')
+    def test_token(self):
+        self.assertEqual(self.metricas()[0].status_code, 403)
+        self.assertEqual(self.metricas(HTTP_AUTHORIZATION='Bearer secreto')[0].status_code, 200)
+
+    @override_settings(DEBUG=False)
+    def test_sin_token_fuera_de_debug(self):
+        self.assertEqual(self.metricas()[0].status_code, 403)
+
+    def test_pid_reutilizado_no_pisa_otro_volcado(self):
+        # Dos procesos con el mismo pid (un worker reiniciado) escriben archivos distintos.
+        with mock.patch('backTecho.metricas.os.getpid', return_value=4242):
+            for _ in range(2):
+                anterior = Registro()
+                anterior.incrementar('backtecho_http_requests_total', {'estado': 200, 'metodo': 'GET', 'ruta': 'x'})
+                anterior.volcar(forzar=True)
+        archivos = [a for a in os.listdir(settings.METRICAS_DIRECTORIO) if a.startswith('4242-')]
+        self.assertEqual(len(archivos), 2)
+        _, texto = self.metricas()
+        self.assertIn('backtecho_http_requests_total{estado="200",metodo="GET",ruta="x"} 2', texto)
+
+    async def test_cuenta_consultas_de_vistas_async(self):
+        token = await sync_to_async(Token.objects.create)(user=self.usuario)
+        await sync_to_async(cache_tokens.limpiar)()
+        await self.async_client.get(reverse('listar-usuarios-async'), headers={'Authorization': f'Token {token.key}'})
+        _, texto = await sync_to_async(self.metricas)()
+        linea = next(l for l in texto.splitlines() if l.startswith('backtecho_db_queries_per_request_sum{ruta="solicitudes/async/usuario/lista/"}'))
+        self.assertGreaterEqual(float(linea.split()[-1]), 2)
+
+
+class BitacoraIncrementalTest(BaseSolicitudesTest):
+
+    def setUp(self):
+        super().setUp()
+        self.crear_solicitudes(1)
+        self.solicitud = SolicitudAyuda.objects.get()
+        self.primera = self.solicitud.bitacora.get()
+
+    def agregar(self, cantidad):
+        registros = []
+        for numero in range(cantidad):
+            registro = BitacoraSolicitud.objects.create(sca_id=self.solicitud, usuario=self.usuario, bsca_observacion=f'Nota {numero}')
+            DocumentoSolicitud(solicitud=self.solicitud, bitacora=registro, doc_archivo=f'solicitud_archivos/x/{numero}.png').save()
+            registros.append(registro.bsca_id)
+        return registros
+
+    def pedir(self, **datos):
+        return self.contar_consultas(reverse('filtrar-bitacora'), {'solicitud_id': self.solicitud.sca_id, **datos})
+
+    def test_since_bsca_id_devuelve_solo_las_nuevas(self):
+        nuevas = self.agregar(3)
+        _, respuesta = self.pedir(since_bsca_id=self.primera.bsca_id)
+        self.assertEqual(sorted(r['bsca_id'] for r in respuesta.data), nuevas)
+        self.assertEqual(len(respuesta.data[0]['documentos_adjuntos']), 1)
+        self.assertNotIn('ETag', respuesta)
+
+        _, respuesta = self.pedir(since_bsca_id=nuevas[-1])
+        self.assertEqual(respuesta.data, [])
+
+    def test_since_por_fecha(self):
+        BitacoraSolicitud.objects.filter(pk=self.primera.pk).update(bsca_fecha_creacion=timezone.now() - timezone.timedelta(days=2))
+        nuevas = self.agregar(2)
+        _, respuesta = self.pedir(since=(timezone.now() - timezone.timedelta(days=1)).isoformat())
+        self.assertEqual(sorted(r['bsca_id'] for r in respuesta.data), nuevas)
+
+    def test_costo_no_depende_del_largo_de_la_bitacora(self):
+        ultima = self.agregar(2)[-1]
+        self.agregar(1)
+        pocas, _ = self.pedir(since_bsca_id=ultima)
+        ultima = self.agregar(200)[-1]
+        self.agregar(1)
+        muchas, respuesta = self.pedir(since_bsca_id=ultima)
+        self.assertEqual(len(respuesta.data), 1)
+        self.assertEqual(pocas, muchas)
+
+        plan = BitacoraSolicitud.objects.filter(sca_id=self.solicitud, bsca_fecha_creacion__gte=timezone.now()).explain()
+        self.assertIn('bsca_solicitud_fecha_idx', plan)
+
+    def test_parametros_invalidos(self):
+        url = reverse('filtrar-bitacora')
+        for datos in ({'since_bsca_id': 'x'}, {'since_bsca_id': 999999}, {'since': 'ayer'}):
+            respuesta = self.client.post(url, {'solicitud_id': self.solicitud.sca_id, **datos}, format='json')
+            self.assertEqual(respuesta.status_code, 400, datos)
+
+
+@override_settings(CAMBIOS_INTERVALO_SONDEO=0.01)
+class FeedCambiosTest(BaseSolicitudesTest):
+
+    def setUp(self):
+        super().setUp()
+        cache_tokens.limpiar()
+        self.cabecera = {'Authorization': f'Token {Token.objects.create(user=self.usuario).key}'}
+        self.crear_solicitudes(1)
+        self.solicitud = SolicitudAyuda.objects.get()
+
+    async def long_poll(self, **params):
+        respuesta = await self.async_client.get(reverse('cambios'), params, headers=self.cabecera)
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.json()
+
+    async def cambiar(self, tipo=CambioSolicitud.BITACORA, **datos):
+        await sync_to_async(registrar_cambio)(self.solicitud, tipo, **datos)
+        return await ultima_secuencia()
+
+    def test_las_vistas_registran_sus_cambios(self):
+        self.client.post(reverse('crear-solicitud'), {'sca_titulo': 'T', 'sca_descripcion': 'D', 'est_id': self.estado.est_id})
+        nueva = SolicitudAyuda.objects.latest('sca_id')
+        self.client.post(reverse('modificar-solicitud'), {'solicitud_id': nueva.sca_id, 'sca_titulo': 'T2'})
+        self.client.post(reverse('crear-bitacora'), {'solicitud_id': nueva.sca_id, 'bsca_observacion': 'Nota'})
+        EstadoSolicitud.objects.create(est_id=5, est_nombre='Anulada')
+        estados.limpiar()
+        self.client.post(reverse('anular-solicitudes'), {'solicitud_id': nueva.sca_id}, format='json')
+        self.client.post(reverse('cambiar-estado-masivo'), {'solicitud_ids': [self.solicitud.sca_id], 'anular': True}, format='json')
+
+        self.assertEqual(
+            list(CambioSolicitud.objects.order_by('cso_id').values_list('sca_id', 'cso_tipo')),
+            [
+                (nueva.sca_id, CambioSolicitud.CREADA),
+                (nueva.sca_id, CambioSolicitud.MODIFICADA),
+                (nueva.sca_id, CambioSolicitud.BITACORA),
+                (nueva.sca_id, CambioSolicitud.ANULADA),
+                (self.solicitud.sca_id, CambioSolicitud.ANULADA),
+            ]
+        )
+
+    async def test_long_poll_devuelve_los_cambios_pendientes(self):
+        primero = await self.cambiar(bsca_id=1)
+        segundo = await self.cambiar(bsca_id=2)
+        datos = await self.long_poll(desde=primero - 1)
+        self.assertEqual([c['seq'] for c in datos['cambios']], [primero, segundo])
+        self.assertEqual(datos['cambios'][0]['datos'], {'bsca_id': 1})
+        self.assertEqual(datos['ultimo'], segundo)
+
+    async def test_long_poll_espera_el_siguiente_cambio(self):
+        desde = await ultima_secuencia()
+        peticion = asyncio.ensure_future(self.long_poll(desde=desde, espera=5))
+        await asyncio.sleep(0.05)
+        self.assertFalse(peticion.done())
+        seq = await self.cambiar()
+        datos = await asyncio.wait_for(peticion, 5)
+        self.assertEqual([c['seq'] for c in datos['cambios']], [seq])
+
+    async def test_long_poll_vence_sin_cambios(self):
+        desde = await ultima_secuencia()
+        self.assertEqual(await self.long_poll(desde=desde, espera=0), {"cambios": [], "ultimo": desde})
+        respuesta = await self.async_client.get(reverse('cambios'), {'desde': 'x'}, headers=self.cabecera)
+        self.assertEqual(respuesta.status_code, 400)
+
+    async def test_un_sondeo_para_todos_los_suscriptores(self):
+        desde = await ultima_secuencia()
+        with mock.patch('solicitudes.cambios.leer_desde', wraps=leer_desde) as lecturas:
+            esperas = [asyncio.ensure_future(difusor.siguientes(desde, 5)) for _ in range(500)]
+            await asyncio.sleep(0.05)
+            seq = await self.cambiar()
+            resultados = await asyncio.wait_for(asyncio.gather(*esperas), 5)
+        self.assertTrue(all([c['seq'] for c in cambios] == [seq] for cambios in resultados))
+        self.assertLess(lecturas.call_count, 50)
+
+    async def test_server_sent_events(self):
+        seq = await self.cambiar(bsca_id=7)
+        respuesta = await self.async_client.get(reverse('cambios-stream'), headers={**self.cabecera, 'Last-Event-ID': str(seq - 1)})
+        self.assertEqual(respuesta['Content-Type'], 'text/event-stream')
+        texto = ''
+        async for bloque in respuesta.streaming_content:
+            texto += bloque.decode()
+            if 'data:' in texto:
+                break
+        await respuesta.streaming_content.aclose()
+        self.assertIn(f'id: {seq}\nevent: bitacora_creada\ndata: ', texto)
+        self.assertIn('"bsca_id":7', texto)
+
+
+@override_settings(CAMBIOS_INTERVALO_SONDEO=0.01)
+class DifusorVariosLoopsTest(SimpleTestCase):
+    # Bajo WSGI/runserver cada vista async corre en su propio event loop (y su propio hilo).
+
+    def test_long_polls_en_loops_distintos_no_se_pisan(self):
+        cambios = []
+
+        async def leer(desde, limite):
+            return [cambio for cambio in cambios if cambio['seq'] > desde][:limite]
+
+        async def ultima():
+            return cambios[-1]['seq'] if cambios else 0
+
+        resultados = {}
+
+        def suscribir(numero):
+            resultados[numero] = asyncio.run(difusor.siguientes(0, 5))
+
+        with mock.patch('solicitudes.cambios.leer_desde', leer), mock.patch('solicitudes.cambios.ultima_secuencia', ultima):
+            hilos = [threading.Thread(target=suscribir, args=(numero,)) for numero in range(3)]
+            inicio = time.monotonic()
+            for hilo in hilos:
+                hilo.start()
+            time.sleep(0.1)
+            cambios.append({'seq': 1})
+            for hilo in hilos:
+                hilo.join(5)
+        self.assertLess(time.monotonic() - inicio, 2)
+        self.assertEqual(resultados, {numero: [{'seq': 1}] for numero in range(3)})
+
+
+class BenchTest(APITestCase):
+
+    def test_compara_contra_la_base_con_umbral(self):
+        from .management.commands.bench import Command
+        base = {"escenarios": {
+            "filtrar_solicitudes": {"p95_ms": 10.0, "consultas_por_peticion": 4.0, "memoria_pico_kb": 100.0},
+            "retirado": {"p95_ms": 1.0},
+        }}
+        actual = {"escenarios": {
+            "filtrar_solicitudes": {"p95_ms": 11.9, "consultas_por_peticion": 5.0, "memoria_pico_kb": 130.0},
+            "nuevo": {"p95_ms": 99.0},
+        }}
+        self.assertEqual(Command().comparar(base, actual, 0.2), [
+            "filtrar_solicitudes.consultas_por_peticion: 4.0 -> 5.0",
+            "filtrar_solicitudes.memoria_pico_kb: 100.0 -> 130.0",
+        ])
+        self.assertEqual(Command().comparar(base, actual, 0.5), ["filtrar_solicitudes.consultas_por_peticion: 4.0 -> 5.0"])
+
+
+class PerfilSqliteTest(SimpleTestCase):
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.ruta = os.path.join(directorio.name, 'perfil.sqlite3')
+
+    def conexion(self):
+        # Conexión propia sobre un archivo: la base de pruebas está en memoria y no admite WAL.
+        ajustes = {**connections['default'].settings_dict, 'NAME': self.ruta}
+        conexion = connections['default'].__class__(ajustes, alias='perfil')
+        self.addCleanup(conexion.close)
+        return conexion
+
+    def pragma(self, conexion, nombre):
+        with conexion.cursor() as cursor:
+            cursor.execute(f'PRAGMA {nombre}')
+            return cursor.fetchone()[0]
+
+    def escritor_con_bloqueo(self):
+        escritor = self.conexion()
+        with escritor.cursor() as cursor:
+            cursor.execute('CREATE TABLE t (x INTEGER)')
+            cursor.execute('INSERT INTO t VALUES (1)')
+            # EXCLUSIVE es el bloqueo que toma un escritor al confirmar (o al volcar páginas).
+            cursor.execute('BEGIN EXCLUSIVE')
+            cursor.execute('INSERT INTO t VALUES (2)')
+        return escritor
+
+    def test_aplica_el_perfil_a_cada_conexion(self):
+        conexion = self.conexion()
+        self.assertEqual(self.pragma(conexion, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(conexion, 'busy_timeout'), settings.SQLITE_PERFIL['busy_timeout'])
+        self.assertEqual(self.pragma(conexion, 'synchronous'), 1)   # NORMAL
+        self.assertEqual(connections['default'].settings_dict['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+
+    def test_lectores_no_esperan_al_escritor(self):
+        escritor = self.escritor_con_bloqueo()
+        lector = self.conexion()
+        inicio = time.monotonic()
+        with lector.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM t')
+            # Lee la última versión confirmada, sin esperar a que el escritor termine.
+            self.assertEqual(cursor.fetchone()[0], 1)
+        self.assertLess(time.monotonic() - inicio, 0.5)
+        escritor.cursor().execute('COMMIT')
+        with lector.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM t')
+            self.assertEqual(cursor.fetchone()[0], 2)
+
+    def test_sin_wal_el_lector_queda_bloqueado(self):
+        perfil = {**settings.SQLITE_PERFIL, 'journal_mode': 'delete', 'busy_timeout': 100}
+        with override_settings(SQLITE_PERFIL=perfil):
+            self.escritor_con_bloqueo()
+            with self.assertRaisesMessage(OperationalError, 'database is locked'):
+                with self.conexion().cursor() as cursor:
+                    cursor.execute('SELECT COUNT(*) FROM t')
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ReplicasLecturaTest(APITransactionTestCase):
+    # Dos archivos SQLite: la base de pruebas hace de principal y replicar() de replicación.
+    # '__all__' incluye el alias 'replica', que se agrega antes de setUpClass.
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directorio = tempfile.TemporaryDirectory()
+        connections.settings['replica'] = {
+            **connections['default'].settings_dict, 'NAME': os.path.join(cls.directorio.name, 'replica.sqlite3')
+        }
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        cls.directorio.cleanup()
+
+    def setUp(self):
+        estados.limpiar()
+        tipos_usuario.limpiar()
+        cache.clear()
+        ajustes = override_settings(REPLICAS_LECTURA=['replica'])
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.estado = EstadoSolicitud.objects.create(est_nombre='Ingresada')
+        self.lector = crear_usuario(1)
+        self.escritor = crear_usuario(2)
+        self.primera = self.crear_solicitud('Replicada')
+        replicar()
+        self.segunda = self.crear_solicitud('Sin replicar')
+
+    def crear_solicitud(self, titulo):
+        return SolicitudAyuda.objects.create(
+            sca_titulo=titulo, sca_descripcion='D', est_id=self.estado, solicitante=self.escritor
+        ).sca_id
+
+    def ids(self, usuario, **extra):
+        self.client.force_authenticate(usuario)
+        respuesta = self.client.post(reverse('filtrar-solicitudes'), extra, format='json')
+        self.assertEqual(respuesta.status_code, 200, getattr(respuesta, 'data', None))
+        if respuesta.streaming:
+            return sorted(fila['sca_id'] for fila in json.loads(b''.join(respuesta.streaming_content)))
+        return sorted(fila['sca_id'] for fila in respuesta.json())
+
+    def test_las_vistas_de_lectura_leen_de_la_replica(self):
+        self.assertEqual(self.ids(self.lector), [self.primera])
+        self.assertEqual(self.ids(self.lector, stream=True), [self.primera])
+        replicar()
+        self.assertEqual(self.ids(self.lector), [self.primera, self.segunda])
+
+    def test_quien_escribe_lee_de_la_principal_durante_la_ventana(self):
+        self.client.force_authenticate(self.escritor)
+        respuesta = self.client.post(
+            reverse('crear-solicitud'), {'sca_titulo': 'Nueva', 'sca_descripcion': 'D', 'est_id': self.estado.est_id}
+        )
+        self.assertEqual(respuesta.status_code, 201)
+        nueva = respuesta.json()['solicitud']['sca_id']
+
+        self.assertEqual(self.ids(self.escritor), [self.primera, self.segunda, nueva])
+        self.assertEqual(self.ids(self.lector), [self.primera])
+        cache.clear()   # vence la ventana
+        self.assertEqual(self.ids(self.escritor), [self.primera])
+
+    def test_busqueda_lee_de_la_replica(self):
+        self.client.force_authenticate(self.lector)
+        respuesta = self.client.post(reverse('buscar-solicitudes'), {'q': 'replicar'}, format='json')
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        self.assertEqual(respuesta.json(), [])
+        replicar()
+        respuesta = self.client.post(reverse('buscar-solicitudes'), {'q': 'replicar'}, format='json')
+        self.assertEqual([fila['sca_id'] for fila in respuesta.json()], [self.segunda])
+
+    def test_marca_de_escritura_visible_desde_otro_worker(self):
+        # Otra instancia del backend (como la de otro proceso) ve la marca.
+        marcar_escritura(self.escritor)
+        otro_worker = FileBasedCache(settings.CACHES['default']['LOCATION'], {})
+        self.assertTrue(otro_worker.get(f'replicas:primaria:{self.escritor.pk}'))
+
+    def test_cache_por_proceso_detiene_el_arranque(self):
+        verificar_configuracion()
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with override_settings(CACHES=locmem), self.assertRaises(ImproperlyConfigured):
+            verificar_configuracion()
+        with override_settings(CACHES=locmem, REPLICAS_LECTURA=[]):
+            verificar_configuracion()
+
+    def test_sin_replicas_todo_va_a_la_principal(self):
+        with override_settings(REPLICAS_LECTURA=[]):
+            self.assertEqual(self.ids(self.lector), [self.primera, self.segunda])
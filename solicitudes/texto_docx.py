@@ -0,0 +1,63 @@
+# solicitudes/texto_docx.py
+import io
+import zipfile
+from xml.etree import ElementTree
+
+# Extracción de texto de archivos DOCX solo con la biblioteca estándar. Este módulo no importa
+# Django: lo cargan los procesos del pool de 'extraer_textos' sin configurar el proyecto.
+
+W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+PARTES = ('word/document.xml', 'word/footnotes.xml', 'word/endnotes.xml')
+
+
+class DocxInvalido(ValueError):
+    pass
+
+
+def _texto_de_parte(archivo, maximo_caracteres):
+    partes = []
+    total = 0
+    for evento, elemento in ElementTree.iterparse(archivo, events=('end',)):
+        etiqueta = elemento.tag
+        if etiqueta == f'{W}t' and elemento.text:
+            partes.append(elemento.text)
+            total += len(elemento.text)
+        elif etiqueta == f'{W}tab':
+            partes.append('\t')
+        elif etiqueta in (f'{W}br', f'{W}cr'):
+            partes.append('\n')
+        elif etiqueta == f'{W}p':
+            partes.append('\n')
+            # Los párrafos ya leídos no se vuelven a necesitar: se liberan para no
+            # mantener el árbol completo en memoria.
+            elemento.clear()
+        if total >= maximo_caracteres:
+            break
+    return ''.join(partes)
+
+
+def extraer_texto_docx(origen, maximo_bytes, maximo_caracteres):
+    # 'origen' es una ruta o el contenido en bytes. Devuelve (texto, error); error es '' si
+    # la extracción funcionó.
+    try:
+        if isinstance(origen, bytes):
+            origen = io.BytesIO(origen)
+        with zipfile.ZipFile(origen) as docx:
+            nombres = set(docx.namelist())
+            if PARTES[0] not in nombres:
+                raise DocxInvalido("El archivo no contiene word/document.xml.")
+            textos = []
+            for parte in PARTES:
+                if parte not in nombres:
+                    continue
+                if docx.getinfo(parte).file_size > maximo_bytes:
+                    raise DocxInvalido(f"{parte} supera el tamaño máximo de extracción.")
+                with docx.open(parte) as archivo:
+                    textos.append(_texto_de_parte(archivo, maximo_caracteres))
+    except Exception as e:
+        # Cualquier fallo (zip cifrado -> RuntimeError, compresión no soportada ->
+        # NotImplementedError, XML roto...) se devuelve como error: si saliera del proceso
+        # hijo, el lote completo quedaría pendiente para siempre.
+        return '', f'{e.__class__.__name__}: {e}' if str(e) else e.__class__.__name__
+    texto = '\n'.join(texto.strip() for texto in textos if texto.strip())
+    return texto[:maximo_caracteres], ''
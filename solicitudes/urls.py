@@ -1,18 +1,23 @@
 # solicitudes/urls.py
 from django.urls import path
 from . import views # Importamos todas las vistas del archivo
+from . import vistas_async
 
 urlpatterns = [
     path('crear/', views.crear_solicitud, name='crear-solicitud'),
     path('modificar/', views.modificar_solicitud, name='modificar-solicitud'),
     path('filtrar/', views.filtrar_solicitudes, name='filtrar-solicitudes'),
+    path('buscar/', views.buscar_solicitudes, name='buscar-solicitudes'),
     path('anular/', views.anular_solicitud, name='anular-solicitudes'),
+    path('estado/masivo/', views.cambiar_estado_masivo, name='cambiar-estado-masivo'),
     path('bitacora/crear/', views.crear_registro_bitacora, name='crear-bitacora'),
     path('bitacora/filtrar/', views.filtrar_bitacora_solicitud, name='filtrar-bitacora'),
     path('estado/crear/', views.crea_estado_solicitud, name='crear-estado'),
     path('estado/filtrar/', views.filtra_estado_solicitud, name='filtrar-estado'),
+    path('estadisticas/', views.estadisticas_solicitudes, name='estadisticas-solicitudes'),
     path('documento/<int:doc_id>/', views.ver_documento, name='visualizar-documento'),
     path('documento/eliminar/', views.eliminar_documento, name='eliminar-documento'),
+    path('documento/zip/<int:sca_id>/', views.descargar_documentos, name='descargar-documentos'),
     path('tipo/crear/', views.crear_tipo_usuario, name='crear-tipo-usuario'),
     path('tipo/ver/', views.ver_tipos_usuario, name='ver-tipo-usuario'),
     path('tipo/usuario/', views.asignar_tipo_usuario, name='ver-tipo-usuario'),
@@ -21,4 +26,13 @@ urlpatterns = [
     # path('documento/ver/', views.obtener_documento, name='obtener-documento'),
     path('usuario/desactivar_usuario/', views.desactivar_usuario, name='desactivar_usuario'),
     path('usuario/activar_usuario/', views.activar_usuario, name='activar_usuario'),
+    # Versiones async de los endpoints de lectura (servidas sin hilos bajo ASGI).
+    path('async/filtrar/', vistas_async.filtrar_solicitudes, name='filtrar-solicitudes-async'),
+    path('async/bitacora/filtrar/', vistas_async.filtrar_bitacora_solicitud, name='filtrar-bitacora-async'),
+    path('async/estado/filtrar/', vistas_async.filtra_estado_solicitud, name='filtrar-estado-async'),
+    path('async/usuario/lista/', vistas_async.listar_usuarios, name='listar-usuarios-async'),
+    path('async/documento/<int:doc_id>/', vistas_async.ver_documento, name='visualizar-documento-async'),
+    # Feed de cambios (long-poll y Server-Sent Events).
+    path('async/cambios/', vistas_async.cambios, name='cambios'),
+    path('async/cambios/stream/', vistas_async.cambios_stream, name='cambios-stream'),
 ]
\ No newline at end of file
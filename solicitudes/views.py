@@ -1,18 +1,43 @@
 # solicitudes/views.py
+import logging
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from django.db import transaction
 from django.shortcuts import get_object_or_404
-from django.http import FileResponse
-from django.core.mail import send_mail
 from django.conf import settings
-from .models import SolicitudAyuda, DocumentoSolicitud, BitacoraSolicitud, EstadoSolicitud
+from django.utils import timezone
+from .models import SolicitudAyuda, DocumentoSolicitud, BitacoraSolicitud, EstadoSolicitud, CambioSolicitud
+from .consultas import (
+    solicitudes_con_relaciones, bitacora_con_relaciones, bitacora_desde, solicitudes_proyectadas,
+    leer_campos_solicitud, serializar_solicitud, serializar_registro_bitacora, serializar_usuario
+)
+from .busqueda import buscar
+from .cambios import registrar as registrar_cambio, registrar_varios as registrar_cambios
+from .condicional import calcular_etag, con_etag, etag_bitacora, etag_solicitudes, no_modificado
+from .correos import encolar_correo
+from .documentos import descartar_si_falla, eliminar_documento_y_blob, preparar_documentos, insertar_documentos
+from .entrega import entregar_documento, respuesta_zip
+from .catalogos import estados, tipos_usuario, obtener_estado, obtener_tipo_usuario
+from .filtros import FiltroInvalido, filtrar_solicitudes_por
+from .exportacion import respuesta_json_streaming
+from .subidas import subida_directa
+from .resumen import contadores, registrar_creacion, registrar_cambio_estado, registrar_cambios_estado
+from .paginacion import (
+    ParametroPaginacionInvalido, leer_parametros_paginacion, paginar_por_cursor, respuesta_paginada
+)
 from users.models import TipoUsuario, CustomUser
+from backTecho.parametros import es_verdadero
+from backTecho.replicas import solo_lectura
+
+logger = logging.getLogger(__name__)
+
+ESTADO_ANULADO_ID = 5
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@subida_directa
 def crear_solicitud(request):
 
     try:
@@ -26,18 +51,20 @@ def crear_solicitud(request):
                 {"error": "Los campos 'sca_titulo', 'sca_descripcion' y 'est_id' son obligatorios."},
                 status=status.HTTP_400_BAD_REQUEST
             )       
-        estado = get_object_or_404(EstadoSolicitud, pk=estado_id)
+        estado = obtener_estado(estado_id)
+        nuevos_documentos = preparar_documentos(documentos, doc_usuario_actualizacion=request.user)
 
-        with transaction.atomic():
+        with descartar_si_falla(nuevos_documentos), transaction.atomic():
             solicitud = SolicitudAyuda.objects.create(
                 sca_titulo=titulo,
                 sca_descripcion=descripcion,
                 est_id=estado,
                 solicitante=request.user
             )
+            registrar_creacion(solicitud)
+            registrar_cambio(solicitud, CambioSolicitud.CREADA, est_id=solicitud.est_id_id)
 
-            for documento in documentos:
-                DocumentoSolicitud.objects.create(solicitud=solicitud, doc_archivo=documento,doc_usuario_actualizacion = request.user)
+            insertar_documentos(nuevos_documentos, solicitud=solicitud)
             
             BitacoraSolicitud.objects.create(
                 sca_id=solicitud,
@@ -67,6 +94,7 @@ def crear_solicitud(request):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@subida_directa
 def modificar_solicitud(request):
     try:
         solicitud_id = request.data.get('solicitud_id')
@@ -89,8 +117,11 @@ def modificar_solicitud(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        with transaction.atomic():
-            solicitud = get_object_or_404(SolicitudAyuda, pk=solicitud_id)
+        documentos_preparados = preparar_documentos(nuevos_documentos, doc_usuario_actualizacion=request.user)
+
+        with descartar_si_falla(documentos_preparados), transaction.atomic():
+            solicitud = get_object_or_404(SolicitudAyuda.objects.select_for_update(), pk=solicitud_id)
+            estado_anterior_id = solicitud.est_id_id
             
             observaciones = []
 
@@ -103,20 +134,17 @@ def modificar_solicitud(request):
                 observaciones.append("Descripción actualizada.")
             
             if estado_id:
-                nuevo_estado = get_object_or_404(EstadoSolicitud, pk=estado_id)
+                nuevo_estado = obtener_estado(estado_id)
                 solicitud.est_id = nuevo_estado
                 observaciones.append(f"Estado cambiado a: '{nuevo_estado.est_nombre}'")
 
             solicitud.sca_usuario_actualizacion = request.user
             solicitud.save()
+            registrar_cambio_estado(solicitud, estado_anterior_id)
+            registrar_cambio(solicitud, CambioSolicitud.MODIFICADA, est_id=solicitud.est_id_id)
 
             if nuevos_documentos:
-                for documento in nuevos_documentos:
-                    DocumentoSolicitud.objects.create(
-                        solicitud=solicitud, 
-                        doc_archivo=documento,
-                        doc_usuario_actualizacion=request.user
-                    )
+                insertar_documentos(documentos_preparados, solicitud=solicitud)
                 observaciones.append(f"Se añadieron {len(nuevos_documentos)} documento(s) nuevo(s).")
 
             if observaciones:
@@ -132,7 +160,7 @@ def modificar_solicitud(request):
                 docs.append({
                     "doc_id": doc.doc_id,
                     "url_archivo": request.build_absolute_uri(doc.doc_archivo.url) if doc.doc_archivo else None,
-                    "nombre_archivo": str(doc.doc_archivo.name)
+                    "nombre_archivo": doc.nombre_archivo
                 })
 
             response_data = {
@@ -161,54 +189,72 @@ def modificar_solicitud(request):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@solo_lectura
 def filtrar_solicitudes(request):
 
     try:
         filtros = request.data
-        queryset = SolicitudAyuda.objects.all()
-
-        if filtros.get('estado_id'):
-            queryset = queryset.filter(est_id=filtros['estado_id'])
-        if filtros.get('year'):
-            queryset = queryset.filter(sca_fecha_creacion__year=filtros['year'])
-        if filtros.get('month'):
-            queryset = queryset.filter(sca_fecha_creacion__month=filtros['month'])
-        if filtros.get('day'):
-            queryset = queryset.filter(sca_fecha_creacion__day=filtros['day'])
-        if filtros.get('solicitante_id'):
-            queryset = queryset.filter(solicitante_id=filtros['solicitante_id'])
+        queryset = filtrar_solicitudes_por(SolicitudAyuda.objects.all(), filtros)
+        campos = leer_campos_solicitud(filtros.get('fields'))
+
+        if es_verdadero(filtros.get('stream', False)):
+            return respuesta_json_streaming(
+                solicitudes_proyectadas(queryset, campos).order_by('sca_fecha_creacion', 'sca_id'),
+                lambda solicitud: serializar_solicitud(solicitud, request, campos)
+            )
+
+        cursor, limite, paginado = leer_parametros_paginacion(filtros)
+        etag = etag_solicitudes(request, filtros, queryset, campos)
+        no_modificada = no_modificado(request, etag)
+        if no_modificada:
+            return no_modificada
+
+        solicitudes, siguiente = paginar_por_cursor(
+            solicitudes_proyectadas(queryset, campos), ('sca_fecha_creacion', 'sca_id'), cursor, limite
+        )
+        results = [serializar_solicitud(solicitud, request, campos) for solicitud in solicitudes]
         
+        return con_etag(respuesta_paginada(results, siguiente, paginado), etag)
+
+    except (ParametroPaginacionInvalido, FiltroInvalido) as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response(
+            {"error": "Ocurrió un error inesperado al filtrar las solicitudes.", "detalle": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@solo_lectura
+def buscar_solicitudes(request):
+
+    try:
+        # Texto completo sobre título, descripción y bitácora; admite los filtros de filtrar_solicitudes.
+        ranking = buscar(request.data)
+        por_id = solicitudes_con_relaciones(
+            SolicitudAyuda.objects.filter(pk__in=[sca_id for sca_id, _, _ in ranking])
+        ).in_bulk()
+
         results = []
-        for solicitud in queryset:
-            docs = []
-            for doc in solicitud.documentos.all():
-                docs.append({
-                    "doc_id": doc.doc_id,
-                    "url_archivo": request.build_absolute_uri(doc.doc_archivo.url) if doc.doc_archivo else None
-                })
-            results.append({
-                "sca_id": solicitud.sca_id,
-                "id_solicitante": solicitud.solicitante.id,
-                'rut'   : solicitud.solicitante.rut,
-                'telefono': solicitud.solicitante.telefono,
-                "sca_titulo": solicitud.sca_titulo,
-                'sca_descripcion':solicitud.sca_descripcion,
-                "estado": solicitud.est_id.est_id,
-                "solicitante_email": solicitud.solicitante.email,
-                "sca_fecha_creacion": solicitud.sca_fecha_creacion,
-                "documentos": docs
-            })
-        
+        for sca_id, relevancia, fragmentos in ranking:
+            datos = serializar_solicitud(por_id[sca_id], request)
+            datos["relevancia"] = relevancia
+            datos["fragmentos"] = fragmentos
+            results.append(datos)
         return Response(results, status=status.HTTP_200_OK)
 
+    except FiltroInvalido as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response(
-            {"error": "Ocurrió un error inesperado al filtrar las solicitudes.", "detalle": str(e)},
+            {"error": "Ocurrió un error inesperado al buscar las solicitudes.", "detalle": str(e)},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@subida_directa
 def crear_registro_bitacora(request):
 
     try:
@@ -223,20 +269,18 @@ def crear_registro_bitacora(request):
             )
 
         solicitud = get_object_or_404(SolicitudAyuda, pk=solicitud_id)
+        # El archivo se guarda antes de la transacción, como en crear/modificar.
+        adjuntos = preparar_documentos([documento_adjunto] if documento_adjunto else [], doc_usuario_actualizacion=request.user)
 
-        with transaction.atomic():
+        with descartar_si_falla(adjuntos), transaction.atomic():
             bitacora = BitacoraSolicitud.objects.create(
                 sca_id=solicitud,
                 usuario=request.user,
                 bsca_usuario_actualizacion=request.user,
                 bsca_observacion=observacion
             )
-            if documento_adjunto:
-                DocumentoSolicitud.objects.create(
-                    solicitud=solicitud,
-                    bitacora=bitacora,
-                    doc_archivo=documento_adjunto
-                )
+            insertar_documentos(adjuntos, solicitud=solicitud, bitacora=bitacora)
+            registrar_cambio(solicitud, CambioSolicitud.BITACORA, bsca_id=bitacora.bsca_id)
         
         response_data = {
             "mensaje": "Registro de bitácora creado correctamente.",
@@ -260,6 +304,7 @@ def crear_registro_bitacora(request):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@solo_lectura
 def filtrar_bitacora_solicitud(request):
     try:
         solicitud_id = request.data.get('solicitud_id')
@@ -267,28 +312,26 @@ def filtrar_bitacora_solicitud(request):
             return Response({"error": "El campo 'solicitud_id' es obligatorio."}, status=status.HTTP_400_BAD_REQUEST)
         
         get_object_or_404(SolicitudAyuda, pk=solicitud_id)
+
+        queryset, incremental = bitacora_desde(BitacoraSolicitud.objects.filter(sca_id=solicitud_id), request.data)
+        if incremental:
+            # Solo las entradas nuevas: sin ETag, que recorrería la bitácora completa.
+            results = [serializar_registro_bitacora(registro, request) for registro in bitacora_con_relaciones(queryset)]
+            return Response(results, status=status.HTTP_200_OK)
+
+        etag = etag_bitacora(request, request.data, solicitud_id)
+        no_modificada = no_modificado(request, etag)
+        if no_modificada:
+            return no_modificada
         
-        queryset = BitacoraSolicitud.objects.filter(sca_id=solicitud_id)
+        queryset = bitacora_con_relaciones(queryset)
 
-        results = []
-        for registro in queryset:
-            docs = []
-            for doc in registro.documentos.all():
-                 docs.append({
-                    "doc_id": doc.doc_id,
-                    "url_archivo": request.build_absolute_uri(doc.doc_archivo.url) if doc.doc_archivo else None
-                })
-            
-            results.append({
-                "bsca_id": registro.bsca_id,
-                "observacion": registro.bsca_observacion,
-                "usuario_email": registro.usuario.email if registro.usuario else "Usuario eliminado",
-                "fecha_creacion": registro.bsca_fecha_creacion,
-                "documentos_adjuntos": docs
-            })
+        results = [serializar_registro_bitacora(registro, request) for registro in queryset]
         
-        return Response(results, status=status.HTTP_200_OK)
+        return con_etag(Response(results, status=status.HTTP_200_OK), etag)
 
+    except FiltroInvalido as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except SolicitudAyuda.DoesNotExist:
         return Response({"error": "La solicitud especificada no existe."}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
@@ -324,9 +367,17 @@ def crea_estado_solicitud(request):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@solo_lectura
 def filtra_estado_solicitud(request):
     try:
-        obj_estados = EstadoSolicitud.objects.all()
+        # El catálogo ya lleva un contador de versión: basta con él para el ETag.
+        catalogo, version = estados.obtener_con_version()
+        etag = calcular_etag(request.path, version)
+        no_modificada = no_modificado(request, etag)
+        if no_modificada:
+            return no_modificada
+
+        obj_estados = catalogo.values()
         list_estados = []
         for estado in obj_estados:
             list_estados.append({
@@ -339,24 +390,64 @@ def filtra_estado_solicitud(request):
             "estados" : list_estados
         }
 
-        return Response(respose, status=status.HTTP_200_OK)
+        return con_etag(Response(respose, status=status.HTTP_200_OK), etag)
         
     except Exception as e:
         return Response(
             {"error": "Ocurrió un error inesperado.", "detalle": str(e)},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
-    
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@solo_lectura
+def estadisticas_solicitudes(request):
+    try:
+        # Solicitudes por estado y mes de creación, leídas del resumen (filtros: estado_id, year, month).
+        catalogo = estados.obtener()
+        periodos = []
+        totales = {}
+        for estado_id, anio, mes, cantidad in contadores(request.GET):
+            periodos.append({
+                "estado_id": estado_id,
+                "estado_nombre": catalogo[estado_id].est_nombre if estado_id in catalogo else None,
+                "year": anio,
+                "month": mes,
+                "cantidad": cantidad
+            })
+            totales[estado_id] = totales.get(estado_id, 0) + cantidad
+
+        response_data = {
+            "periodos": periodos,
+            "totales": [
+                {
+                    "estado_id": estado_id,
+                    "estado_nombre": catalogo[estado_id].est_nombre if estado_id in catalogo else None,
+                    "cantidad": cantidad
+                }
+                for estado_id, cantidad in sorted(totales.items())
+            ]
+        }
+        return Response(response_data, status=status.HTTP_200_OK)
+
+    except FiltroInvalido as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response(
+            {"error": "Ocurrió un error inesperado al obtener las estadísticas.", "detalle": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@solo_lectura
 def ver_documento(request, doc_id):
     try:
         # get_object_or_404 se encarga del error 'DoesNotExist' por sí solo.
         documento = get_object_or_404(DocumentoSolicitud, pk=doc_id)
 
-        ruta_del_archivo = documento.doc_archivo.path
-        response = FileResponse(open(ruta_del_archivo, 'rb'))
-        return response
+        # Con el permiso ya verificado, la transferencia puede delegarse al proxy (X-Accel-Redirect/X-Sendfile).
+        return entregar_documento(request, documento, documento.nombre_archivo)
 
     except Exception as e:
         # Solo necesitamos capturar otros errores inesperados.
@@ -365,6 +456,42 @@ def ver_documento(request, doc_id):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
     
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@solo_lectura
+def descargar_documentos(request, sca_id):
+    try:
+        solicitud = SolicitudAyuda.objects.get(pk=sca_id)
+        documentos = DocumentoSolicitud.objects.filter(solicitud=solicitud)
+
+        bitacora_id = request.query_params.get('bitacora_id')
+        if bitacora_id:
+            try:
+                bitacora_id = int(bitacora_id)
+            except ValueError:
+                return Response({"error": "'bitacora_id' debe ser un número entero."}, status=status.HTTP_400_BAD_REQUEST)
+            if not BitacoraSolicitud.objects.filter(pk=bitacora_id, sca_id=solicitud).exists():
+                return Response(
+                    {"error": "El registro de bitácora no existe o no pertenece a la solicitud."},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            documentos = documentos.filter(bitacora_id=bitacora_id)
+
+        # Una sola consulta para todo el expediente; las filas se leen a medida que se arma el ZIP.
+        documentos = documentos.only(
+            'doc_id', 'doc_archivo', 'doc_nombre_original', 'doc_tamano', 'doc_fecha_actualizacion'
+        ).order_by('doc_id').iterator(chunk_size=settings.EXPORTACION_TAMANO_LOTE)
+        nombre = f"solicitud_{solicitud.sca_id}_bitacora_{bitacora_id}.zip" if bitacora_id else f"solicitud_{solicitud.sca_id}.zip"
+        return respuesta_zip(documentos, nombre)
+
+    except SolicitudAyuda.DoesNotExist:
+        return Response({"error": "La solicitud especificada no existe."}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        return Response(
+            {"error": "Ocurrió un error inesperado al descargar los documentos.", "detalle": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def eliminar_documento(request):
@@ -380,14 +507,16 @@ def eliminar_documento(request):
         with transaction.atomic():
             documento = get_object_or_404(DocumentoSolicitud, pk=documento_id)
             solicitud_asociada = documento.solicitud
-            nombre_archivo = str(documento.doc_archivo.name)
+            nombre_archivo = documento.nombre_archivo
+            registrar_cambio(solicitud_asociada, CambioSolicitud.DOCUMENTO_ELIMINADO, doc_id=documento.doc_id)
 
-            documento.doc_archivo.delete() 
-            documento.delete()
+            # El archivo puede estar compartido con otros documentos (mismo contenido);
+            # el blob solo se borra cuando se elimina la última referencia.
+            eliminar_documento_y_blob(documento)
 
             observacion = f"Documento eliminado: '{nombre_archivo}'"
             BitacoraSolicitud.objects.create(
-                solicitud=solicitud_asociada,
+                sca_id=solicitud_asociada,
                 usuario=request.user,
                 bsca_observacion=observacion
             )
@@ -428,17 +557,11 @@ def enviar_notificacion_nueva_solicitud(solicitud):
         email_desde = settings.EMAIL_HOST_USER
         email_para = [solicitante.email] 
 
-        send_mail(
-            asunto,
-            mensaje,
-            email_desde,
-            email_para,
-            fail_silently=True
-        )
-        print(f"Correo de NUEVA solicitud enviado a {solicitante.email}") 
+        encolar_correo(asunto, mensaje, email_para, email_desde)
+        logger.info("Correo de nueva solicitud encolado para %s.", solicitante.email)
 
-    except Exception as e:
-        print(f"Error al enviar correo de nueva solicitud: {e}")
+    except Exception:
+        logger.exception("Error al encolar el correo de nueva solicitud %s.", solicitud.sca_id)
 
 def enviar_notificacion_cambio_estado(solicitud, nuevo_estado_nombre):
     try:
@@ -461,17 +584,11 @@ def enviar_notificacion_cambio_estado(solicitud, nuevo_estado_nombre):
         email_desde = settings.EMAIL_HOST_USER
         email_para = ['jorg.fuentesc@duocuc.cl']#[solicitante.email]
 
-        send_mail(
-            asunto,
-            mensaje,
-            email_desde,
-            email_para,
-            fail_silently=True
-        )
-        print(f"Correo de notificación enviado a {solicitante.email}")
+        encolar_correo(asunto, mensaje, email_para, email_desde)
+        logger.info("Correo de cambio de estado encolado para %s.", solicitante.email)
 
-    except Exception as e:
-        print(f"Error al enviar correo en segundo plano: {e}")
+    except Exception:
+        logger.exception("Error al encolar el correo de cambio de estado de la solicitud %s.", solicitud.sca_id)
         
         
 @api_view(['POST'])
@@ -491,7 +608,8 @@ def crear_tipo_usuario(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        nuevo_tipo = TipoUsuario.objects.create(tiu_nombre=nombre)
+        with transaction.atomic():
+            nuevo_tipo = TipoUsuario.objects.create(tiu_nombre=nombre)
 
         response_data = {
             "mensaje": "Tipo de usuario creado correctamente.",
@@ -510,12 +628,14 @@ def crear_tipo_usuario(request):
         
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@solo_lectura
 def ver_tipos_usuario(request):
 
     try:
-        tipos_usuario = TipoUsuario.objects.filter(tiu_vigencia=True)
         results = []
-        for tipo in tipos_usuario:
+        for tipo in tipos_usuario.obtener().values():
+            if not tipo.tiu_vigencia:
+                continue
             results.append({
                 "tiu_id": tipo.tiu_id,
                 "tiu_nombre": tipo.tiu_nombre,
@@ -551,7 +671,7 @@ def asignar_tipo_usuario(request):
             )
         
         try:
-            nuevo_tipo = TipoUsuario.objects.get(tiu_id=tipo_id)
+            nuevo_tipo = obtener_tipo_usuario(tipo_id)
         except TipoUsuario.DoesNotExist:
             return Response(
                 {"error": f"No se encontró ningún tipo de usuario con el ID: {tipo_id}"},
@@ -580,6 +700,7 @@ def asignar_tipo_usuario(request):
         
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@solo_lectura
 def listar_usuarios(request):
         
     try:
@@ -598,31 +719,20 @@ def listar_usuarios(request):
             error_msg = f"No se encontró ningún usuario con el RUT: {rut_filtro}"
         
         
-        usuarios = queryset.order_by('id')
-        
-        if (id_filtro or rut_filtro) and not usuarios.exists():
+        if (id_filtro or rut_filtro) and not queryset.exists():
             return Response({"error": error_msg}, status=status.HTTP_404_NOT_FOUND)
 
-        results = []
-        for usuario in usuarios:
-            tipo_nombre = None
-            if usuario.tiu_id:
-                tipo_nombre = usuario.tiu_id.tiu_nombre
+        if es_verdadero(request.query_params.get('stream', False)):
+            return respuesta_json_streaming(queryset.order_by('id'), serializar_usuario)
 
-            results.append({
-                "id": usuario.id,
-                "email": usuario.email,
-                "rut": usuario.rut,
-                "nombre": usuario.first_name,
-                "apellido_paterno": usuario.last_name,
-                "apellido_materno": usuario.apellido_materno,
-                "tipo_usuario": tipo_nombre,
-                "es_staff": usuario.is_staff,
-                "esta_activo": usuario.is_active
-            })
+        cursor, limite, paginado = leer_parametros_paginacion(request.query_params)
+        usuarios, siguiente = paginar_por_cursor(queryset, ('id',), cursor, limite)
+        results = [serializar_usuario(usuario) for usuario in usuarios]
 
-        return Response(results, status=status.HTTP_200_OK)
+        return respuesta_paginada(results, siguiente, paginado)
 
+    except ParametroPaginacionInvalido as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response(
             {"error": "Ocurrió un error inesperado al listar los usuarios.", "detalle": str(e)},
@@ -633,8 +743,6 @@ def listar_usuarios(request):
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def anular_solicitud(request):    
-    ESTADO_ANULADO_ID = 5 
-    
     try:
         solicitud_id = request.data.get('solicitud_id')
 
@@ -647,7 +755,7 @@ def anular_solicitud(request):
         with transaction.atomic():
             
             try:
-                solicitud = SolicitudAyuda.objects.get(pk=solicitud_id)
+                solicitud = SolicitudAyuda.objects.select_for_update().get(pk=solicitud_id)
             except SolicitudAyuda.DoesNotExist:
                 return Response(
                     {"error": f"La solicitud con id {solicitud_id} no existe."},
@@ -655,22 +763,25 @@ def anular_solicitud(request):
                 )
             
             try:
-                estado_anulado = EstadoSolicitud.objects.get(pk=ESTADO_ANULADO_ID)
+                estado_anulado = obtener_estado(ESTADO_ANULADO_ID)
             except EstadoSolicitud.DoesNotExist:
                 return Response(
                     {"error": f"Error de configuración: El estado 'Anulado' (ID {ESTADO_ANULADO_ID}) no existe en la base de datos."},
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
 
-            if solicitud.est_id == estado_anulado:
+            if solicitud.est_id_id == estado_anulado.est_id:
                 return Response(
                     {"mensaje": f"La solicitud {solicitud_id} ya se encontraba anulada."},
                     status=status.HTTP_200_OK
                 )
             
+            estado_anterior_id = solicitud.est_id_id
             solicitud.est_id = estado_anulado
             solicitud.sca_usuario_actualizacion = request.user
             solicitud.save()
+            registrar_cambio_estado(solicitud, estado_anterior_id)
+            registrar_cambio(solicitud, CambioSolicitud.ANULADA, est_id=solicitud.est_id_id)
 
             observacion = f"Solicitud ANULADA por el usuario: {request.user.email}."
             BitacoraSolicitud.objects.create(
@@ -694,6 +805,92 @@ def anular_solicitud(request):
             {"error": "Ocurrió un error inesperado al anular la solicitud.", "detalle": str(e)},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def cambiar_estado_masivo(request):
+    # Cambia el estado de varias solicitudes (o las anula con 'anular': true) en una sola
+    # transacción: un UPDATE, un INSERT de bitácora y un resultado por cada solicitud_id.
+    try:
+        if hasattr(request.data, 'getlist'):
+            solicitud_ids = request.data.getlist('solicitud_ids')
+        else:
+            solicitud_ids = request.data.get('solicitud_ids')
+        anular = es_verdadero(request.data.get('anular', False))
+        estado_id = ESTADO_ANULADO_ID if anular else request.data.get('est_id')
+
+        if not solicitud_ids or not isinstance(solicitud_ids, list) or not estado_id:
+            return Response(
+                {"error": "Los campos 'solicitud_ids' (lista) y 'est_id' (o 'anular': true) son obligatorios."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            solicitud_ids = list(dict.fromkeys(int(solicitud_id) for solicitud_id in solicitud_ids))
+        except (TypeError, ValueError):
+            return Response({"error": "Cada 'solicitud_ids' debe ser un número entero."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(solicitud_ids) > settings.CAMBIO_MASIVO_MAXIMO:
+            return Response(
+                {"error": f"Se permiten como máximo {settings.CAMBIO_MASIVO_MAXIMO} solicitudes por llamada."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        nuevo_estado = obtener_estado(estado_id)
+        if anular:
+            observacion = f"Solicitud ANULADA por el usuario: {request.user.email}."
+        else:
+            observacion = f"Solicitud modificada. Estado cambiado a: '{nuevo_estado.est_nombre}'"
+
+        with transaction.atomic():
+            por_id = SolicitudAyuda.objects.select_for_update().only(
+                'sca_id', 'est_id', 'sca_fecha_creacion'
+            ).in_bulk(solicitud_ids)
+
+            cambios = [
+                (solicitud, solicitud.est_id_id)
+                for solicitud in por_id.values()
+                if solicitud.est_id_id != nuevo_estado.est_id
+            ]
+            if cambios:
+                SolicitudAyuda.objects.filter(pk__in=[solicitud.sca_id for solicitud, _ in cambios]).update(
+                    est_id=nuevo_estado,
+                    sca_usuario_actualizacion=request.user,
+                    sca_fecha_actualizacion=timezone.now()
+                )
+                for solicitud, _ in cambios:
+                    solicitud.est_id = nuevo_estado
+                registrar_cambios_estado(cambios)
+                BitacoraSolicitud.objects.bulk_create([
+                    BitacoraSolicitud(sca_id=solicitud, usuario=request.user, bsca_observacion=observacion)
+                    for solicitud, _ in cambios
+                ])
+                tipo = CambioSolicitud.ANULADA if anular else CambioSolicitud.MODIFICADA
+                registrar_cambios([(solicitud, tipo, {"est_id": nuevo_estado.est_id}) for solicitud, _ in cambios])
+
+        actualizadas = {solicitud.sca_id for solicitud, _ in cambios}
+        resultados = []
+        for solicitud_id in solicitud_ids:
+            if solicitud_id in actualizadas:
+                resultado = "actualizada"
+            elif solicitud_id in por_id:
+                resultado = "sin_cambios"
+            else:
+                resultado = "no_existe"
+            resultados.append({"solicitud_id": solicitud_id, "resultado": resultado})
+
+        response_data = {
+            "mensaje": f"{len(actualizadas)} solicitud(es) cambiada(s) a '{nuevo_estado.est_nombre}'.",
+            "estado": {"estado_id": nuevo_estado.est_id, "estado_nombre": nuevo_estado.est_nombre},
+            "resultados": resultados
+        }
+        return Response(response_data, status=status.HTTP_200_OK)
+
+    except EstadoSolicitud.DoesNotExist:
+        return Response({"error": "El estado de solicitud especificado no existe."}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        return Response(
+            {"error": "Ocurrió un error inesperado al cambiar el estado de las solicitudes.", "detalle": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
         
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -832,9 +1029,8 @@ def modificar_usuario(request):
             
         if 'tiu_id' in request.data:
             try:
-                nuevo_tipo = TipoUsuario.objects.get(tiu_id=request.data.get('tiu_id'))
-                # Asumimos que tu campo se llama 'tipo_usuario' como corregimos
-                usuario_a_modificar.tipo_usuario = nuevo_tipo 
+                nuevo_tipo = obtener_tipo_usuario(request.data.get('tiu_id'))
+                usuario_a_modificar.tiu_id = nuevo_tipo
             except TipoUsuario.DoesNotExist:
                 return Response(
                     {"error": f"El tipo de usuario con id {request.data.get('tiu_id')} no existe."},
@@ -0,0 +1,220 @@
+# solicitudes/vistas_async.py
+import json
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+from rest_framework.utils.encoders import JSONEncoder
+from .models import SolicitudAyuda, DocumentoSolicitud, BitacoraSolicitud
+from .cambios import difusor, ultima_secuencia
+from .catalogos import estados
+from .condicional import calcular_etag, con_etag, etag_bitacora, etag_solicitudes, no_modificado
+from .consultas import (
+    bitacora_con_relaciones, bitacora_desde, solicitudes_proyectadas, leer_campos_solicitud,
+    serializar_solicitud, serializar_registro_bitacora, serializar_usuario
+)
+from .entrega import entregar_documento
+from .filtros import FiltroInvalido, filtrar_solicitudes_por
+from .paginacion import ParametroPaginacionInvalido, leer_parametros_paginacion, apaginar_por_cursor
+from users.autenticacion import autenticar_token_async
+from backTecho.replicas import solo_lectura
+from users.models import CustomUser
+
+# Versiones async de los endpoints de lectura, para servir bajo ASGI (backTecho/asgi.py) sin
+# pasar cada petición por un hilo. Devuelven las mismas respuestas que las vistas de views.py.
+
+
+def _json(datos, status=200):
+    return JsonResponse(
+        datos, status=status, safe=False, encoder=JSONEncoder,
+        json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')}
+    )
+
+
+class CuerpoInvalido(ValueError):
+    pass
+
+
+def _datos(request):
+    if request.content_type == 'application/json':
+        try:
+            return json.loads(request.body or b'{}')
+        except ValueError:
+            raise CuerpoInvalido("El cuerpo de la petición no es JSON válido.")
+    return request.POST
+
+
+def _respuesta_paginada(results, siguiente, paginado):
+    if paginado:
+        return _json({"results": results, "next_cursor": siguiente})
+    respuesta = _json(results)
+    if siguiente:
+        respuesta['X-Next-Cursor'] = siguiente
+    return respuesta
+
+
+def vista_async(*metodos):
+    # Autenticación por token (misma caché que TokenCacheadoAuthentication) y manejo de errores.
+    def decorador(vista):
+        @wraps(vista)
+        async def envoltura(request, *args, **kwargs):
+            if 'Authorization' not in request.headers:
+                return _json({"detail": "Authentication credentials were not provided."}, status=401)
+            usuario = await autenticar_token_async(request)
+            if usuario is None:
+                return _json({"detail": "Invalid token."}, status=401)
+            request.user = usuario
+            try:
+                return await vista(request, *args, **kwargs)
+            except (ParametroPaginacionInvalido, FiltroInvalido, CuerpoInvalido) as e:
+                return _json({"error": str(e)}, status=400)
+            except Exception as e:
+                return _json({"error": "Ocurrió un error inesperado.", "detalle": str(e)}, status=500)
+        return csrf_exempt(require_http_methods(metodos)(envoltura))
+    return decorador
+
+
+@vista_async('POST')
+@solo_lectura
+async def filtrar_solicitudes(request):
+    filtros = _datos(request)
+    queryset = filtrar_solicitudes_por(SolicitudAyuda.objects.all(), filtros)
+    campos = leer_campos_solicitud(filtros.get('fields'))
+    cursor, limite, paginado = leer_parametros_paginacion(filtros)
+    etag = await sync_to_async(etag_solicitudes)(request, filtros, queryset, campos)
+    no_modificada = no_modificado(request, etag)
+    if no_modificada:
+        return no_modificada
+    solicitudes, siguiente = await apaginar_por_cursor(
+        solicitudes_proyectadas(queryset, campos), ('sca_fecha_creacion', 'sca_id'), cursor, limite
+    )
+    results = [serializar_solicitud(solicitud, request, campos) for solicitud in solicitudes]
+    return con_etag(_respuesta_paginada(results, siguiente, paginado), etag)
+
+
+@vista_async('POST')
+@solo_lectura
+async def filtrar_bitacora_solicitud(request):
+    datos = _datos(request)
+    solicitud_id = datos.get('solicitud_id')
+    if not solicitud_id:
+        return _json({"error": "El campo 'solicitud_id' es obligatorio."}, status=400)
+    if not await SolicitudAyuda.objects.filter(pk=solicitud_id).aexists():
+        return _json({"error": "La solicitud especificada no existe."}, status=404)
+
+    queryset, incremental = await sync_to_async(bitacora_desde)(BitacoraSolicitud.objects.filter(sca_id=solicitud_id), datos)
+    if incremental:
+        return _json([serializar_registro_bitacora(registro, request) async for registro in bitacora_con_relaciones(queryset)])
+
+    etag = await sync_to_async(etag_bitacora)(request, datos, solicitud_id)
+    no_modificada = no_modificado(request, etag)
+    if no_modificada:
+        return no_modificada
+    queryset = bitacora_con_relaciones(queryset)
+    return con_etag(_json([serializar_registro_bitacora(registro, request) async for registro in queryset]), etag)
+
+
+@vista_async('POST')
+@solo_lectura
+async def filtra_estado_solicitud(request):
+    catalogo, version = await sync_to_async(estados.obtener_con_version)()
+    etag = calcular_etag(request.path, version)
+    no_modificada = no_modificado(request, etag)
+    if no_modificada:
+        return no_modificada
+    return con_etag(_json({
+        "mensaje": "Registro de estados obtenidos correctamente.",
+        "estados": [{"estado_id": e.est_id, "estado_nombre": e.est_nombre} for e in catalogo.values()]
+    }), etag)
+
+
+@vista_async('GET')
+@solo_lectura
+async def listar_usuarios(request):
+    id_filtro = request.GET.get('id')
+    rut_filtro = request.GET.get('rut')
+    queryset = CustomUser.objects.select_related('tiu_id')
+    if id_filtro:
+        queryset = queryset.filter(id=id_filtro)
+        error_msg = f"No se encontró ningún usuario con el ID: {id_filtro}"
+    elif rut_filtro:
+        queryset = queryset.filter(rut=rut_filtro)
+        error_msg = f"No se encontró ningún usuario con el RUT: {rut_filtro}"
+    if (id_filtro or rut_filtro) and not await queryset.aexists():
+        return _json({"error": error_msg}, status=404)
+
+    cursor, limite, paginado = leer_parametros_paginacion(request.GET)
+    usuarios, siguiente = await apaginar_por_cursor(queryset, ('id',), cursor, limite)
+    results = [serializar_usuario(usuario) for usuario in usuarios]
+    return _respuesta_paginada(results, siguiente, paginado)
+
+
+@vista_async('GET', 'HEAD')
+@solo_lectura
+async def ver_documento(request, doc_id):
+    try:
+        documento = await DocumentoSolicitud.objects.aget(pk=doc_id)
+    except DocumentoSolicitud.DoesNotExist:
+        return _json({"detail": "No DocumentoSolicitud matches the given query."}, status=404)
+    return entregar_documento(request, documento, documento.nombre_archivo, asincrono=True)
+
+
+def _leer_desde(request):
+    # ?desde=<seq> o, al reconectarse un EventSource, la cabecera Last-Event-ID. Sin ninguno
+    # de los dos, el feed empieza en el último cambio confirmado.
+    valor = request.GET.get('desde') or request.headers.get('Last-Event-ID')
+    if valor in (None, ''):
+        return None
+    try:
+        desde = int(valor)
+    except ValueError:
+        raise FiltroInvalido("El parámetro 'desde' debe ser un número entero.")
+    if desde < 0:
+        raise FiltroInvalido("El parámetro 'desde' no puede ser negativo.")
+    return desde
+
+
+@vista_async('GET')
+async def cambios(request):
+    # Long-poll: responde en cuanto hay cambios posteriores a 'desde' o al vencer 'espera'.
+    desde = _leer_desde(request)
+    if desde is None:
+        desde = await ultima_secuencia()
+    try:
+        espera = float(request.GET.get('espera', settings.CAMBIOS_ESPERA_MAXIMA))
+    except ValueError:
+        raise FiltroInvalido("El parámetro 'espera' debe ser un número.")
+    espera = min(max(espera, 0), settings.CAMBIOS_ESPERA_MAXIMA)
+
+    nuevos = await difusor.siguientes(desde, espera)
+    return _json({"cambios": nuevos, "ultimo": nuevos[-1]['seq'] if nuevos else desde})
+
+
+def _evento(cambio):
+    datos = json.dumps(cambio, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'))
+    return f"id: {cambio['seq']}\nevent: {cambio['tipo']}\ndata: {datos}\n\n"
+
+
+@vista_async('GET')
+async def cambios_stream(request):
+    # Server-Sent Events. Solo bajo ASGI: con WSGI el stream ocuparía un hilo por cliente.
+    desde = _leer_desde(request)
+    if desde is None:
+        desde = await ultima_secuencia()
+
+    async def eventos(desde):
+        yield "retry: 3000\n\n"
+        while True:
+            nuevos = await difusor.siguientes(desde, settings.CAMBIOS_LATIDO)
+            if not nuevos:
+                yield ": latido\n\n"
+                continue
+            desde = nuevos[-1]['seq']
+            yield ''.join(_evento(cambio) for cambio in nuevos)
+
+    respuesta = StreamingHttpResponse(eventos(desde), content_type='text/event-stream')
+    respuesta['Cache-Control'] = 'no-cache'
+    respuesta['X-Accel-Buffering'] = 'no'
+    return respuesta
@@ -0,0 +1,124 @@
+# users/autenticacion.py
+import copy
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+# Autenticación por token con caché en memoria (LRU + TTL) de token -> usuario, para no
+# consultar authtoken_token + users_customuser en cada petición.
+#
+# Invalidación entre procesos: cualquier worker que modifique un usuario o elimine un token
+# reemplaza el archivo AUTH_TOKEN_CACHE_MARCA. Cada petición compara (inodo, mtime) de ese
+# archivo con el último visto (un stat(), sin consultas) y vacía su caché si cambió.
+
+
+def _leer_marca():
+    try:
+        estado = os.stat(settings.AUTH_TOKEN_CACHE_MARCA)
+    except FileNotFoundError:
+        return None
+    return estado.st_ino, estado.st_mtime_ns
+
+
+def marca_usuarios():
+    # Cambia cada vez que se modifica un usuario o se elimina un token; sirve también como
+    # validador barato de las respuestas que incluyen datos de usuarios.
+    return _leer_marca()
+
+
+class CacheTokens:
+
+    def __init__(self):
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self._marca = None
+
+    def _verificar_marca(self):
+        marca = _leer_marca()
+        if marca != self._marca:
+            self._entradas.clear()
+            self._marca = marca
+
+    def obtener(self, key):
+        with self._lock:
+            self._verificar_marca()
+            entrada = self._entradas.get(key)
+            if entrada is None:
+                return None
+            if entrada[2] < time.monotonic():
+                del self._entradas[key]
+                return None
+            self._entradas.move_to_end(key)
+            return entrada[0], entrada[1]
+
+    def guardar(self, key, user, token, marca):
+        # 'marca' es la de antes de leer el usuario en la base (marca_usuarios()). Si hubo
+        # una invalidación mientras tanto, el usuario leído puede estar obsoleto y no se guarda.
+        with self._lock:
+            self._verificar_marca()
+            if marca != self._marca:
+                return
+            self._entradas[key] = (user, token, time.monotonic() + settings.AUTH_TOKEN_CACHE_TTL)
+            self._entradas.move_to_end(key)
+            while len(self._entradas) > settings.AUTH_TOKEN_CACHE_MAX_ENTRADAS:
+                self._entradas.popitem(last=False)
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+
+cache_tokens = CacheTokens()
+
+
+def invalidar_cache_tokens():
+    # Reemplazo atómico: el archivo nuevo tiene otro inodo, así el cambio se detecta
+    # aunque dos invalidaciones caigan en el mismo instante.
+    ruta = str(settings.AUTH_TOKEN_CACHE_MARCA)
+    directorio = os.path.dirname(ruta)
+    os.makedirs(directorio, exist_ok=True)
+    descriptor, temporal = tempfile.mkstemp(dir=directorio)
+    with os.fdopen(descriptor, 'w') as archivo:
+        archivo.write(str(time.time_ns()))
+    os.replace(temporal, ruta)
+    cache_tokens.limpiar()
+
+
+class TokenCacheadoAuthentication(TokenAuthentication):
+
+    def authenticate_credentials(self, key):
+        entrada = cache_tokens.obtener(key)
+        if entrada is None:
+            marca = marca_usuarios()
+            # La clase base valida que el token exista y que el usuario esté activo.
+            user, token = super().authenticate_credentials(key)
+            cache_tokens.guardar(key, user, token, marca)
+        else:
+            user, token = entrada
+        # Cada petición recibe su propia copia: las vistas pueden modificar request.user.
+        return copy.copy(user), token
+
+
+async def autenticar_token_async(request):
+    # Equivalente para vistas async (fuera de DRF). Devuelve el usuario o None.
+    partes = request.headers.get('Authorization', '').split()
+    if len(partes) != 2 or partes[0].lower() != 'token':
+        return None
+    key = partes[1]
+    entrada = cache_tokens.obtener(key)
+    if entrada is None:
+        marca = marca_usuarios()
+        try:
+            token = await Token.objects.select_related('user').aget(key=key)
+        except Token.DoesNotExist:
+            return None
+        if not token.user.is_active:
+            return None
+        cache_tokens.guardar(key, token.user, token, marca)
+        entrada = (token.user, token)
+    return copy.copy(entrada[0])
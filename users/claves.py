@@ -0,0 +1,29 @@
+# users/claves.py
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+
+# Hash de contraseñas en paralelo para las importaciones masivas. Este módulo no importa
+# modelos: los procesos hijos lo cargan antes de configurar Django.
+
+
+def _iniciar_proceso(hashers):
+    # Los procesos se crean con 'spawn' (seguro aunque el servidor use hilos), así que
+    # cargan Django desde cero y usan los mismos hashers que el proceso principal.
+    import django
+    django.setup()
+    settings.PASSWORD_HASHERS = hashers
+
+
+def hashear_claves(claves, procesos=None):
+    procesos = procesos or settings.USUARIOS_IMPORTACION_PROCESOS or os.cpu_count() or 1
+    if procesos <= 1 or len(claves) < settings.USUARIOS_IMPORTACION_MINIMO_PARALELO:
+        return [make_password(clave) for clave in claves]
+    procesos = min(procesos, len(claves))
+    with ProcessPoolExecutor(
+        max_workers=procesos, mp_context=get_context('spawn'),
+        initializer=_iniciar_proceso, initargs=(list(settings.PASSWORD_HASHERS),)
+    ) as ejecutor:
+        return list(ejecutor.map(make_password, claves, chunksize=max(1, len(claves) // (procesos * 4))))
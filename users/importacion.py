@@ -0,0 +1,98 @@
+# users/importacion.py
+import csv
+import io
+import json
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from .claves import hashear_claves
+from .models import CustomUser
+from .serializers import RegisterSerializer
+
+# Importación masiva de usuarios: valida cada fila con las mismas reglas que el registro,
+# resuelve la unicidad de email/RUT con una sola consulta, calcula los hashes de contraseña
+# (PBKDF2, el paso caro) en un pool de procesos e inserta con bulk_create por lotes.
+
+
+class ArchivoImportacionInvalido(ValueError):
+    pass
+
+
+class ImportarUsuarioSerializer(RegisterSerializer):
+
+    class Meta(RegisterSerializer.Meta):
+        # Sin los UniqueValidator del modelo: harían una consulta por fila y campo.
+        extra_kwargs = {
+            'password': {'write_only': True},
+            'email': {'validators': []},
+            'rut': {'validators': []},
+        }
+
+
+def validar_filas(filas, mensaje="'usuarios' debe ser una lista de objetos."):
+    if not isinstance(filas, list) or not all(isinstance(fila, dict) for fila in filas):
+        raise ArchivoImportacionInvalido(mensaje)
+    return filas
+
+
+def leer_filas(contenido, formato):
+    if isinstance(contenido, bytes):
+        contenido = contenido.decode('utf-8-sig')
+    if formato == 'csv':
+        return [dict(fila) for fila in csv.DictReader(io.StringIO(contenido))]
+    if formato == 'json':
+        try:
+            filas = json.loads(contenido)
+        except ValueError:
+            raise ArchivoImportacionInvalido("El archivo no es JSON válido.")
+        return validar_filas(filas, "El JSON debe ser una lista de objetos.")
+    raise ArchivoImportacionInvalido("El formato debe ser 'csv' o 'json'.")
+
+
+def importar_usuarios(filas, procesos=None, simular=False):
+    # Devuelve (creados, rechazados); rechazados es [{"fila": n, "errores": {...}}] con n
+    # contado desde 1 sobre los datos (sin la cabecera del CSV).
+    rechazados = []
+    validos = []
+    for numero, fila in enumerate(filas, start=1):
+        datos = {campo: valor for campo, valor in fila.items() if valor not in (None, '')}
+        serializer = ImportarUsuarioSerializer(data=datos)
+        if serializer.is_valid():
+            datos = serializer.validated_data
+            datos['email'] = CustomUser.objects.normalize_email(datos['email'])
+            validos.append((numero, datos))
+        else:
+            rechazados.append({"fila": numero, "errores": serializer.errors})
+
+    emails = {datos['email'] for _, datos in validos}
+    ruts = {datos['rut'] for _, datos in validos}
+    existentes = CustomUser.objects.filter(Q(email__in=emails) | Q(rut__in=ruts)).values_list('email', 'rut')
+    emails_usados = {email for email, _ in existentes}
+    ruts_usados = {rut for _, rut in existentes}
+
+    aceptados = []
+    for numero, datos in validos:
+        errores = {}
+        if datos['email'] in emails_usados:
+            errores['email'] = ["Ya existe un usuario con este email."]
+        if datos['rut'] in ruts_usados:
+            errores['rut'] = ["Ya existe un usuario con este RUT."]
+        if errores:
+            rechazados.append({"fila": numero, "errores": errores})
+            continue
+        # Las filas repetidas dentro del mismo archivo también se rechazan.
+        emails_usados.add(datos['email'])
+        ruts_usados.add(datos['rut'])
+        aceptados.append(datos)
+    rechazados.sort(key=lambda rechazo: rechazo['fila'])
+
+    if simular:
+        return len(aceptados), rechazados
+    if not aceptados:
+        return 0, rechazados
+
+    claves = hashear_claves([datos.pop('password') for datos in aceptados], procesos)
+    usuarios = [CustomUser(password=clave, **datos) for datos, clave in zip(aceptados, claves)]
+    with transaction.atomic():
+        CustomUser.objects.bulk_create(usuarios, batch_size=settings.USUARIOS_IMPORTACION_LOTE)
+    return len(usuarios), rechazados
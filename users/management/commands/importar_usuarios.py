@@ -0,0 +1,31 @@
+import os
+from django.core.management.base import BaseCommand, CommandError
+from users.importacion import ArchivoImportacionInvalido, leer_filas, importar_usuarios
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa usuarios desde un archivo CSV o JSON (mismos campos que el registro), "
+        "calculando los hashes de contraseña en paralelo e insertando por lotes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo')
+        parser.add_argument('--formato', choices=['csv', 'json'], help="Por defecto, la extensión del archivo.")
+        parser.add_argument('--procesos', type=int, help="Procesos para los hashes (por defecto, todos los núcleos).")
+        parser.add_argument('--simular', action='store_true', help="Solo valida, sin crear usuarios.")
+
+    def handle(self, *args, **options):
+        formato = options['formato'] or os.path.splitext(options['archivo'])[1].lstrip('.').lower()
+        try:
+            with open(options['archivo'], 'rb') as archivo:
+                filas = leer_filas(archivo.read(), formato)
+        except (OSError, ArchivoImportacionInvalido) as e:
+            raise CommandError(str(e))
+
+        creados, rechazados = importar_usuarios(filas, procesos=options['procesos'], simular=options['simular'])
+        for rechazo in rechazados:
+            errores = '; '.join(f"{campo}: {' '.join(map(str, mensajes))}" for campo, mensajes in rechazo['errores'].items())
+            self.stderr.write(f"Fila {rechazo['fila']}: {errores}")
+        verbo = "se crearían" if options['simular'] else "creados"
+        self.stdout.write(self.style.SUCCESS(f"{creados} usuario(s) {verbo}, {len(rechazados)} fila(s) rechazada(s)."))
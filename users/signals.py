@@ -0,0 +1,22 @@
+# users/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from .autenticacion import invalidar_cache_tokens
+from .models import CustomUser
+
+
+@receiver(post_delete, sender=Token)
+def token_eliminado(sender, instance, **kwargs):
+    # Revocar un token debe tener efecto inmediato en todos los workers.
+    transaction.on_commit(invalidar_cache_tokens)
+
+
+@receiver(post_save, sender=CustomUser)
+def usuario_guardado(sender, instance, created=False, update_fields=None, **kwargs):
+    # Cubre todos los cambios de usuarios: vistas, admin, shell, is_active... Un usuario nuevo
+    # aún no tiene tokens en caché, y el login solo actualiza last_login: ninguno vacía las cachés.
+    if created or (update_fields is not None and set(update_fields) <= {'last_login'}):
+        return
+    transaction.on_commit(invalidar_cache_tokens)
@@ -1,3 +1,200 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from unittest import mock
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from .autenticacion import CacheTokens, TokenCacheadoAuthentication, cache_tokens, invalidar_cache_tokens, marca_usuarios
+from .models import CustomUser
 
-# Create your tests here.
+
+def crear_usuario(numero=0, **extra):
+    return CustomUser.objects.create_user(
+        email=f'usuario{numero}@techo.cl',
+        password='clave-segura',
+        rut=f'{numero}-K',
+        first_name='Nombre',
+        last_name='Paterno',
+        apellido_materno='Materno',
+        **extra
+    )
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class TokenCacheadoTest(APITestCase):
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(AUTH_TOKEN_CACHE_MARCA=os.path.join(directorio.name, 'marca'))
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        cache_tokens.limpiar()
+
+        self.admin = crear_usuario(1)
+        self.usuario = crear_usuario(2)
+        self.token_admin = Token.objects.create(user=self.admin)
+        self.token_usuario = Token.objects.create(user=self.usuario)
+
+    def get(self, token, url='/solicitudes/tipo/ver/'):
+        return self.client.get(url, HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def test_segunda_peticion_no_consulta_el_token(self):
+        with CaptureQueriesContext(connection) as primera:
+            self.assertEqual(self.get(self.token_usuario).status_code, 200)
+        with CaptureQueriesContext(connection) as segunda:
+            self.assertEqual(self.get(self.token_usuario).status_code, 200)
+        self.assertEqual(len(primera) - len(segunda), 1)
+        self.assertFalse(any('authtoken_token' in c['sql'] for c in segunda.captured_queries))
+
+    def test_desactivar_usuario_revoca_de_inmediato(self):
+        self.assertEqual(self.get(self.token_usuario).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.client.post(
+                '/solicitudes/usuario/desactivar_usuario/', {'id': self.usuario.id},
+                HTTP_AUTHORIZATION=f'Token {self.token_admin.key}'
+            )
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(self.get(self.token_usuario).status_code, 401)
+
+    def test_eliminar_token_revoca_de_inmediato(self):
+        self.assertEqual(self.get(self.token_usuario).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token_usuario.delete()
+        self.assertEqual(self.get(self.token_usuario).status_code, 401)
+
+    def test_otro_worker_detecta_la_invalidacion(self):
+        otro_worker = CacheTokens()
+        otro_worker.guardar(self.token_usuario.key, self.usuario, self.token_usuario, marca_usuarios())
+        self.assertIsNotNone(otro_worker.obtener(self.token_usuario.key))
+        invalidar_cache_tokens()
+        self.assertIsNone(otro_worker.obtener(self.token_usuario.key))
+
+    def test_invalidacion_durante_la_consulta_no_se_guarda(self):
+        # La revocación llega entre la lectura del token en la base y el guardado en caché.
+        original = TokenAuthentication.authenticate_credentials
+
+        def leer_y_revocar(autenticacion, key):
+            resultado = original(autenticacion, key)
+            invalidar_cache_tokens()
+            return resultado
+
+        with mock.patch.object(TokenAuthentication, 'authenticate_credentials', leer_y_revocar):
+            TokenCacheadoAuthentication().authenticate_credentials(self.token_usuario.key)
+        self.assertIsNone(cache_tokens.obtener(self.token_usuario.key))
+
+    def test_guardar_usuario_fuera_de_las_vistas_revoca(self):
+        self.assertEqual(self.get(self.token_usuario).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.usuario.is_active = False
+            self.usuario.save()
+        self.assertEqual(self.get(self.token_usuario).status_code, 401)
+
+    def test_actualizar_last_login_no_vacia_la_cache(self):
+        self.get(self.token_usuario)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.usuario.save(update_fields=['last_login'])
+        self.assertEqual(callbacks, [])
+        self.assertIsNotNone(cache_tokens.obtener(self.token_usuario.key))
+
+    def test_crear_usuario_no_vacia_la_cache(self):
+        self.get(self.token_usuario)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            crear_usuario(3)
+        self.assertEqual(callbacks, [])
+        self.assertIsNotNone(cache_tokens.obtener(self.token_usuario.key))
+
+    def test_desactivar_invalida_una_sola_vez(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.post(
+                '/solicitudes/usuario/desactivar_usuario/', {'id': self.usuario.id},
+                HTTP_AUTHORIZATION=f'Token {self.token_admin.key}'
+            )
+        self.assertEqual(callbacks, [invalidar_cache_tokens])
+
+    @override_settings(AUTH_TOKEN_CACHE_MAX_ENTRADAS=1)
+    def test_lru_acotado(self):
+        self.get(self.token_usuario)
+        self.get(self.token_admin)
+        self.assertIsNone(cache_tokens.obtener(self.token_usuario.key))
+        self.assertIsNotNone(cache_tokens.obtener(self.token_admin.key))
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ImportarUsuariosTest(APITestCase):
+
+    def setUp(self):
+        self.admin = crear_usuario(1, is_staff=True)
+        self.client.force_authenticate(self.admin)
+
+    def fila(self, numero, **extra):
+        return {
+            'email': f'voluntario{numero}@techo.cl', 'password': f'clave-{numero}', 'rut': f'{numero}-9',
+            'first_name': 'Nombre', 'last_name': 'Paterno', 'apellido_materno': 'Materno', **extra
+        }
+
+    def test_importa_y_rechaza_filas(self):
+        filas = [self.fila(n) for n in range(100, 104)]
+        filas.append(self.fila(105, email='usuario1@techo.cl'))   # email ya registrado
+        filas.append(self.fila(106, rut='100-9'))                 # RUT repetido en el archivo
+        filas.append(self.fila(107, email='no-es-email'))
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.post('/api/auth/importar/', {'usuarios': filas}, format='json')
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['creados'], 4)
+        self.assertEqual([r['fila'] for r in respuesta.json()['rechazados']], [5, 6, 7])
+        self.assertLessEqual(len(consultas), 5)
+        usuario = CustomUser.objects.get(email='voluntario102@techo.cl')
+        self.assertTrue(usuario.check_password('clave-102'))
+
+    def test_csv_simulado_y_permisos(self):
+        cabecera = 'email,password,rut,first_name,last_name,apellido_materno\n'
+        csv = cabecera + 'nuevo@techo.cl,clave,77-7,N,P,M\n'
+        archivo = SimpleUploadedFile('usuarios.csv', csv.encode())
+        respuesta = self.client.post('/api/auth/importar/', {'archivo': archivo, 'simular': 'true'})
+        self.assertEqual(respuesta.json(), {'simulado': True, 'creados': 1, 'rechazados': []})
+        self.assertFalse(CustomUser.objects.filter(email='nuevo@techo.cl').exists())
+
+        self.client.force_authenticate(crear_usuario(2))
+        self.assertEqual(self.client.post('/api/auth/importar/', {'usuarios': []}, format='json').status_code, 403)
+
+    def test_filas_que_no_son_objetos(self):
+        for usuarios in ([1, 2], [None], ['x'], [self.fila(400), 'x']):
+            with self.subTest(usuarios=usuarios):
+                respuesta = self.client.post('/api/auth/importar/', {'usuarios': usuarios}, format='json')
+                self.assertEqual(respuesta.status_code, 400)
+        self.assertFalse(CustomUser.objects.filter(email='voluntario400@techo.cl').exists())
+
+    @override_settings(USUARIOS_IMPORTACION_MINIMO_PARALELO=4, USUARIOS_IMPORTACION_PROCESOS=2)
+    def test_vista_con_pool_de_procesos(self):
+        # Supera el umbral para que los hashes se calculen en los procesos 'spawn'.
+        filas = [self.fila(n) for n in range(300, 308)]
+        with mock.patch('users.claves.ProcessPoolExecutor', wraps=ProcessPoolExecutor) as pool:
+            respuesta = self.client.post('/api/auth/importar/', {'usuarios': filas}, format='json')
+        pool.assert_called_once()
+        self.assertEqual(respuesta.json()['creados'], 8)
+        usuario = CustomUser.objects.get(email='voluntario307@techo.cl')
+        self.assertTrue(usuario.check_password('clave-307'))
+        self.assertTrue(usuario.password.startswith('md5$'))
+
+    @override_settings(USUARIOS_IMPORTACION_MINIMO_PARALELO=2)
+    def test_comando_con_pool_de_procesos(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as archivo:
+            json.dump([self.fila(n) for n in range(200, 206)], archivo)
+        self.addCleanup(os.remove, archivo.name)
+
+        salida = io.StringIO()
+        with mock.patch('users.claves.ProcessPoolExecutor', wraps=ProcessPoolExecutor) as pool:
+            call_command('importar_usuarios', archivo.name, '--procesos', '2', stdout=salida)
+        pool.assert_called_once()
+        self.assertIn('6 usuario(s) creados', salida.getvalue())
+        self.assertTrue(CustomUser.objects.get(email='voluntario205@techo.cl').check_password('clave-205'))
@@ -1,9 +1,10 @@
 # users/urls.py
 
 from django.urls import path
-from .views import RegisterView, LoginView
+from .views import RegisterView, LoginView, ImportarUsuariosView
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', LoginView.as_view(), name='login'),
+    path('importar/', ImportarUsuariosView.as_view(), name='importar-usuarios'),
 ]
\ No newline at end of file
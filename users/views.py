@@ -1,10 +1,13 @@
 # users/views.py
 from rest_framework import generics
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import authenticate
+from django.db import IntegrityError
+from backTecho.parametros import es_verdadero
+from .importacion import ArchivoImportacionInvalido, leer_filas, importar_usuarios, validar_filas
 from .serializers import RegisterSerializer
 
 # Vista para el Registro de Usuarios
@@ -27,4 +30,30 @@ class LoginView(APIView):
             token, created = Token.objects.get_or_create(user=user)
             return Response({"token": token.key})
         else:
-            return Response({"error": "Credenciales inválidas"}, status=400)
\ No newline at end of file
+            return Response({"error": "Credenciales inválidas"}, status=400)
+
+# Vista para la importación masiva de usuarios (solo staff)
+class ImportarUsuariosView(APIView):
+    permission_classes = (IsAdminUser,)
+
+    def post(self, request, *args, **kwargs):
+        # Recibe un archivo CSV/JSON en 'archivo' o una lista JSON en 'usuarios'.
+        simular = es_verdadero(request.data.get('simular', ''))
+        try:
+            archivo = request.FILES.get('archivo')
+            if archivo:
+                formato = request.data.get('formato') or archivo.name.rsplit('.', 1)[-1].lower()
+                filas = leer_filas(archivo.read(), formato)
+            else:
+                filas = request.data.get('usuarios')
+                if not isinstance(filas, list):
+                    raise ArchivoImportacionInvalido("Debe enviar un archivo en 'archivo' o una lista en 'usuarios'.")
+                validar_filas(filas)
+            creados, rechazados = importar_usuarios(filas, simular=simular)
+        except ArchivoImportacionInvalido as e:
+            return Response({"error": str(e)}, status=400)
+        except IntegrityError as e:
+            # Otro registro con el mismo email o RUT se creó durante la importación.
+            return Response({"error": "Conflicto al insertar los usuarios; reintente.", "detalle": str(e)}, status=409)
+
+        return Response({"simulado": simular, "creados": creados, "rechazados": rechazados})